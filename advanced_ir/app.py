@@ -1,11 +1,64 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List, Literal, Optional
 from search_engine import SearchEngine
+from micro_batcher import MicroBatcher
+from metrics import render_prometheus
+from qa_pool import QATimeoutError
+from index_jobs import IndexJobManager, JobQueueFull
+import psutil
+from contextlib import asynccontextmanager
+import os
 
-app = FastAPI()
-engine = SearchEngine()
-engine.load_index()
+# Ayarlanırsa gömme modeli worker'larda yüklenmez; sorgular bu soketteki ortak servise
+# gönderilir (bkz. embedding_service.py). ADVANCED_IR_ENCODER servisin arka ucudur.
+EMBEDDING_SOCKET = os.environ.get("ADVANCED_IR_EMBEDDING_SOCKET")
+ENCODER = os.environ.get("ADVANCED_IR_ENCODER", "torch")
+# Index vektörleri, chunk deposu ve arama tabloları dosyadan eşlenir; aynı makinedeki
+# worker'lar sayfaları paylaşır. Model ve index içe aktarma sırasında değil, uygulama başlarken yüklenir.
+if EMBEDDING_SOCKET:
+    engine = SearchEngine(mmap=True, encoder_backend="remote",
+                          encoder_options={"socket": EMBEDDING_SOCKET, "backend": ENCODER})
+else:
+    engine = SearchEngine(mmap=True, encoder_backend=ENCODER)
+# background: worker hemen istek kabul eder, model arka planda yüklenir;
+# sync: model yüklenmeden istek kabul edilmez; off: ilk istekte yüklenir
+WARMUP = os.environ.get("ADVANCED_IR_WARMUP", "background")
+# QA modeli bu kadar ayrı süreçte başlangıçta yüklenir. 0 (varsayılan): tek worker ilk soruda
+# başlatılır; her uvicorn worker'ı /qa kullanılmadıkça BERT modelini yüklemez
+QA_WORKERS = int(os.environ.get("ADVANCED_IR_QA_WORKERS", "0"))
+QA_TIMEOUT = float(os.environ.get("ADVANCED_IR_QA_TIMEOUT", "30"))
+# Kuyrukta bu kadar /search isteği biriktiğinde istekler BM25 ile yanıtlanır (0: kapalı)
+LEXICAL_FALLBACK_DEPTH = int(os.environ.get("ADVANCED_IR_LEXICAL_FALLBACK_DEPTH", "0"))
+# Eşzamanlı /search isteklerini birkaç milisaniye toplayıp tek seferde arar
+batcher = MicroBatcher(engine, max_batch_size=32, max_wait_ms=5,
+                       lexical_fallback_depth=LEXICAL_FALLBACK_DEPTH or None)
+# Index işleri sırayla çalışır; en fazla bu kadar iş kuyrukta bekleyebilir
+INDEX_JOBS_PENDING = int(os.environ.get("ADVANCED_IR_INDEX_JOBS_PENDING", "4"))
+# /index/jobs ile yolu verilen dosyalar bu dizinin altında olmalı
+DATA_DIR = os.path.realpath(os.environ.get("ADVANCED_IR_DATA_DIR", "data"))
+index_jobs = IndexJobManager(engine, max_pending=INDEX_JOBS_PENDING)
+
+@asynccontextmanager
+async def lifespan(app):
+    engine.load_index()
+    if WARMUP == "sync":
+        engine.warmup()
+    elif WARMUP == "background":
+        engine.warmup(background=True)
+    engine.start_qa_pool(max(QA_WORKERS, 1), QA_TIMEOUT, lazy=QA_WORKERS == 0)
+    await batcher.start()
+    # Başka bir süreç (build_index.py) yeni index nesli yayınladığında kesintisiz devreye alınır
+    engine.start_watcher()
+    yield
+    engine.stop_watcher()
+    engine.stop_qa_pool()
+    index_jobs.shutdown()
+    await batcher.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,8 +69,142 @@ app.add_middleware(
 
 class Query(BaseModel):
     text: str
+    k: int = 5
+    nprobe: Optional[int] = None      # IVF index'lerde taranacak küme sayısı
+    ef_search: Optional[int] = None   # HNSW index'lerde arama genişliği
+    doc_ids: Optional[List[int]] = None  # Yalnızca bu belgelerde ara
+    timings: bool = False                # Yanıta aşama sürelerini (ms) ekle
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"  # Vektör, BM25 veya RRF hibrit arama
 
 @app.post("/search")
-def search(query: Query):
-    results = engine.search(query.text, k=5)
+async def search(query: Query):
+    results, timings = await batcher.search(query.text, k=query.k, nprobe=query.nprobe,
+                                            ef_search=query.ef_search, doc_ids=query.doc_ids,
+                                            return_timings=True, mode=query.mode)
+    if query.timings:
+        return {"results": results, "timings": timings}
+    return {"results": results}
+
+
+class BatchQuery(BaseModel):
+    texts: List[str]
+    k: int = 5
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    doc_ids: Optional[List[int]] = None                  # Tüm sorgular için ortak belge filtresi
+    filters: Optional[List[Optional[List[int]]]] = None  # Sorgu başına belge ID listesi
+    timings: bool = False
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"
+
+@app.post("/search/batch")
+def search_batch(query: BatchQuery):
+    if query.filters is not None:
+        if len(query.filters) != len(query.texts):
+            raise HTTPException(status_code=422, detail="filters ve texts aynı uzunlukta olmalı")
+        filters = [{"doc_ids": ids} if ids is not None else None for ids in query.filters]
+    elif query.doc_ids is not None:
+        filters = {"doc_ids": query.doc_ids}
+    else:
+        filters = None
+    with engine.metrics.collect() as timings:
+        results = engine.search_many(query.texts, k=query.k, filters=filters,
+                                     nprobe=query.nprobe, ef_search=query.ef_search, mode=query.mode)
+    if query.timings:
+        return {"results": results, "timings": timings}
     return {"results": results}
+
+
+class DocumentQuery(BaseModel):
+    text: str
+    k: int = 5                           # Döndürülecek belge (ve chunk) sayısı
+    top_docs: int = 20                   # Belge merkezleriyle seçilip chunk'ları aranacak belge sayısı
+    chunks_per_doc: int = 3              # Belge başına döndürülecek (ve mean skoruna giren) chunk sayısı
+    aggregate: Literal["max", "mean"] = "max"
+    doc_ids: Optional[List[int]] = None
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+
+@app.post("/search/documents")
+def search_documents(query: DocumentQuery):
+    """Önce en yakın belgeleri seçip yalnızca onların chunk'larında arar; belge skorlarını da döndürür"""
+    return engine.search_documents(query.text, k=query.k, top_docs=query.top_docs,
+                                   chunks_per_doc=query.chunks_per_doc, aggregate=query.aggregate,
+                                   doc_ids=query.doc_ids, nprobe=query.nprobe, ef_search=query.ef_search)
+
+
+class Question(BaseModel):
+    question: str
+    k: int = 3                           # Cevabın aranacağı chunk sayısı
+    doc_ids: Optional[List[int]] = None
+    mode: Literal["dense", "lexical", "hybrid"] = "dense"
+    timeout: Optional[float] = None      # Saniye (varsayılan: ADVANCED_IR_QA_TIMEOUT)
+
+@app.post("/qa")
+def qa(question: Question):
+    try:
+        result = engine.answer(question.question, k=question.k, doc_ids=question.doc_ids,
+                               mode=question.mode, timeout=question.timeout)
+    except QATimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="İlgili içerik bulunamadı")
+    return result
+
+
+@app.get("/documents/{doc_id}/summary")
+def summary(doc_id: int):
+    """Belgenin index oluşturulurken çıkarılmış özeti"""
+    result = engine.get_summary(doc_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Belge veya özeti bulunamadı")
+    return result
+
+
+def _data_path(path):
+    """İstekteki yolu data dizini altında mutlak yola çevirir, dışarı çıkan yolları reddeder"""
+    full = os.path.realpath(os.path.join(DATA_DIR, path))
+    if os.path.commonpath([full, DATA_DIR]) != DATA_DIR:
+        raise HTTPException(status_code=400, detail=f"{path} data dizini dışında")
+    if not os.path.isfile(full):
+        raise HTTPException(status_code=404, detail=f"{path} bulunamadı")
+    return full
+
+@app.post("/index/jobs", status_code=202)
+async def create_index_job(files: List[UploadFile] = File(default=[]), paths: List[str] = Form(default=[]),
+                           rebuild: bool = Form(False)):
+    """Yüklenen dosyalardan ve/veya data dizinindeki yollardan arka planda index oluşturur/günceller"""
+    uploads = [(os.path.basename(f.filename), await f.read()) for f in files]
+    try:
+        job = index_jobs.submit(uploads, [_data_path(p) for p in paths], rebuild=rebuild)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.to_dict()
+
+@app.get("/index/jobs")
+def list_index_jobs():
+    return {"jobs": [job.to_dict() for job in index_jobs.jobs()]}
+
+@app.get("/index/jobs/{job_id}")
+def get_index_job(job_id: str):
+    """İşin aşaması, gömülen chunk sayısı, hızı (chunk/s) ve tahmini kalan süresi"""
+    job = index_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return job.to_dict()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metin biçiminde aşama süreleri, sayaçlar ve index/önbellek durumu"""
+    gauges, counters = engine.collect_metrics()
+    gauges.append(("process_resident_memory_bytes", None, psutil.Process().memory_info().rss,
+                   "Sürecin bellek kullanımı (RSS)"))
+    counters.append(("batcher_batches", None, batcher.batches, "İşlenen micro-batch sayısı"))
+    counters.append(("batcher_requests", None, batcher.requests, "Micro-batch ile işlenen istek sayısı"))
+    counters.append(("batcher_lexical_fallbacks", None, batcher.fallbacks,
+                     "Yoğunluk nedeniyle BM25 ile yanıtlanan istek sayısı"))
+    return render_prometheus(engine.metrics, gauges, counters)
@@ -0,0 +1,326 @@
+from search_engine import SearchEngine
+from index_factory import ENCODINGS, INDEX_TYPES
+from contextlib import redirect_stdout
+from datetime import datetime
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import faiss
+import numpy as np
+import psutil
+
+
+# ================= SENTETİK DERLEM ================= #
+def load_sample_sentences(data_dir="data"):
+    """data dizinindeki .txt örneklerini cümlelere böler"""
+    sentences = []
+    for file in sorted(os.listdir(data_dir)):
+        if not file.endswith(".txt"):
+            continue
+        with open(os.path.join(data_dir, file), "r", encoding="utf-8") as f:
+            text = f.read()
+        for sentence in re.split(r"(?<=[.!?:])\s+|\n+", text):
+            sentence = " ".join(sentence.split())
+            if len(sentence.split()) >= 3:
+                sentences.append(sentence)
+    return sentences
+
+
+def synthetic_corpus(sentences, num_docs, words_per_doc, seed=42, duplicate_every=0):
+    """Örnek cümleleri karıştırarak (isim, metin) çiftleri üretir.
+
+    Aynı seed ile her çalıştırmada aynı derlem üretilir; belgeler birbirinden
+    ayrışsın diye her belgeye kendi etiketi eklenir. duplicate_every > 0 ise
+    her duplicate_every belgede bir, belgenin birebir kopyası başka bir isimle
+    eklenir (tüm chunk'ları tekilleştirilir).
+    """
+    rng = random.Random(seed)
+    for i in range(num_docs):
+        words = 0
+        parts = [f"Belge {i} konu {rng.randrange(num_docs)}."]
+        while words < words_per_doc:
+            sentence = rng.choice(sentences)
+            parts.append(sentence)
+            words += len(sentence.split())
+        yield f"synthetic_{i:06d}.txt", " ".join(parts)
+        if duplicate_every and i % duplicate_every == 0:
+            yield f"synthetic_{i:06d}_kopya.txt", " ".join(parts)
+
+
+# ================= ÖLÇÜM ================= #
+class PeakRSS:
+    """Bir kod bloğu boyunca sürecin en yüksek RSS değerini örnekler"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.process = psutil.Process(os.getpid())
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+
+def latency_stats(samples):
+    """Milisaniye cinsinden gecikme yüzdelikleri"""
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "count": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99))
+    }
+
+
+def time_calls(fn, args_list, warmup=5):
+    """fn'i her argüman grubu için çağırır ve süreleri döndürür (motor çıktısı bastırılır)"""
+    samples = []
+    with redirect_stdout(io.StringIO()):
+        for args in args_list[:warmup]:
+            fn(*args)
+        for args in args_list:
+            start = time.perf_counter()
+            fn(*args)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def recall_at_k(found, truth, k):
+    """Her sorgu için ANN sonuçlarının tam (flat) sonuçlarla örtüşme oranı"""
+    hits = [len(set(f[f >= 0]) & set(t[t >= 0])) / k for f, t in zip(found, truth)]
+    return float(np.mean(hits))
+
+
+def doc_coverage(engine):
+    """Belge düzeyindeki index'te merkezi olan belgelerin oranı (kopya belgeler dahil 1.0 olmalı)"""
+    if engine.doc_index is None or not engine.doc_metadata:
+        return None
+    return engine.doc_index.document_count() / len(engine.doc_metadata)
+
+
+# ================= BENCHMARK ================= #
+def make_engine(workdir, index_type, index_params, batch_size, encoder_backend="torch"):
+    index_dir = os.path.join(workdir, index_type)
+    return SearchEngine(
+        index_path=os.path.join(index_dir, "faiss.index"),
+        metadata_path=os.path.join(index_dir, "chunks"),
+        doc_metadata_path=os.path.join(index_dir, "doc_metadata.json"),
+        embedding_cache_dir=os.path.join(workdir, "embedding_cache"),
+        build_batch_size=batch_size,
+        index_type=index_type,
+        index_params=index_params,
+        encoder_backend=encoder_backend,
+        # Tekrarlanan sorgular önbellekten dönmesin
+        query_cache_size=0,
+        result_cache_size=0
+    )
+
+
+def benchmark_build(engine, corpus):
+    stats = {}
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            engine.build_index_stream(corpus, progress_callback=stats.update)
+        elapsed = time.perf_counter() - start
+    return {
+        "documents": stats.get("documents", 0),
+        "chunks": stats.get("chunks", 0),
+        "seconds": elapsed,
+        "chunks_per_sec": stats.get("chunks", 0) / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_mb": rss.peak / (1024 * 1024)
+    }
+
+
+def run(args):
+    sentences = load_sample_sentences(args.data_dir)
+    if not sentences:
+        raise SystemExit(f"{args.data_dir} dizininde örnek .txt belgesi bulunamadı.")
+
+    rng = random.Random(args.seed)
+    queries = [rng.choice(sentences) for _ in range(args.queries)]
+    index_params = {}
+    if args.nlist is not None:
+        index_params["nlist"] = args.nlist
+    if args.hnsw_m is not None:
+        index_params["hnsw_m"] = args.hnsw_m
+    if args.encoding is not None:
+        index_params["encoding"] = args.encoding
+    if args.pca_dim is not None:
+        index_params["pca_dim"] = args.pca_dim
+
+    # Kesinlik ölçümü için flat index her zaman ilk sırada kurulur
+    index_types = ["flat"] + [t for t in args.index_types if t != "flat"]
+    workdir = tempfile.mkdtemp(prefix="ir_bench_")
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "faiss": getattr(faiss, "__version__", "unknown"),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {
+            "documents": args.docs,
+            "words_per_doc": args.words_per_doc,
+            "queries": len(queries),
+            "k": args.k,
+            "duplicate_every": args.duplicate_every,
+            "batch_size": args.batch_size,
+            "encoder": args.encoder,
+            "index_params": index_params,
+            "seed": args.seed
+        },
+        "results": {}
+    }
+
+    truth = None
+    try:
+        for index_type in index_types:
+            print(f"⏱️  {index_type} index'i ölçülüyor...")
+            engine = make_engine(workdir, index_type, index_params, args.batch_size, args.encoder)
+            corpus = synthetic_corpus(sentences, args.docs, args.words_per_doc, args.seed, args.duplicate_every)
+            result = {"build": benchmark_build(engine, corpus)}
+            # İlk build gömme önbelleğini doldurur; sonrakiler yalnızca index maliyetini ölçer
+            result["build"]["embedding_cache"] = "cold" if truth is None else "warm"
+
+            with redirect_stdout(io.StringIO()):
+                engine.load_index()
+            doc_ids = [d["doc_id"] for d in engine.get_document_list()]
+            result["doc_coverage"] = doc_coverage(engine)
+            result["search"] = latency_stats(time_calls(
+                lambda q: engine.search(q, k=args.k), [(q,) for q in queries]))
+            filter_args = [(q, rng.choice(doc_ids)) for q in queries]
+            result["filtered_search"] = latency_stats(time_calls(
+                lambda q, d: engine.search_with_document_filter(q, doc_id=d, k=args.k), filter_args))
+
+            q_vecs = engine._encode_queries(queries)
+            _, ids = engine.index.search(q_vecs, args.k)
+            if truth is None:
+                truth = ids
+            else:
+                result["recall_at_k"] = recall_at_k(ids, truth, args.k)
+            report["results"][index_type] = result
+            print_result(index_type, result)
+    finally:
+        if args.keep_workdir:
+            print(f"Çalışma dizini: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+# ================= RAPOR ================= #
+def print_result(index_type, result):
+    build = result["build"]
+    print(f"  build: {build['chunks']} chunk, {build['chunks_per_sec']:.1f} chunk/s, "
+          f"tepe RSS {build['peak_rss_mb']:.0f} MB")
+    for name in ("search", "filtered_search"):
+        s = result[name]
+        print(f"  {name}: p50 {s['p50_ms']:.2f} ms, p95 {s['p95_ms']:.2f} ms, p99 {s['p99_ms']:.2f} ms")
+    if "recall_at_k" in result:
+        print(f"  recall@k: {result['recall_at_k']:.3f}")
+    if result.get("doc_coverage") is not None:
+        mark = "✅" if result["doc_coverage"] == 1.0 else "❌"
+        print(f"  {mark} belge merkezi kapsamı: {result['doc_coverage']:.3f}")
+
+
+COMPARED_METRICS = (
+    ("build", "chunks_per_sec", True),
+    ("build", "peak_rss_mb", False),
+    ("search", "p50_ms", False),
+    ("search", "p95_ms", False),
+    ("search", "p99_ms", False),
+    ("filtered_search", "p50_ms", False),
+    ("filtered_search", "p95_ms", False),
+    ("filtered_search", "p99_ms", False),
+    (None, "recall_at_k", True)
+)
+
+
+def compare(report, baseline, tolerance=0.1):
+    """İki raporu karşılaştırır; tolerans dışında kötüleşen ölçüm sayısını döndürür"""
+    regressions = 0
+    for index_type, result in report["results"].items():
+        old = baseline.get("results", {}).get(index_type)
+        if old is None:
+            continue
+        print(f"📊 {index_type}:")
+        for section, metric, higher_is_better in COMPARED_METRICS:
+            new_value = (result.get(section) or {}).get(metric) if section else result.get(metric)
+            old_value = (old.get(section) or {}).get(metric) if section else old.get(metric)
+            if new_value is None or old_value is None or old_value == 0:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = -change if higher_is_better else change
+            mark = "❌" if worse > tolerance else "✅"
+            regressions += worse > tolerance
+            name = f"{section}.{metric}" if section else metric
+            print(f"  {mark} {name}: {old_value:.3f} → {new_value:.3f} ({change:+.1%})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index oluşturma ve sorgu performansını ölçer")
+    parser.add_argument("--docs", type=int, default=1000, help="Sentetik belge sayısı")
+    parser.add_argument("--words-per-doc", type=int, default=1000, help="Belge başına yaklaşık kelime sayısı")
+    parser.add_argument("--queries", type=int, default=200, help="Ölçülecek sorgu sayısı")
+    parser.add_argument("-k", type=int, default=5, help="Sorgu başına sonuç sayısı")
+    parser.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES),
+                        help="Ölçülecek index türleri (flat her zaman ölçülür)")
+    parser.add_argument("--batch-size", type=int, default=256, help="Build sırasında kodlama grubu boyutu")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF küme sayısı")
+    parser.add_argument("--hnsw-m", type=int, default=None, help="HNSW komşu sayısı")
+    parser.add_argument("--encoding", choices=ENCODINGS, default=None, help="Vektör saklama biçimi")
+    parser.add_argument("--pca-dim", type=int, default=None, help="PCA ile indirgenecek boyut")
+    parser.add_argument("--encoder", choices=("torch", "onnx"), default="torch", help="Gömme modeli arka ucu")
+    parser.add_argument("--data-dir", default="data", help="Örnek belgelerin dizini")
+    parser.add_argument("--duplicate-every", type=int, default=50,
+                        help="Her N belgede bir birebir kopya belge ekle (0: ekleme)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Sonuçların yazılacağı JSON dosyası")
+    parser.add_argument("--compare", default=None, help="Karşılaştırılacak önceki JSON raporu")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Karşılaştırmada gerileme sayılacak göreli değişim")
+    parser.add_argument("--keep-workdir", action="store_true", help="Geçici index dizinini silme")
+    args = parser.parse_args()
+
+    report = run(args)
+    # Merkezi olmayan belge iki aşamalı aramada hiç bulunamaz
+    uncovered = [t for t, r in report["results"].items() if (r.get("doc_coverage") or 1.0) < 1.0]
+    if uncovered:
+        print(f"❌ Belge merkezi eksik belgeler var: {', '.join(uncovered)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"Sonuçlar kaydedildi: {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            raise SystemExit(1)
+    if uncovered:
+        raise SystemExit(1)
@@ -1,55 +1,135 @@
 from search_engine import SearchEngine
+from document_loader import SUPPORTED_EXTENSIONS, iter_documents
+from index_factory import ENCODINGS, INDEX_TYPES
+from sharding import DEFAULT_SHARD_ROOT, build_shards
+import argparse
 import os
 
-def load_documents_from_data_dir():
-    """data dizininden belgeleri yükler"""
-    documents = []
-    doc_names = []
-    
+def iter_documents_from_data_dir(workers=None):
+    """data dizinindeki belgeleri (isim, metin) çiftleri olarak üretir.
+
+    Dosyalar bir süreç havuzunda paralel ayrıştırılır; değişmemiş dosyaların
+    metni önbellekten okunur, artık data dizininde olmayan dosyaların
+    önbellek kayıtları silinir.
+    """
     # data dizinini kontrol et ve oluştur
     if not os.path.exists("data"):
         os.makedirs("data")
         print("data dizini oluşturuldu. Belgelerinizi bu dizine ekleyin.")
-        return documents, doc_names
+        return
     
     # Dosyaları oku
-    files = os.listdir("data")
+    files = sorted(os.listdir("data"))
     if not files:
         print("data dizininde hiç dosya bulunamadı.")
-        return documents, doc_names
+        return
     
     print(f"{len(files)} dosya bulundu: {files}")
     
-    engine = SearchEngine()
-    
+    paths = []
     for file in files:
-        path = f"data/{file}"
-        try:
-            if file.endswith(".txt"):
-                with open(path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    documents.append(content)
-                    doc_names.append(file)
-                    print(f"✅ {file} dosyası yüklendi. ({len(content)} karakter)")
-            elif file.endswith(".pdf"):
-                content = engine.load_pdf(path)
-                documents.append(content)
-                doc_names.append(file)
-                print(f"✅ {file} dosyası yüklendi. ({len(content)} karakter)")
-            else:
-                print(f"⚠️  {file} dosyası desteklenmiyor (sadece .txt ve .pdf desteklenir)")
-        except Exception as e:
-            print(f"❌ {file} dosyası işlenirken hata oluştu: {e}")
+        if file.endswith(SUPPORTED_EXTENSIONS):
+            paths.append(f"data/{file}")
+        else:
+            print(f"⚠️  {file} dosyası desteklenmiyor (sadece .txt ve .pdf desteklenir)")
+    
+    for path, content, error in iter_documents(paths, workers=workers, prune=True):
+        file = os.path.basename(path)
+        if error is not None:
+            print(f"❌ {file} dosyası işlenirken hata oluştu: {error}")
+            continue
+        print(f"✅ {file} dosyası yüklendi. ({len(content)} karakter)")
+        yield file, content
+
+def load_documents_from_data_dir(workers=None):
+    """data dizininden belgeleri yükler"""
+    documents = []
+    doc_names = []
+    for name, content in iter_documents_from_data_dir(workers):
+        documents.append(content)
+        doc_names.append(name)
     
     print(f"Toplam {len(documents)} döküman yüklendi.")
     return documents, doc_names
 
 if __name__ == "__main__":
-    documents, doc_names = load_documents_from_data_dir()
-    
-    if documents:
-        engine = SearchEngine()
-        engine.build_index(documents, doc_names)
-        print("Index başarıyla oluşturuldu!")
+    parser = argparse.ArgumentParser(description="data dizinindeki belgelerden index oluşturur")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Artımlı güncelleme yerine index'i baştan oluştur")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Bellekte aynı anda tutulacak en fazla chunk sayısı")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Belge ayrıştırma için süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat",
+                        help="Yeni oluşturulacak index türü")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF küme sayısı")
+    parser.add_argument("--hnsw-m", type=int, default=None, help="HNSW komşu sayısı")
+    parser.add_argument("--encoding", choices=ENCODINGS, default=None,
+                        help="Vektör saklama biçimi (fp16/int8: skaler nicemleme)")
+    parser.add_argument("--pca-dim", type=int, default=None, help="Vektörleri PCA ile bu boyuta indir")
+    parser.add_argument("--encoder", choices=("torch", "onnx"), default="torch",
+                        help="Gömme modeli arka ucu (onnx: int8 nicemlenmiş ONNX Runtime)")
+    parser.add_argument("--chunk-tokens", type=int, default=None,
+                        help="Chunk başına en fazla token (varsayılan: kodlayıcının dizi sınırı)")
+    parser.add_argument("--chunk-overlap", type=int, default=32, help="Ardışık chunk'ların ortak token sayısı")
+    parser.add_argument("--no-sentence-snap", action="store_true",
+                        help="Chunk sınırlarını cümle sonlarına hizalama")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Birebir/benzer chunk'ları tek vektörde birleştirme "
+                             "(tekilleştirme tekil chunk başına ~0.8 KB bellek kullanır)")
+    parser.add_argument("--dedup-threshold", type=float, default=0.85,
+                        help="İki chunk'ın kopya sayılacağı tahmini Jaccard benzerliği")
+    parser.add_argument("--summary-sentences", type=int, default=5, help="Belge özetindeki cümle sayısı")
+    parser.add_argument("--no-summaries", action="store_true", help="Belge özetlerini çıkarma")
+    parser.add_argument("--doc-centroids", type=int, default=4,
+                        help="Belge düzeyindeki index için belge başına en fazla merkez vektörü (0: oluşturma)")
+    parser.add_argument("--doc-centroid-chunks", type=int, default=32,
+                        help="Uzun belgelerde kaç chunk için bir merkez vektörü ayrılacağı")
+    parser.add_argument("--no-lexical", action="store_true",
+                        help="BM25 ters index'ini oluşturma (yalnızca dense arama)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help=f"Belgeleri bu sayıda shard'a bölerek {DEFAULT_SHARD_ROOT}/ altında oluştur")
+    parser.add_argument("--shard", type=int, nargs="+", default=None,
+                        help="Yalnızca bu shard'ları yeniden oluştur/güncelle (--shards ile)")
+    args = parser.parse_args()
+
+    index_params = {}
+    if args.nlist is not None:
+        index_params["nlist"] = args.nlist
+    if args.hnsw_m is not None:
+        index_params["hnsw_m"] = args.hnsw_m
+    if args.encoding is not None:
+        index_params["encoding"] = args.encoding
+    if args.pca_dim is not None:
+        index_params["pca_dim"] = args.pca_dim
+
+    engine_kwargs = dict(build_batch_size=args.batch_size, index_type=args.index_type,
+                         index_params=index_params, build_lexical=not args.no_lexical,
+                         encoder_backend=args.encoder, chunk_max_tokens=args.chunk_tokens,
+                         chunk_overlap=args.chunk_overlap, snap_sentences=not args.no_sentence_snap,
+                         dedup=not args.no_dedup, dedup_threshold=args.dedup_threshold,
+                         summaries=not args.no_summaries, summary_sentences=args.summary_sentences,
+                         doc_centroids=args.doc_centroids, doc_centroid_chunks=args.doc_centroid_chunks)
+    if args.shards:
+        # Her shard kendi index'ini ayrı nesillerle yazar; yayındaki diğer shard'lar etkilenmez
+        build_shards(lambda: iter_documents_from_data_dir(args.workers), num_shards=args.shards,
+                     shards=args.shard, rebuild=args.rebuild, **engine_kwargs)
+        print("Shard'lı index başarıyla oluşturuldu!")
+        raise SystemExit(0)
+
+    engine = SearchEngine(**engine_kwargs)
+    if args.rebuild:
+        # Belgeler okundukça chunk'lanıp gömülür, tüm derlem belleğe alınmaz
+        engine.build_index_stream(iter_documents_from_data_dir(args.workers))
+        if engine.doc_metadata:
+            print("Index başarıyla oluşturuldu!")
+        else:
+            print("İşlenecek belge bulunamadı. Önce data dizinine belgelerinizi ekleyin.")
     else:
-        print("İşlenecek belge bulunamadı. Önce data dizinine belgelerinizi ekleyin.")
+        documents, doc_names = load_documents_from_data_dir(args.workers)
+        if documents:
+            # Yalnızca değişen belgeler yeniden gömülür, silinenler index'ten çıkarılır
+            engine.update_documents(documents, doc_names, remove_missing=True)
+            print("Index başarıyla güncellendi!")
+        else:
+            print("İşlenecek belge bulunamadı. Önce data dizinine belgelerinizi ekleyin.")
@@ -0,0 +1,247 @@
+import json
+import logging
+import os
+import shutil
+from array import array
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TEXT_FILE = "text.bin"
+OFFSETS_FILE = "offsets.npy"
+DOC_IDS_FILE = "doc_ids.npy"
+VECTOR_IDS_FILE = "vector_ids.npy"
+CHUNK_IDS_FILE = "chunk_ids.npy"
+# Chunk'ın belge metnindeki [başlangıç, bitiş) karakter aralığı (eski depolarda yok)
+CHAR_SPANS_FILE = "char_spans.npy"
+# Türetilmiş arama tabloları; depoyla birlikte yazıldıkları için her süreç kopyalamadan eşler
+VECTOR_ORDER_FILE = "vector_order.npy"   # vektör ID'sine göre sıralı konumlar (ID'ler artan değilse)
+DOC_VECTORS_FILE = "doc_vectors.npy"     # belgelerin tekil, sıralı vektör ID'leri art arda
+DOC_RANGES_FILE = "doc_ranges.npy"       # (doc_id, başlangıç, bitiş) satırları
+
+
+def lookup_tables(doc_ids, vector_ids):
+    """Vektör ID → konum sıralaması (gerekmiyorsa None) ve belge → vektör ID aralık tabloları"""
+    doc_ids = np.asarray(doc_ids, dtype="int64")
+    vector_ids = np.asarray(vector_ids, dtype="int64")
+    # Vektör ID'leri eklenme sırasıyla artar; değilse (ya da tekilleştirilmiş chunk'lar
+    # aynı vektörü paylaşıyorsa) sıralama tablosu tutulur
+    order = None
+    if len(vector_ids) > 1 and not np.all(np.diff(vector_ids) > 0):
+        order = np.argsort(vector_ids, kind="stable")
+    # Bir belge aynı (tekilleştirilmiş) chunk'ı birden fazla kez içerebilir
+    pairs = np.unique(np.column_stack([doc_ids, vector_ids]).reshape(-1, 2), axis=0)
+    docs, starts = np.unique(pairs[:, 0], return_index=True)
+    ends = np.append(starts[1:], len(pairs))[:len(starts)]
+    ranges = np.column_stack([docs, starts, ends]).astype("int64").reshape(-1, 3)
+    return order, np.ascontiguousarray(pairs[:, 1]), ranges
+
+
+def write_lookup_tables(path, doc_ids, vector_ids):
+    """Arama tablolarını depo dizinine yazar; aralık tablosu en son, atomik olarak yazılır"""
+    order, doc_vectors, ranges = lookup_tables(doc_ids, vector_ids)
+    for name, values in ((VECTOR_ORDER_FILE, order), (DOC_VECTORS_FILE, doc_vectors), (DOC_RANGES_FILE, ranges)):
+        if values is None:
+            continue
+        tmp = os.path.join(path, f".{name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, values)
+        os.replace(tmp, os.path.join(path, name))
+
+
+class ChunkStore:
+    """Chunk metinleri ve meta verileri için salt okunur, bellek eşlemeli depo.
+
+    Metinler tek bir UTF-8 blob'da art arda, başlangıç konumları ayrı bir
+    ofset dizisinde tutulur. Belge adı/hash'i gibi tekrar eden alanlar chunk
+    başına saklanmaz; doc_id üzerinden belge tablosundan (doc_metadata) okunur.
+    Bir satır yalnızca istendiğinde sözlüğe dönüştürülür.
+    """
+
+    def __init__(self, path, documents=None):
+        self.path = path
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(path, DOC_IDS_FILE), mmap_mode="r")
+        self.vector_ids = np.load(os.path.join(path, VECTOR_IDS_FILE), mmap_mode="r")
+        self.chunk_ids = np.load(os.path.join(path, CHUNK_IDS_FILE), mmap_mode="r")
+        spans_path = os.path.join(path, CHAR_SPANS_FILE)
+        self.char_spans = np.load(spans_path, mmap_mode="r") if os.path.exists(spans_path) else None
+        text_path = os.path.join(path, TEXT_FILE)
+        if os.path.getsize(text_path) > 0:
+            self.text = np.memmap(text_path, dtype="uint8", mode="r")
+        else:
+            self.text = np.zeros(0, dtype="uint8")
+        self._order, self._doc_vectors, self._doc_ranges = self._load_lookup_tables()
+        self.documents = {}
+        self.set_documents(documents or [])
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, OFFSETS_FILE))
+
+    def _load_lookup_tables(self):
+        """Arama tablolarını dosyadan eşler; tabloları olmayan eski depolarda ilk açan süreç yazar"""
+        if not os.path.exists(os.path.join(self.path, DOC_RANGES_FILE)):
+            try:
+                write_lookup_tables(self.path, self.doc_ids, self.vector_ids)
+            except OSError as e:
+                # Salt okunur dizin: tablolar bu süreçte bellekte tutulur
+                logger.warning(f"Chunk deposu arama tabloları yazılamadı: {e}")
+                return lookup_tables(self.doc_ids, self.vector_ids)
+        order_path = os.path.join(self.path, VECTOR_ORDER_FILE)
+        order = np.load(order_path, mmap_mode="r") if os.path.exists(order_path) else None
+        return (order, np.load(os.path.join(self.path, DOC_VECTORS_FILE), mmap_mode="r"),
+                np.load(os.path.join(self.path, DOC_RANGES_FILE)))
+
+    def set_documents(self, doc_metadata):
+        """Belge tablosunu (doc_metadata listesi) günceller"""
+        self.documents = {d["doc_id"]: d for d in doc_metadata}
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def text_at(self, pos):
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        return bytes(self.text[start:end]).decode("utf-8")
+
+    def __getitem__(self, pos):
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError(pos)
+        doc_id = int(self.doc_ids[pos])
+        doc_info = self.documents.get(doc_id, {})
+        row = {
+            "vector_id": int(self.vector_ids[pos]),
+            "doc_id": doc_id,
+            "chunk_id": int(self.chunk_ids[pos]),
+            "text": self.text_at(pos),
+            "doc_name": doc_info.get("name", "Bilinmiyor"),
+            "doc_hash": doc_info.get("hash", "")
+        }
+        if self.char_spans is not None and self.char_spans[pos, 0] >= 0:
+            row["start_char"] = int(self.char_spans[pos, 0])
+            row["end_char"] = int(self.char_spans[pos, 1])
+        return row
+
+    def __iter__(self):
+        for pos in range(len(self)):
+            yield self[pos]
+
+    def positions(self, vector_id):
+        """Vektör ID'sini paylaşan chunk'ların depodaki konumları (eklenme sırasıyla)"""
+        if self._order is None:
+            pos = int(np.searchsorted(self.vector_ids, vector_id))
+            if pos < len(self) and self.vector_ids[pos] == vector_id:
+                return [pos]
+            return []
+        lo = int(np.searchsorted(self.vector_ids, vector_id, side="left", sorter=self._order))
+        hi = int(np.searchsorted(self.vector_ids, vector_id, side="right", sorter=self._order))
+        return [int(p) for p in self._order[lo:hi]]
+
+    def position(self, vector_id):
+        """Vektör ID'sinin depodaki (ilk) konumu (yoksa None)"""
+        positions = self.positions(vector_id)
+        return positions[0] if positions else None
+
+    def get_by_vector_id(self, vector_id, doc_ids=None):
+        """Vektörün chunk'ı (yoksa None).
+
+        Vektör birden fazla belgede geçiyorsa (tekilleştirme) doc_ids'teki bir
+        belgenin satırı tercih edilir ve tüm kaynak belgeler "doc_ids"
+        alanında listelenir.
+        """
+        positions = self.positions(vector_id)
+        if not positions:
+            return None
+        if len(positions) == 1:
+            return self[positions[0]]
+        sources = [int(self.doc_ids[p]) for p in positions]
+        pos = positions[0]
+        if doc_ids is not None:
+            pos = next((p for p, d in zip(positions, sources) if d in doc_ids), pos)
+        row = self[pos]
+        row["doc_ids"] = sorted(set(sources))
+        return row
+
+    def doc_vector_ids(self):
+        """Belge ID'si → o belgenin (sıralı, tekil) vektör ID'leri tablosu; diziler eşlenen dosyanın dilimleridir"""
+        return {int(d): self._doc_vectors[start:end] for d, start, end in self._doc_ranges.tolist()}
+
+    def close(self):
+        self.offsets = self.doc_ids = self.vector_ids = self.chunk_ids = self.char_spans = self.text = None
+        self._order = self._doc_vectors = self._doc_ranges = None
+
+
+class ChunkStoreWriter:
+    """Chunk'ları akış halinde yazar; close() ile dizini yerine taşır"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+        self.text_file = open(os.path.join(self.tmp_path, TEXT_FILE), "wb")
+        self.offsets = array("q", [0])
+        self.doc_ids = array("q")
+        self.vector_ids = array("q")
+        self.chunk_ids = array("q")
+        self.char_spans = array("q")
+
+    def append(self, meta):
+        data = meta["text"].encode("utf-8")
+        self.text_file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+        self.doc_ids.append(meta["doc_id"])
+        self.vector_ids.append(meta["vector_id"])
+        self.chunk_ids.append(meta["chunk_id"])
+        self.char_spans.append(meta.get("start_char", -1))
+        self.char_spans.append(meta.get("end_char", -1))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def close(self):
+        """Dizileri yazar ve geçici dizini hedefin yerine koyar"""
+        self.text_file.close()
+        np.save(os.path.join(self.tmp_path, OFFSETS_FILE), np.frombuffer(self.offsets, dtype="int64"))
+        np.save(os.path.join(self.tmp_path, DOC_IDS_FILE), np.frombuffer(self.doc_ids, dtype="int64").astype("int32"))
+        np.save(os.path.join(self.tmp_path, VECTOR_IDS_FILE), np.frombuffer(self.vector_ids, dtype="int64"))
+        np.save(os.path.join(self.tmp_path, CHUNK_IDS_FILE), np.frombuffer(self.chunk_ids, dtype="int64").astype("int32"))
+        np.save(os.path.join(self.tmp_path, CHAR_SPANS_FILE), np.frombuffer(self.char_spans, dtype="int64").reshape(-1, 2))
+        write_lookup_tables(self.tmp_path, np.frombuffer(self.doc_ids, dtype="int64"),
+                            np.frombuffer(self.vector_ids, dtype="int64"))
+        replace_dir(self.tmp_path, self.path)
+
+    def abort(self):
+        self.text_file.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def replace_dir(src, dst):
+    """src dizinini dst'nin yerine koyar (eski dst silinir)"""
+    old = dst + ".old"
+    if os.path.exists(old):
+        shutil.rmtree(old)
+    if os.path.exists(dst):
+        os.replace(dst, old)
+    os.replace(src, dst)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def migrate_json_metadata(json_path, path):
+    """Eski metadata.json dosyasını chunk deposuna dönüştürür"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    writer = ChunkStoreWriter(path)
+    for pos, record in enumerate(records):
+        writer.append({
+            "vector_id": record.get("vector_id", pos),
+            "doc_id": record.get("doc_id", -1),
+            "chunk_id": record.get("chunk_id", 0),
+            "text": record["text"]
+        })
+    writer.close()
+    logger.info(f"{json_path} chunk deposuna dönüştürüldü ({len(records)} chunk)")
@@ -0,0 +1,138 @@
+import logging
+import re
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cümle sonu: noktalama (ve varsa kapanan tırnak/parantez) + boşluk, ya da paragraf arası
+_SENTENCE_END = re.compile(r"[.!?…:;]+[\"'”’)\]]*\s+|\n\s*\n")
+_WORD = re.compile(r"\S+")
+
+
+def sentence_starts(text):
+    """Cümle başlangıçlarının karakter konumları"""
+    return np.fromiter((m.end() for m in _SENTENCE_END.finditer(text)), dtype="int64")
+
+
+def _last_cut(cuts, limit, lower):
+    """cuts içinde limit'i aşmayan, lower'dan küçük olmayan en büyük değer (yoksa None)"""
+    i = np.searchsorted(cuts, limit, side="right") - 1
+    return int(cuts[i]) if i >= 0 and cuts[i] >= lower else None
+
+
+def _first_cut(cuts, lower, limit):
+    """cuts içinde lower ile limit arasındaki (limit hariç) en küçük değer (yoksa None)"""
+    j = np.searchsorted(cuts, lower)
+    return int(cuts[j]) if j < len(cuts) and cuts[j] < limit else None
+
+
+def _windows(starts, ends, sentence_cuts, word_cuts, max_tokens, overlap):
+    """Bir belgenin token konumlarından (başlangıç, bitiş) karakter aralıklarını üretir.
+
+    Pencere en fazla max_tokens token alır ve yarısından sonraki son cümle
+    sınırında, yoksa son kelime sınırında biter. Sonraki pencere örtüşme
+    bölgesindeki ilk cümle (yoksa kelime) başından başlar; bitişik pencereler
+    en fazla overlap token (ve pencerenin yarısını) paylaşır. *_cuts: sınırdan sonraki ilk tokenın
+    indeksleri (artan sırada).
+    """
+    n = len(starts)
+    spans = []
+    min_fill = max(1, max_tokens // 2)
+    s = 0
+    while s < n:
+        e = min(s + max_tokens, n)
+        if e < n:
+            cut = _last_cut(sentence_cuts, e, s + min_fill)
+            if cut is None:
+                cut = _last_cut(word_cuts, e, s + 1)
+            e = cut or e
+        spans.append((int(starts[s]), int(ends[e - 1])))
+        if e >= n:
+            break
+        # Kısa kalan bir pencerenin en fazla yarısı tekrar edilir; ilerleme garanti olur
+        next_s = e - min(overlap, (e - s) // 2)
+        if next_s < e:
+            cut = _first_cut(sentence_cuts, next_s, e)
+            if cut is None:
+                cut = _first_cut(word_cuts, next_s, e)
+            next_s = e if cut is None else cut
+        s = max(next_s, s + 1)
+    return spans
+
+
+def _cuts(starts, positions):
+    """Karakter konumlarını, o konumda/sonrasında başlayan ilk tokenın indeksine çevirir"""
+    if not len(positions):
+        return np.zeros(0, dtype="int64")
+    return np.unique(np.searchsorted(starts, positions))
+
+
+class TokenChunker:
+    """Belgeleri kodlayıcının token sınırına göre örtüşen parçalara böler.
+
+    Her parça en fazla max_tokens token (özel tokenlar hariç) içerir; böylece
+    kodlayıcı hiçbir parçanın sonunu kesmez. Belgeler gruplar halinde tek
+    çağrıyla tokenize edilir (hızlı tokenizer). Tokenizer verilmezse
+    kelimeler token sayılır.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens=254, overlap=32, snap_sentences=True):
+        if overlap >= max_tokens:
+            raise ValueError(f"Örtüşme ({overlap}) parça boyutundan ({max_tokens}) küçük olmalı")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.snap_sentences = snap_sentences
+
+    @classmethod
+    def for_model(cls, model_name, max_seq_length, overlap=32, snap_sentences=True, tokenizer=None):
+        """Kodlayıcının tokenizer'ı ve dizi sınırıyla bir chunker oluşturur.
+
+        Tokenizer yüklenemezse kelime bazlı bölmeye düşülür.
+        """
+        if tokenizer is None:
+            try:
+                from transformers import AutoTokenizer
+                tokenizer = AutoTokenizer.from_pretrained(model_name)
+            except Exception as e:
+                logger.warning(f"Tokenizer yüklenemedi, kelime bazlı bölünüyor: {e}")
+        special = tokenizer.num_special_tokens_to_add() if tokenizer is not None else 0
+        return cls(tokenizer, max_seq_length - special, overlap, snap_sentences)
+
+    @property
+    def config(self):
+        """Parçalamayı belirleyen ayarlar (değişirse belgeler yeniden parçalanmalı)"""
+        return {
+            "unit": "token" if self.tokenizer is not None else "word",
+            "max_tokens": self.max_tokens,
+            "overlap": self.overlap,
+            "snap_sentences": self.snap_sentences
+        }
+
+    def _token_offsets(self, texts):
+        if self.tokenizer is None:
+            for text in texts:
+                spans = [(m.start(), m.end()) for m in _WORD.finditer(text)]
+                yield np.array(spans, dtype="int64").reshape(-1, 2)
+            return
+        encoded = self.tokenizer(list(texts), add_special_tokens=False, return_offsets_mapping=True,
+                                 return_attention_mask=False, return_token_type_ids=False, verbose=False)
+        for offsets in encoded["offset_mapping"]:
+            offsets = np.asarray(offsets, dtype="int64").reshape(-1, 2)
+            # Boş (0, 0) ofsetli tokenlar metinde yer kaplamaz
+            yield offsets[offsets[:, 1] > offsets[:, 0]]
+
+    def split_many(self, texts):
+        """Her belge için (başlangıç, bitiş) karakter aralıkları listesi döndürür"""
+        result = []
+        for text, offsets in zip(texts, self._token_offsets(texts)):
+            starts, ends = offsets[:, 0], offsets[:, 1]
+            sentence_cuts = _cuts(starts, sentence_starts(text)) if self.snap_sentences else _cuts(starts, [])
+            # Alt kelime tokenları arasında bölünmesin diye kelime başları da sınır sayılır
+            word_cuts = _cuts(starts, np.fromiter((m.start() for m in _WORD.finditer(text)), dtype="int64"))
+            result.append(_windows(starts, ends, sentence_cuts, word_cuts, self.max_tokens, self.overlap))
+        return result
+
+    def split(self, text):
+        return self.split_many([text])[0]
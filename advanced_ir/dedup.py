@@ -0,0 +1,282 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import zlib
+
+import numpy as np
+
+from chunk_store import replace_dir
+
+logger = logging.getLogger(__name__)
+
+VECTOR_IDS_FILE = "vector_ids.npy"
+KEYS_FILE = "keys.npy"
+SIGNATURES_FILE = "signatures.npy"
+META_FILE = "meta.json"
+
+KEY_BYTES = 16
+
+# MinHash için (a * x + b) mod p ailesi; p Mersenne asalı, çarpım uint64'e sığar
+_PRIME = (1 << 31) - 1
+# Bant satırlarını tek 64 bit özete katlamak için çarpan
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_WORD = re.compile(r"\w+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _shingle_hashes(words, size=3):
+    """Kelime n-gram'larının (shingle) 32 bit özetleri"""
+    if len(words) <= size:
+        return [zlib.crc32(" ".join(words).encode("utf-8"))]
+    return [zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)]
+
+
+class ChunkDeduplicator:
+    """Birebir ve neredeyse aynı chunk'ları kodlamadan önce tek vektörde birleştirir.
+
+    Normalize edilmiş metnin MD5'i birebir kopyaları, kelime 3-gram'larının
+    MinHash imzası ve LSH bantları neredeyse aynı olanları bulur; aday
+    çiftler tahmini Jaccard benzerliği threshold'u geçerse kopya sayılır.
+    Kopya chunk'lar asıl chunk'ın vektör ID'sini paylaşır, böylece her kaynak
+    belge kendi chunk satırını (ve belge filtresini) korur.
+
+    İmzalar ve anahtarlar satır başına bir kayıtlık numpy tablolarında, LSH
+    bantları bant başına sıralı (özet, satır) dizilerinde tutulur; yalnızca
+    son eklenen satırlar küçük sözlüklerdedir ve belli bir sayıyı geçince
+    sıralı dizilere katılır. Bellek kullanımı yine tekil vektör sayısıyla
+    büyür (varsayılan num_perm=64 için tekil chunk başına ~0.8 KB, milyon
+    tekil chunk için ~800 MB); bu bellek ayrılamıyorsa --no-dedup kullanın.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=64, bands=16, seed=1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) bant sayısına ({bands}) tam bölünmeli")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, num_perm, dtype="uint64")
+        self._b = rng.integers(0, _PRIME, num_perm, dtype="uint64")
+        self.exact = {}        # metin özeti → vektör ID
+        self.vectors = 0       # silinmemiş (tekil) vektör sayısı
+        # Satır tabloları; silinen satırların vektör ID'si -1 olur, kayıtta sıkıştırılır
+        self._ids = np.zeros(0, dtype="int64")
+        self._keys = np.zeros((0, KEY_BYTES), dtype="uint8")
+        self._signatures = np.zeros((0, num_perm), dtype="uint32")
+        self._count = 0
+        # İlk _indexed satırın bantları sıralı dizilerde, sonrakiler (bant özeti → satırlar) sözlüklerinde
+        self._indexed = 0
+        self._sorted = [(np.zeros(0, dtype="uint64"), np.zeros(0, dtype="int64"))] * bands
+        self._recent = [{} for _ in range(bands)]
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Son çalıştırmanın sayaçlarını sıfırlar (bkz. report)"""
+        self.stats = {"chunks": 0, "exact_duplicates": 0, "near_duplicates": 0}
+
+    def _signatures_of(self, shingle_lists):
+        """Birden fazla metnin MinHash imzalarını tek matris işlemiyle hesaplar"""
+        lengths = np.array([len(s) for s in shingle_lists])
+        x = np.fromiter((h for s in shingle_lists for h in s), dtype="uint64", count=int(lengths.sum()))
+        hashed = (self._a[:, None] * x[None, :] + self._b[:, None]) % _PRIME
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        return np.minimum.reduceat(hashed, starts, axis=1).T.astype("uint32")
+
+    def _band_hashes(self, signatures):
+        """İmza matrisinin (n, bands) bant özetleri; çakışmalar aday olarak yine imzayla doğrulanır"""
+        rows = self.num_perm // self.bands
+        columns = signatures.astype("uint64").reshape(len(signatures), self.bands, rows)
+        hashes = np.zeros((len(signatures), self.bands), dtype="uint64")
+        for r in range(rows):
+            hashes = hashes * _MIX + columns[:, :, r]
+        return hashes
+
+    def _grow(self):
+        capacity = max(1024, 2 * len(self._ids))
+        for name in ("_ids", "_keys", "_signatures"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._count] = old[:self._count]
+            setattr(self, name, new)
+
+    def _add(self, vector_id, key, signature, band_hashes):
+        if self._count == len(self._ids):
+            self._grow()
+        row = self._count
+        self._ids[row] = vector_id
+        self._keys[row] = np.frombuffer(key, dtype="uint8")
+        self._signatures[row] = signature
+        self._count += 1
+        self.vectors += 1
+        self.exact.setdefault(key, vector_id)
+        for band, band_hash in enumerate(band_hashes.tolist()):
+            self._recent[band].setdefault(band_hash, []).append(row)
+
+    def _reindex(self, force=False):
+        """Sözlüklerdeki satırlar yeterince çoğalınca bantları sıralı dizilere katar"""
+        if not force and self._count - self._indexed <= max(4096, self._indexed // 4):
+            return
+        live = np.flatnonzero(self._ids[:self._count] >= 0)
+        hashes = self._band_hashes(self._signatures[live])
+        sorted_bands = []
+        for band in range(self.bands):
+            order = np.argsort(hashes[:, band], kind="stable")
+            sorted_bands.append((hashes[order, band], live[order]))
+        self._sorted = sorted_bands
+        self._recent = [{} for _ in range(self.bands)]
+        self._indexed = self._count
+
+    def _near_match(self, signature, band_hashes, ranges):
+        """ranges: her bant için sıralı dizideki (başlangıç, bitiş) aralığı"""
+        rows = []
+        for band, band_hash in enumerate(band_hashes.tolist()):
+            lo, hi = ranges[band]
+            if hi > lo:
+                rows.append(self._sorted[band][1][lo:hi])
+            recent = self._recent[band].get(band_hash)
+            if recent:
+                rows.append(np.array(recent, dtype="int64"))
+        if not rows:
+            return None
+        rows = np.unique(np.concatenate(rows))
+        rows = rows[self._ids[rows] >= 0]
+        if not len(rows):
+            return None
+        scores = np.mean(self._signatures[rows] == signature, axis=1)
+        best = int(np.argmax(scores))
+        return int(self._ids[rows[best]]) if scores[best] >= self.threshold else None
+
+    def assign(self, metas):
+        """Chunk meta verilerini asıl/kopya olarak işaretler.
+
+        Kopyaların vector_id'si asıl chunk'ınkiyle değiştirilir ve
+        "duplicate" alanı True yapılır. Her meta için yeni bir vektör
+        gerekip gerekmediğini (asıl mı) gösteren listeyi döndürür.
+        """
+        words = [_words(meta["text"]) for meta in metas]
+        keys = [hashlib.md5(" ".join(w).encode("utf-8")).digest() for w in words]
+        pending = [i for i, key in enumerate(keys) if key not in self.exact]
+        signatures, band_hashes, ranges = {}, {}, {}
+        if pending:
+            pending_signatures = self._signatures_of([_shingle_hashes(words[i]) for i in pending])
+            pending_hashes = self._band_hashes(pending_signatures)
+            # Sıralı dizilerdeki aday aralıkları tüm grup için tek seferde bulunur
+            bounds = [(np.searchsorted(hashes, pending_hashes[:, band], "left"),
+                       np.searchsorted(hashes, pending_hashes[:, band], "right"))
+                      for band, (hashes, _) in enumerate(self._sorted)]
+            for j, i in enumerate(pending):
+                signatures[i] = pending_signatures[j]
+                band_hashes[i] = pending_hashes[j]
+                ranges[i] = [(lo[j], hi[j]) for lo, hi in bounds]
+
+        unique = []
+        for i, meta in enumerate(metas):
+            self.stats["chunks"] += 1
+            match = self.exact.get(keys[i])
+            if match is not None:
+                self.stats["exact_duplicates"] += 1
+            else:
+                match = self._near_match(signatures[i], band_hashes[i], ranges[i])
+                if match is not None:
+                    self.stats["near_duplicates"] += 1
+                    # Aynı metin tekrar gelirse imza hesaplanmadan eşleşsin
+                    self.exact[keys[i]] = match
+            if match is not None:
+                meta["vector_id"] = match
+                meta["duplicate"] = True
+                unique.append(False)
+            else:
+                self._add(meta["vector_id"], keys[i], signatures[i], band_hashes[i])
+                unique.append(True)
+        self._reindex()
+        return unique
+
+    def remove(self, vector_ids):
+        """Index'ten silinen vektörleri unutur"""
+        removed = set(int(v) for v in vector_ids)
+        if not removed:
+            return
+        rows = np.flatnonzero(np.isin(self._ids[:self._count], np.fromiter(removed, dtype="int64")))
+        self._ids[rows] = -1
+        self.vectors -= len(rows)
+        # Kopyalardan gelen ek özetler de silinen vektörleri gösterebilir
+        self.exact = {key: v for key, v in self.exact.items() if v not in removed}
+
+    def report(self, total_chunks=None, total_vectors=None):
+        """Tekilleştirme özeti.
+
+        chunks/vectors index'in tamamını, last_run ise son build/güncellemede
+        işlenen chunk'ları ve bulunan kopyaları anlatır.
+        """
+        chunks = self.stats["chunks"] if total_chunks is None else total_chunks
+        vectors = self.vectors if total_vectors is None else total_vectors
+        return {
+            "chunks": chunks,
+            "vectors": vectors,
+            "duplicates": chunks - vectors,
+            "saved_ratio": (chunks - vectors) / chunks if chunks else 0.0,
+            "threshold": self.threshold,
+            "last_run": dict(self.stats)
+        }
+
+    # ================= KAYIT ================= #
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        live = np.flatnonzero(self._ids[:self._count] >= 0)
+        live = live[np.argsort(self._ids[live], kind="stable")]
+        np.save(os.path.join(tmp_path, VECTOR_IDS_FILE), self._ids[live])
+        np.save(os.path.join(tmp_path, KEYS_FILE), self._keys[live])
+        np.save(os.path.join(tmp_path, SIGNATURES_FILE), self._signatures[live])
+        with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"threshold": self.threshold, "num_perm": self.num_perm,
+                       "bands": self.bands, "seed": self.seed}, f)
+        replace_dir(tmp_path, path)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    @classmethod
+    def load(cls, path, threshold=None):
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        dedup = cls(threshold if threshold is not None else meta["threshold"],
+                    meta["num_perm"], meta["bands"], meta["seed"])
+        dedup._ids = np.load(os.path.join(path, VECTOR_IDS_FILE)).astype("int64")
+        dedup._keys = np.load(os.path.join(path, KEYS_FILE)).reshape(-1, KEY_BYTES)
+        dedup._signatures = np.load(os.path.join(path, SIGNATURES_FILE)).reshape(-1, dedup.num_perm)
+        dedup._count = dedup.vectors = len(dedup._ids)
+        keys = dedup._keys.view(f"V{KEY_BYTES}").ravel().tolist()
+        for vector_id, key in zip(dedup._ids.tolist(), keys):
+            dedup.exact.setdefault(key, vector_id)
+        dedup._reindex(force=True)
+        return dedup
+
+    @classmethod
+    def from_chunks(cls, rows, threshold=0.85, batch_size=1024):
+        """Tekilleştirme bilgisi olmayan bir index için durumu chunk'lardan kurar"""
+        dedup = cls(threshold)
+        seen = set()
+        batch = []
+        for row in rows:
+            if row["vector_id"] in seen:
+                continue
+            seen.add(row["vector_id"])
+            batch.append({"vector_id": row["vector_id"], "text": row["text"]})
+            if len(batch) >= batch_size:
+                dedup.assign(batch)
+                batch = []
+        if batch:
+            dedup.assign(batch)
+        dedup.reset_stats()
+        return dedup
@@ -0,0 +1,151 @@
+import logging
+import os
+import shutil
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CENTROIDS_FILE = "centroids.npy"
+DOC_IDS_FILE = "doc_ids.npy"
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype("float32")
+
+
+def document_centroids(vectors, max_centroids=4, chunks_per_centroid=32, iterations=8):
+    """Bir belgenin chunk vektörlerinden birim uzunlukta merkez vektörleri.
+
+    Kısa belgeler tek merkezle (ortalama yön) temsil edilir; uzun belgeler
+    her chunks_per_centroid chunk için bir merkez olacak şekilde (en fazla
+    max_centroids) küresel k-means ile bölümlere ayrılır. Başlangıç
+    merkezleri belgeye eşit aralıklarla yayılmış chunk'lardır.
+    """
+    unit = _unit(np.asarray(vectors, dtype="float32"))
+    count = min(max_centroids, max(1, -(-len(unit) // chunks_per_centroid)))
+    if count == 1:
+        return _unit(unit.mean(axis=0, keepdims=True))
+    centers = unit[np.linspace(0, len(unit) - 1, count).round().astype(int)]
+    for _ in range(iterations):
+        assign = np.argmax(unit @ centers.T, axis=1)
+        for c in range(count):
+            members = unit[assign == c]
+            # Boş kalan küme önceki merkezini korur
+            if len(members):
+                centers[c] = members.mean(axis=0)
+        centers = _unit(centers)
+    return centers
+
+
+class CentroidBuilder:
+    """Akış halinde gelen chunk vektörlerinden belge merkezlerini hesaplar.
+
+    Build sırasında bir belgenin chunk'ları ardışık gelir ve belge ID'leri
+    artar; daha büyük ID'li bir belgenin vektörü geldiğinde öncekiler
+    tamamlanmış sayılır. Bellekte yalnızca tamamlanmamış belgelerin
+    vektörleri tutulur.
+    """
+
+    def __init__(self, max_centroids=4, chunks_per_centroid=32):
+        self.max_centroids = max_centroids
+        self.chunks_per_centroid = chunks_per_centroid
+        self._pending = {}
+        self._doc_ids = []
+        self._centroids = []
+
+    def add(self, doc_ids, vectors):
+        doc_ids = np.asarray(doc_ids, dtype="int64")
+        if not len(doc_ids):
+            return
+        for doc_id in np.unique(doc_ids).tolist():
+            self._pending.setdefault(doc_id, []).append(vectors[doc_ids == doc_id])
+        last = int(doc_ids.max())
+        for doc_id in sorted(d for d in self._pending if d < last):
+            self._finish(doc_id)
+
+    def _finish(self, doc_id):
+        centers = document_centroids(np.vstack(self._pending.pop(doc_id)), self.max_centroids,
+                                     self.chunks_per_centroid)
+        self._doc_ids.extend([doc_id] * len(centers))
+        self._centroids.append(centers)
+
+    def build(self):
+        """Kalan belgeleri tamamlar ve DocumentIndex döndürür"""
+        for doc_id in sorted(self._pending):
+            self._finish(doc_id)
+        dim = self._centroids[0].shape[1] if self._centroids else 0
+        centroids = np.vstack(self._centroids) if self._centroids else np.zeros((0, dim), dtype="float32")
+        return DocumentIndex(np.array(self._doc_ids, dtype="int64"), centroids)
+
+
+class DocumentIndex:
+    """Belge düzeyindeki index: merkez vektörleri ve her merkezin belge ID'si.
+
+    Sorgu önce bu küçük tabloda aranır (kosinüs benzerliği, belge skoru en
+    yakın merkezidir); chunk araması yalnızca seçilen belgelerde yapılır.
+    Dosyadan eşlenerek açılır, aynı makinedeki worker'lar sayfaları paylaşır.
+    """
+
+    def __init__(self, doc_ids, centroids):
+        self.doc_ids = doc_ids
+        self.centroids = centroids
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, DOC_IDS_FILE))
+
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(os.path.join(path, DOC_IDS_FILE), mmap_mode="r"),
+                   np.load(os.path.join(path, CENTROIDS_FILE), mmap_mode="r"))
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, CENTROIDS_FILE), np.asarray(self.centroids, dtype="float32"))
+        np.save(os.path.join(tmp_path, DOC_IDS_FILE), np.asarray(self.doc_ids, dtype="int64"))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def document_count(self):
+        return len(np.unique(self.doc_ids))
+
+    def keep_documents(self, doc_ids):
+        """Yalnızca verilen belgelerin merkezlerini içeren yeni index"""
+        mask = np.isin(self.doc_ids, list(doc_ids))
+        return DocumentIndex(np.asarray(self.doc_ids)[mask], np.asarray(self.centroids)[mask])
+
+    def merge(self, other):
+        if not len(other):
+            return self
+        if not len(self):
+            return other
+        return DocumentIndex(np.concatenate([self.doc_ids, other.doc_ids]),
+                             np.vstack([self.centroids, other.centroids]))
+
+    def top_documents(self, q_vec, m, allowed=None):
+        """Sorguya en yakın m belge ve benzerlikleri (büyükten küçüğe).
+
+        allowed verilirse yalnızca bu belge ID'leri arasından seçilir.
+        """
+        if not len(self):
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+        q = np.asarray(q_vec, dtype="float32").reshape(-1)
+        if len(q) != self.centroids.shape[1]:
+            raise ValueError(f"Belge merkezleri {self.centroids.shape[1]} boyutlu, sorgu {len(q)} boyutlu")
+        sims = self.centroids @ (q / max(np.linalg.norm(q), 1e-12))
+        doc_ids = np.asarray(self.doc_ids)
+        if allowed is not None:
+            sims = np.where(np.isin(doc_ids, list(allowed)), sims, -np.inf)
+        order = np.argsort(-sims, kind="stable")
+        # Her belgenin sıralamadaki ilk (en benzer) merkezi
+        _, first = np.unique(doc_ids[order], return_index=True)
+        first = np.sort(first)
+        first = first[np.isfinite(sims[order][first])][:m]
+        return doc_ids[order][first], sims[order][first]
@@ -0,0 +1,184 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf")
+
+
+# ================= METİN ÇIKARMA ================= #
+def extract_pdf_pages(source):
+    """PDF'in sayfa metinlerini sırayla döndürür (source: dosya yolu veya dosya benzeri nesne)"""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(source)
+    pages = []
+    for page in reader.pages:
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception as e:
+            logger.warning(f"Sayfa metni çıkarılırken hata oluştu: {str(e)}")
+            # Boş satır ekleyerek devam et
+            pages.append("\n")
+    return pages
+
+
+def extract_pdf_text(source):
+    """PDF metnini sayfa sayfa çıkarıp tek seferde birleştirir"""
+    return "".join(extract_pdf_pages(source))
+
+
+def extract_text(path):
+    """Desteklenen bir dosyanın metnini çıkarır"""
+    if path.endswith(".txt"):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    if path.endswith(".pdf"):
+        return extract_pdf_text(path)
+    raise ValueError(f"Desteklenmeyen dosya türü: {path}")
+
+
+def extract_bytes(name, data):
+    """Yüklenmiş bir dosyanın metnini bellekte çıkarır (geçici dosya yazılmaz)"""
+    if name.endswith(".txt"):
+        return data.decode("utf-8")
+    if name.endswith(".pdf"):
+        return extract_pdf_text(io.BytesIO(data))
+    raise ValueError(f"Desteklenmeyen dosya türü: {name}")
+
+
+# ================= METİN ÖNBELLEĞİ ================= #
+class TextCache:
+    """Çıkarılmış metinleri diskte saklar.
+
+    Anahtar; dosya yolu, boyutu, değişiklik zamanı ve içerik özetinden
+    üretilir, böylece değişmeyen PDF'ler bir daha ayrıştırılmaz.
+    """
+
+    def __init__(self, cache_dir="index/text_cache"):
+        self.cache_dir = cache_dir
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def key(self, path):
+        stat = os.stat(path)
+        content_hash = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                content_hash.update(block)
+        raw = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{content_hash.hexdigest()}"
+        return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def has(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def put(self, key, text):
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def prune(self, keys):
+        """Verilen anahtarlar dışındaki kayıtları siler; tüm dizin tarandıktan sonra çağrılır"""
+        keep = {self._path(key) for key in keys}
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith((".txt", ".tmp")) and path not in keep:
+                os.remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"Metin önbelleğinden {removed} eski kayıt silindi")
+        return removed
+
+
+# ================= PARALEL YÜKLEME ================= #
+def _extract_worker(path):
+    """Süreç havuzunda çalışan çıkarma işi; hatayı sonuç olarak döndürür"""
+    try:
+        return extract_text(path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _extract_bytes_worker(item):
+    name, data = item
+    try:
+        return extract_bytes(name, data), None
+    except Exception as e:
+        return None, str(e)
+
+
+def iter_uploaded_documents(files, workers=None):
+    """Bellekteki (isim, bayt) dosyalarını paralel ayrıştırıp (isim, metin, hata) üçlülerini sırayla üretir"""
+    files = list(files)
+    executor = None
+    if workers == 1 or len(files) <= 1:
+        extracted = map(_extract_bytes_worker, files)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        extracted = executor.map(_extract_bytes_worker, files)
+    try:
+        for (name, _), (text, error) in zip(files, extracted):
+            yield name, text, error
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def iter_documents(paths, workers=None, cache_dir="index/text_cache", prune=False):
+    """Dosyaları paralel olarak okuyup (yol, metin, hata) üçlülerini sırayla üretir.
+
+    Önbellekte bulunan dosyalar hiç ayrıştırılmaz; kalanlar bir süreç
+    havuzunda işlenir. workers=1 verilirse havuz kullanılmaz. paths veri
+    dizininin tamamıysa prune=True ile bu dosyalara ait olmayan (silinmiş
+    ya da değişmiş dosyaların) önbellek kayıtları silinir.
+    """
+    cache = TextCache(cache_dir) if cache_dir else None
+    keys = {}
+    if cache is not None:
+        for path in paths:
+            try:
+                keys[path] = cache.key(path)
+            except OSError as e:
+                logger.warning(f"{path} için önbellek anahtarı üretilemedi: {str(e)}")
+        if prune:
+            cache.prune(keys.values())
+
+    misses = [p for p in paths if p not in keys or not cache.has(keys[p])]
+    logger.info(f"Metin önbelleği: {len(paths) - len(misses)} isabet, {len(misses)} dosya ayrıştırılacak")
+
+    executor = None
+    if workers == 1 or len(misses) <= 1:
+        extracted = map(_extract_worker, misses)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        extracted = executor.map(_extract_worker, misses)
+
+    try:
+        miss_set = set(misses)
+        for path in paths:
+            if path in miss_set:
+                # map sonuçları misses sırasıyla, yani paths sırasıyla gelir
+                text, error = next(extracted)
+                if error is None and path in keys:
+                    cache.put(keys[path], text)
+                yield path, text, error
+            else:
+                yield path, cache.get(keys[path]), None
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,251 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KEY_BYTES = 16
+
+
+class EmbeddingCache:
+    """Chunk gömmeleri için diskte tutulan, içerik adresli önbellek.
+
+    Anahtar (model adı, chunk metni) çiftinin MD5 özetidir. Vektörler,
+    anahtarlar ve son kullanım damgaları bellek eşlemeli dosyalarda tutulur;
+    yazmalarda yalnızca değişen slotlar ve küçük meta dosyası güncellenir.
+    Kapasite max_entries ile sınırlıdır; dolduğunda en uzun süredir
+    kullanılmayan kayıtlar silinir.
+
+    Aynı dizini kullanan süreçler (API sunucusu ve build_index.py) dosyaları
+    paylaşır: her okuma/yazma kilit dosyası üzerinde flock altında yapılır ve
+    meta dosyasındaki sürüm değiştiyse (başka bir süreç yazdıysa) slot
+    tablosu önce diskten yeniden okunur. Böylece bir süreç, başka bir sürecin
+    yeniden kullandığı slottan yanlış vektör döndürmez.
+    """
+
+    def __init__(self, cache_dir, model_name, max_entries=200000):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.max_entries = max_entries
+        slug = model_name.replace("/", "__")
+        self.vectors_path = os.path.join(cache_dir, f"{slug}.vectors.f32")
+        self.keys_path = os.path.join(cache_dir, f"{slug}.keys.bin")
+        self.stamps_path = os.path.join(cache_dir, f"{slug}.stamps.bin")
+        self.meta_path = os.path.join(cache_dir, f"{slug}.meta.json")
+        self.lock_path = os.path.join(cache_dir, f"{slug}.lock")
+        # Eski sürümün (tümü her grupta yeniden yazılan) anahtar/damga dosyaları
+        self._legacy_paths = (os.path.join(cache_dir, f"{slug}.keys.npy"),
+                              os.path.join(cache_dir, f"{slug}.stamps.npy"))
+
+        self.dim = None
+        self.version = None
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self._reset()
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        # flock aynı süreçteki iş parçacıklarını birbirinden ayırmaz; onlar için ayrıca süreç içi kilit
+        self._thread_lock = threading.Lock()
+        self._lock_file = open(self.lock_path, "a+")
+        with self._locked():
+            self._migrate_legacy()
+            self._sync()
+
+    # ================= DEPOLAMA ================= #
+    @contextmanager
+    def _locked(self, exclusive=True):
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _reset(self):
+        self.capacity = 0
+        self.vectors = None
+        self.keys = np.zeros((0, KEY_BYTES), dtype="uint8")
+        self.stamps = np.zeros(0, dtype="int64")  # 0 = boş slot
+        self.slots = {}
+
+    def _read_meta(self):
+        if not os.path.exists(self.meta_path):
+            return None
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self):
+        """Meta dosyasını yeni sürümle yazar; diğer süreçler slot tablolarını yeniden okur"""
+        self.version = (self.version or 0) + 1
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "capacity": self.capacity,
+                       "clock": self.clock, "version": self.version}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def _map(self, capacity):
+        """Dosyaları verilen kapasiteyle (yerinde) eşler"""
+        self.vectors = np.memmap(self.vectors_path, dtype="float32", mode="r+", shape=(capacity, self.dim))
+        self.keys = np.memmap(self.keys_path, dtype="uint8", mode="r+", shape=(capacity, KEY_BYTES))
+        self.stamps = np.memmap(self.stamps_path, dtype="int64", mode="r+", shape=(capacity,))
+        self.capacity = capacity
+
+    def _sync(self):
+        """Başka bir süreç yazdıysa slot tablosunu diskten yeniden okur (kilit altında çağrılır)"""
+        try:
+            meta = self._read_meta()
+            if meta is None:
+                if self.capacity:
+                    self._reset()
+                return
+            if meta.get("version") == self.version and meta["capacity"] == self.capacity:
+                return
+            self.dim = meta["dim"]
+            self.clock = max(self.clock, meta.get("clock", 0))
+            self.version = meta.get("version", 0)
+            if meta["capacity"]:
+                self._map(meta["capacity"])
+            occupied = np.flatnonzero(self.stamps > 0)
+            self.slots = dict(zip(self.keys[occupied].view(f"V{KEY_BYTES}").ravel().tolist(), occupied.tolist()))
+            logger.info(f"Gömme önbelleği okundu: {len(self.slots)} kayıt")
+        except Exception as e:
+            logger.warning(f"Gömme önbelleği okunamadı, sıfırdan başlanıyor: {str(e)}")
+            self._reset()
+            self.dim = None
+
+    def _migrate_legacy(self):
+        """Eski .npy anahtar/damga dosyalarını yerinde büyüyebilen ham dosyalara çevirir"""
+        keys_npy, stamps_npy = self._legacy_paths
+        if not os.path.exists(keys_npy):
+            return
+        try:
+            if not os.path.exists(self.keys_path):
+                keys = np.load(keys_npy)
+                np.frombuffer(keys.tobytes(), dtype="uint8").tofile(self.keys_path)
+                np.load(stamps_npy).astype("int64").tofile(self.stamps_path)
+                meta = self._read_meta()
+                if meta is not None:
+                    meta["version"] = 1
+                    with open(self.meta_path, "w", encoding="utf-8") as f:
+                        json.dump(meta, f)
+        except Exception as e:
+            logger.warning(f"Eski gömme önbelleği dönüştürülemedi: {str(e)}")
+            for path in (self.keys_path, self.stamps_path, self.meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        for path in self._legacy_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _grow(self, needed):
+        """Kapasiteyi (max_entries sınırına kadar) ikiye katlayarak dosyaları yerinde büyütür"""
+        new_capacity = max(self.capacity, 1024)
+        while new_capacity < needed:
+            new_capacity *= 2
+        new_capacity = min(new_capacity, self.max_entries)
+        if new_capacity <= self.capacity:
+            return
+
+        self.flush()
+        self.vectors = self.keys = self.stamps = None
+        # Dosyalar uzatılır (yeni bölüm sıfırdır); diğer süreçlerin eski eşlemeleri geçerli kalır
+        for path, row_bytes in ((self.vectors_path, self.dim * 4), (self.keys_path, KEY_BYTES),
+                                (self.stamps_path, 8)):
+            with open(path, "ab") as f:
+                f.truncate(new_capacity * row_bytes)
+        self._map(new_capacity)
+
+    def _key(self, text):
+        return hashlib.md5(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def _free_slots(self, count):
+        """count adet boş slot döndürür; gerekirse büyür veya LRU kayıtları siler"""
+        if self.capacity - len(self.slots) < count:
+            self._grow(len(self.slots) + count)
+        free = np.flatnonzero(self.stamps == 0)
+        if len(free) >= count:
+            return free[:count]
+        # Kapasite dolu: en eski kayıtları çıkar
+        occupied = np.flatnonzero(self.stamps > 0)
+        evict = occupied[np.argsort(self.stamps[occupied])[:count - len(free)]]
+        for slot in evict:
+            self.slots.pop(self.keys[slot].tobytes(), None)
+            self.stamps[slot] = 0
+        logger.info(f"Gömme önbelleğinden {len(evict)} kayıt çıkarıldı")
+        return np.concatenate([free, evict])[:count]
+
+    # ================= OKUMA / YAZMA ================= #
+    def get_many(self, texts):
+        """Önbellekte bulunan vektörleri ve eksik metinlerin sıralarını döndürür"""
+        keys = [self._key(t) for t in texts]
+        found = {}
+        missing = []
+        with self._locked(exclusive=False):
+            self._sync()
+            for i, key in enumerate(keys):
+                slot = self.slots.get(key)
+                if slot is None:
+                    missing.append(i)
+                else:
+                    self.clock += 1
+                    self.stamps[slot] = self.clock
+                    found[i] = np.array(self.vectors[slot])
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, texts, vectors):
+        """Yeni gömmeleri önbelleğe yazar"""
+        if len(texts) == 0:
+            return
+        vectors = np.asarray(vectors, dtype="float32")
+        with self._locked():
+            # Bu süreç kodlarken diğerleri slotları değiştirmiş olabilir
+            self._sync()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            # Aynı metin birden fazla kez gelebilir, yalnızca yenileri yaz
+            new = {}
+            for text, vec in zip(texts, vectors):
+                key = self._key(text)
+                if key not in self.slots and key not in new:
+                    new[key] = vec
+            new_items = list(new.items())[:self.max_entries]
+            if not new_items:
+                return
+            slots = self._free_slots(len(new_items))
+            for slot, (key, vec) in zip(slots, new_items):
+                self.clock += 1
+                self.vectors[slot] = vec
+                self.keys[slot] = np.frombuffer(key, dtype="uint8")
+                self.stamps[slot] = self.clock
+                self.slots[key] = int(slot)
+            self._write_meta()
+
+    def flush(self):
+        """Eşlenen dosyaların değişen sayfalarını diske yazar (diğer süreçler yazmaları zaten görür)"""
+        for array in (self.vectors, self.keys, self.stamps):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+    def encode(self, model, texts, **encode_kwargs):
+        """Metinleri önbellek üzerinden kodlar; yalnızca eksikler modele gider"""
+        found, missing = self.get_many(texts)
+        if missing:
+            miss_texts = [texts[i] for i in missing]
+            encoded = model.encode(miss_texts, **encode_kwargs).astype("float32")
+            self.put_many(miss_texts, encoded)
+            for i, vec in zip(missing, encoded):
+                found[i] = vec
+        logger.info(f"Gömme önbelleği: {len(texts) - len(missing)} isabet, {len(missing)} kodlandı")
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype="float32")
+        return np.vstack([found[i] for i in range(len(texts))]).astype("float32")
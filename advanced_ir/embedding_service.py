@@ -0,0 +1,265 @@
+import argparse
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "index/embedding.sock"
+# Servis ile worker'ların paylaştığı anahtar; verilmezse soketin yanındaki <soket>.key dosyası kullanılır
+AUTHKEY_ENV = "ADVANCED_IR_EMBEDDING_AUTHKEY"
+
+
+def load_authkey(socket_path, create=False):
+    """Bağlantı doğrulama anahtarı: ortam değişkeni, yoksa yalnızca sahibinin okuyabildiği anahtar dosyası.
+
+    create=True ise (servis) dosya yoksa rastgele bir anahtarla 0600 izniyle oluşturulur.
+    """
+    value = os.environ.get(AUTHKEY_ENV)
+    if value:
+        return value.encode("utf-8")
+    path = socket_path + ".key"
+    if create and not os.path.exists(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    if not os.path.exists(path):
+        raise RuntimeError(f"Gömme servisi anahtarı bulunamadı: {path} (servis başlatılmamış olabilir "
+                           f"ya da {AUTHKEY_ENV} ayarlanmalı)")
+    if os.stat(path).st_mode & 0o077:
+        raise RuntimeError(f"Gömme servisi anahtar dosyasını başkaları da okuyabiliyor: {path} (izinler 0600 olmalı)")
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read().strip().encode("utf-8")
+
+
+class _Request:
+    __slots__ = ("texts", "done", "result", "error")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EmbeddingServer:
+    """Gömme modelini tek bir süreçte tutar, aynı makinedeki worker'lara Unix soketi üzerinden hizmet verir.
+
+    Bağlantılar paylaşılan anahtarla doğrulanır (bkz. load_authkey) ve soket
+    yalnızca sahibine açıktır; doğrulanmamış bir süreç isteği pickle olarak
+    gönderip serviste kod çalıştıramaz. Her bağlantı ayrı bir iş parçacığında
+    okunur; farklı worker'lardan gelen
+    istekler max_wait_ms milisaniye boyunca (veya max_batch_size metin
+    birikene kadar) toplanıp tek bir encode çağrısıyla kodlanır. Böylece
+    model ağırlıkları worker sayısından bağımsız olarak makinede bir kez
+    bellekte durur.
+    """
+
+    def __init__(self, encoder, encoder_name, socket_path=DEFAULT_SOCKET, max_batch_size=64, max_wait_ms=5,
+                 authkey=None):
+        self.encoder = encoder
+        self.encoder_name = encoder_name
+        self.socket_path = socket_path
+        self.authkey = authkey if authkey is not None else load_authkey(socket_path, create=True)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.dim = int(np.asarray(encoder.encode(["ısınma"])).shape[1])
+        self._queue = queue.Queue()
+        self._listener = None
+        self._closed = False
+        self.batches = 0
+        self.requests = 0
+
+    def serve_forever(self):
+        """Soketi açar ve kapatılana kadar bağlantı kabul eder"""
+        # Önceki (kapanmış) servisten kalan soket dosyası
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        # Soket dosyası bağlanırken de başkalarına kapalı olsun
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        os.chmod(self.socket_path, 0o600)
+        threading.Thread(target=self._run, daemon=True, name="embedding-batcher").start()
+        logger.info(f"Gömme servisi dinliyor: {self.socket_path}")
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                logger.warning("Gömme servisine doğrulanamayan bir bağlantı reddedildi")
+                continue
+            except OSError:
+                if self._closed:
+                    break
+                raise
+            threading.Thread(target=self._handle, args=(conn,), daemon=True, name="embedding-conn").start()
+
+    def close(self):
+        self._closed = True
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _handle(self, conn):
+        try:
+            _, encoder_name = conn.recv()
+            # Farklı kodlayıcının vektörleri index'teki vektörlerle karşılaştırılamaz
+            if encoder_name != self.encoder_name:
+                conn.send((False, f"Kodlayıcı uyuşmuyor: servis {self.encoder_name}, istemci {encoder_name}"))
+                return
+            conn.send((True, self.dim))
+            while True:
+                request = _Request(conn.recv())
+                self._queue.put(request)
+                request.done.wait()
+                if request.error is not None:
+                    conn.send((False, request.error))
+                else:
+                    conn.send((True, request.result))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """İlk isteği bekler, ardından süre/boyut sınırına kadar yenilerini toplar"""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                vectors = np.asarray(self.encoder.encode(texts), dtype="float32")
+                offset = 0
+                for request in batch:
+                    request.result = vectors[offset:offset + len(request.texts)]
+                    offset += len(request.texts)
+            except Exception as e:
+                logger.exception("Gömme grubu kodlanamadı")
+                for request in batch:
+                    request.error = f"{type(e).__name__}: {e}"
+            self.batches += 1
+            self.requests += len(batch)
+            for request in batch:
+                request.done.set()
+
+
+class RemoteEncoder:
+    """Gömme servisinin istemcisi; yerel modelle aynı encode arayüzünü sunar, modeli yüklemez.
+
+    Her iş parçacığı boştaki bir bağlantıyı kullanır (yoksa yenisi açılır).
+    Servis yeniden başlatıldıysa istek yeni bir bağlantıyla bir kez daha
+    denenir.
+    """
+
+    # Chunker tokenizer'ı kendisi yükler (bkz. TokenChunker.for_model)
+    tokenizer = None
+
+    def __init__(self, socket_path, encoder_name, authkey=None):
+        self.socket_path = socket_path
+        self.encoder_name = encoder_name
+        self.authkey = authkey if authkey is not None else load_authkey(socket_path)
+        self.dim = None
+        self._idle = []
+        self._lock = threading.Lock()
+        # Servis yoksa ya da kodlayıcı uyuşmuyorsa ilk istekte değil burada hata verilir
+        self._release(self._connect())
+
+    def _connect(self):
+        try:
+            conn = Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise RuntimeError(f"Gömme servisine bağlanılamadı ({self.socket_path}): {e}") from None
+        except AuthenticationError:
+            raise RuntimeError(f"Gömme servisi bağlantıyı doğrulamadı ({self.socket_path}): anahtar uyuşmuyor") from None
+        conn.send(("hello", self.encoder_name))
+        ok, value = conn.recv()
+        if not ok:
+            conn.close()
+            raise RuntimeError(value)
+        self.dim = value
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def _release(self, conn):
+        with self._lock:
+            self._idle.append(conn)
+
+    def encode(self, texts, **kwargs):
+        """Metinleri servise gönderip vektörlerini döndürür (kwargs yok sayılır; gruplama serviste yapılır)"""
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, self.dim), dtype="float32")
+        for attempt in range(2):
+            conn = self._acquire()
+            try:
+                conn.send(texts)
+                ok, value = conn.recv()
+            except (EOFError, OSError):
+                conn.close()
+                if attempt:
+                    raise RuntimeError("Gömme servisi bağlantısı koptu") from None
+                continue
+            self._release(conn)
+            if not ok:
+                raise RuntimeError(value)
+            return value
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gömme modelini tek süreçte yükleyip aynı makinedeki worker'lara Unix soketiyle sunar")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Dinlenecek Unix soketi")
+    parser.add_argument("--encoder", choices=("torch", "onnx"), default="torch", help="Gömme modeli arka ucu")
+    parser.add_argument("--max-batch-size", type=int, default=64, help="Tek encode çağrısındaki en fazla metin")
+    parser.add_argument("--max-wait-ms", type=float, default=5, help="İstekleri toplama süresi (ms)")
+    args = parser.parse_args()
+
+    from search_engine import SearchEngine
+
+    engine = SearchEngine(encoder_backend=args.encoder, embedding_cache_dir=None,
+                          query_cache_size=0, result_cache_size=0)
+    start = time.perf_counter()
+    server = EmbeddingServer(engine.model, engine.encoder_name, args.socket, args.max_batch_size, args.max_wait_ms)
+    print(f"🧠 Gömme servisi hazır: {args.socket} ({engine.encoder_name}, "
+          f"{time.perf_counter() - start:.1f} sn)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
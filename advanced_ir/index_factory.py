@@ -0,0 +1,180 @@
+import logging
+
+from startup import lazy_import
+
+logger = logging.getLogger(__name__)
+
+faiss = lazy_import("faiss")
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# Vektörlerin saklanma biçimi (ivf_pq kendi sıkıştırmasını kullanır)
+ENCODINGS = ("fp32", "fp16", "int8")
+
+DEFAULT_INDEX_PARAMS = {
+    "nlist": 1024,          # IVF küme sayısı
+    "nprobe": 16,           # IVF sorguda taranacak küme sayısı
+    "pq_m": 16,             # PQ alt vektör sayısı (boyutu tam bölmeli)
+    "pq_nbits": 8,          # PQ alt vektör başına bit
+    "hnsw_m": 32,           # HNSW komşu sayısı
+    "ef_construction": 200,
+    "ef_search": 64,
+    "train_size": 50000,    # Eğitim için toplanacak en fazla vektör
+    "encoding": "fp32",     # fp16: yarı bellek, int8: dörtte bir bellek (skaler nicemleme)
+    "pca_dim": 0            # 0'dan büyükse vektörler PCA ile bu boyuta indirilir
+}
+
+
+def resolve_params(index_params=None):
+    params = dict(DEFAULT_INDEX_PARAMS)
+    if index_params:
+        params.update(index_params)
+    return params
+
+
+def needs_training(index_type, params=None):
+    params = params or DEFAULT_INDEX_PARAMS
+    return (index_type in ("ivf_flat", "ivf_pq") or params.get("encoding") == "int8" or
+            bool(params.get("pca_dim")))
+
+
+def _scalar_quantizer(encoding):
+    if encoding == "fp16":
+        return faiss.ScalarQuantizer.QT_fp16
+    return faiss.ScalarQuantizer.QT_8bit
+
+
+def create_index(index_type, dim, params, train_vectors=None):
+    """Yapılandırmaya göre boş (gerekirse eğitilmiş) bir FAISS index'i oluşturur.
+
+    Dönen index add_with_ids ile stabil chunk ID'lerini kabul eder ve
+    reconstruct(vector_id) destekler. Gerçekte kullanılan parametreler
+    (örn. küçük derlemde kısılan nlist) params içine yazılır. encoding
+    fp16/int8 ise vektörler skaler nicemlenir; pca_dim verilirse önce PCA
+    ile boyut indirgenir (reconstruct yaklaşık vektör döndürür).
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Bilinmeyen index türü: {index_type} (seçenekler: {', '.join(INDEX_TYPES)})")
+    encoding = params.get("encoding", "fp32")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Bilinmeyen vektör kodlaması: {encoding} (seçenekler: {', '.join(ENCODINGS)})")
+    if index_type == "ivf_pq" and encoding != "fp32":
+        logger.warning("IVF-PQ kendi sıkıştırmasını kullanır, encoding yok sayılıyor")
+        encoding = params["encoding"] = "fp32"
+
+    n_train = 0 if train_vectors is None else len(train_vectors)
+    pca_dim = params.get("pca_dim") or 0
+    if pca_dim and (pca_dim >= dim or n_train < pca_dim):
+        logger.warning(f"PCA uygulanamıyor (boyut {dim} -> {pca_dim}, {n_train} eğitim vektörü), atlanıyor")
+        pca_dim = params["pca_dim"] = 0
+    inner_dim = pca_dim or dim
+
+    if index_type == "flat":
+        if encoding == "fp32":
+            index = faiss.IndexFlatL2(inner_dim)
+        else:
+            index = faiss.IndexScalarQuantizer(inner_dim, _scalar_quantizer(encoding), faiss.METRIC_L2)
+    elif index_type == "hnsw":
+        if encoding == "fp32":
+            index = faiss.IndexHNSWFlat(inner_dim, params["hnsw_m"])
+        else:
+            index = faiss.IndexHNSWSQ(inner_dim, _scalar_quantizer(encoding), params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+    else:
+        index = _create_ivf(index_type, inner_dim, params, encoding, n_train)
+
+    if pca_dim:
+        index = faiss.IndexPreTransform(faiss.PCAMatrix(dim, pca_dim), index)
+    if index_type in ("flat", "hnsw"):
+        index = faiss.IndexIDMap2(index)
+    if n_train and needs_training(index_type, params):
+        index.train(train_vectors)
+    ivf = _ivf(index)
+    if ivf is not None:
+        # reconstruct(vector_id) ve remove_ids için ID → konum tablosu
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def _create_ivf(index_type, dim, params, encoding, n_train):
+    """Eğitilmemiş bir IVF index'i; nlist eğitim verisine göre kısılır (küme başına ~39 nokta)"""
+    nlist = max(1, min(params["nlist"], n_train // 39))
+    if nlist != params["nlist"]:
+        logger.warning(f"Eğitim verisi az ({n_train} vektör), nlist {params['nlist']} -> {nlist}")
+        params["nlist"] = nlist
+
+    if index_type == "ivf_pq" and n_train < 2 ** params["pq_nbits"]:
+        logger.warning(f"IVF-PQ için eğitim verisi yetersiz ({n_train} vektör), IVF-Flat kullanılıyor")
+        index_type = "ivf_flat"
+        params["index_type"] = index_type
+
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_pq":
+        if dim % params["pq_m"] != 0:
+            raise ValueError(f"pq_m ({params['pq_m']}) vektör boyutunu ({dim}) tam bölmeli")
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, params["pq_m"], params["pq_nbits"])
+    elif encoding == "fp32":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, _scalar_quantizer(encoding))
+    index.nprobe = params["nprobe"]
+    return index
+
+
+def apply_defaults(index, params):
+    """Diskten okunan index'e kayıtlı sorgu parametrelerini uygular"""
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf.nprobe = params.get("nprobe", DEFAULT_INDEX_PARAMS["nprobe"])
+    hnsw = _hnsw(index)
+    if hnsw is not None:
+        hnsw.hnsw.efSearch = params.get("ef_search", DEFAULT_INDEX_PARAMS["ef_search"])
+
+
+def search_parameters(index, nprobe=None, ef_search=None, sel=None):
+    """Sorgu bazlı ayarlardan FAISS SearchParameters nesnesi üretir (gerekmiyorsa None).
+
+    sel verilirse arama yalnızca seçicinin kabul ettiği ID'lerle sınırlanır.
+    """
+    ivf = _ivf(index)
+    hnsw = _hnsw(index)
+    if ivf is not None and (nprobe is not None or sel is not None):
+        params = faiss.SearchParametersIVF(nprobe=nprobe or ivf.nprobe)
+    elif hnsw is not None and (ef_search is not None or sel is not None):
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or hnsw.hnsw.efSearch)
+    elif sel is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if sel is not None:
+        params.sel = sel
+    return params
+
+
+def supports_remove(index):
+    return _hnsw(index) is None
+
+
+def _ivf(index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def _hnsw(index):
+    inner = index
+    while isinstance(inner, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+        inner = faiss.downcast_index(inner.index)
+    return inner if isinstance(inner, faiss.IndexHNSW) else None
+
+
+def read_index(path, mmap=False):
+    """Index'i okur; mmap=True ise vektör kodları kopyalanmadan dosyadan eşlenir.
+
+    Eşlenen index salt okunurdur; üzerinde add/remove yapılmamalıdır.
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    return faiss.read_index(path, flag)
@@ -0,0 +1,141 @@
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+GENERATIONS_DIR = "generations"
+
+
+# ================= OKUMA/YAZMA KİLİDİ ================= #
+class RWLock:
+    """Çok okuyuculu, tek yazıcılı kilit; bekleyen yazıcı yeni okuyucuları durdurur"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+# ================= NESİLLER ================= #
+def read_current(root):
+    """Yayındaki nesil adını döndürür (yoksa None)"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def generation_dir(root, name):
+    return os.path.join(root, GENERATIONS_DIR, name)
+
+
+def new_generation(root):
+    """Yayınlanmamış yeni bir nesil dizini oluşturur ve adını döndürür"""
+    base = os.path.join(root, GENERATIONS_DIR)
+    os.makedirs(base, exist_ok=True)
+    numbers = [int(n.split("-")[1]) for n in os.listdir(base)
+               if n.startswith("gen-") and n.split("-")[1].isdigit()]
+    number = max(numbers, default=0) + 1
+    while True:
+        name = f"gen-{number:06d}"
+        try:
+            os.makedirs(generation_dir(root, name))
+            return name
+        except FileExistsError:
+            # Başka bir süreç aynı numarayı aldı
+            number += 1
+
+
+def publish(root, name, keep=3):
+    """CURRENT işaretçisini atomik olarak yeni nesle çevirir ve eski nesilleri temizler"""
+    tmp_path = os.path.join(root, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+    logger.info(f"Index nesli yayınlandı: {name}")
+    prune(root, keep)
+
+
+def discard(root, name):
+    """Yayınlanmamış (yarım kalmış) bir nesli siler"""
+    shutil.rmtree(generation_dir(root, name), ignore_errors=True)
+
+
+def prune(root, keep=3):
+    """En yeni keep nesil ve yayındaki nesil dışındakileri siler"""
+    base = os.path.join(root, GENERATIONS_DIR)
+    if not os.path.isdir(base):
+        return
+    current = read_current(root)
+    names = sorted(n for n in os.listdir(base) if n.startswith("gen-"))
+    for name in names[:-keep] if keep else names:
+        if name != current:
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+# ================= İZLEYİCİ ================= #
+class GenerationWatcher(threading.Thread):
+    """CURRENT işaretçisini belirli aralıklarla okur; değişince callback'i çağırır.
+
+    Sorgu yolunda dosya sistemi kontrolü yapılmaz; yalnızca bu iş parçacığı
+    interval saniyede bir küçük bir dosya okur.
+    """
+
+    def __init__(self, root, get_loaded, callback, interval=2.0):
+        super().__init__(daemon=True)
+        self.root = root
+        self.get_loaded = get_loaded
+        self.callback = callback
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                current = read_current(self.root)
+                if current is not None and current != self.get_loaded():
+                    logger.info(f"Yeni index nesli bulundu: {current}")
+                    self.callback(current)
+            except Exception as e:
+                logger.error(f"Index nesli yüklenemedi: {str(e)}")
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from document_loader import SUPPORTED_EXTENSIONS, iter_documents, iter_uploaded_documents
+
+logger = logging.getLogger(__name__)
+
+# İş aşamaları (sırasıyla)
+STAGES = ("queued", "parsing", "indexing", "publishing", "done", "failed")
+
+
+class JobQueueFull(RuntimeError):
+    """Bekleyen iş sayısı sınıra ulaştı"""
+
+
+class IndexJob:
+    """Bir arka plan index işinin durumu ve ilerlemesi"""
+
+    def __init__(self, uploads, paths, rebuild):
+        self.id = uuid.uuid4().hex[:12]
+        self.uploads = uploads
+        self.paths = paths
+        self.rebuild = rebuild
+        self.stage = "queued"
+        self.documents_total = len(uploads) + len(paths)
+        self.documents_parsed = 0
+        self.documents_indexed = 0
+        self.chunks = 0
+        self.vectors = 0
+        self.chunks_per_sec = 0.0
+        self.eta_seconds = None
+        self.errors = []
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def progress(self, stats):
+        """build_index_stream/update_documents ilerleme istatistiklerini işler"""
+        self.documents_indexed = stats["documents"]
+        self.chunks = stats["chunks"]
+        self.vectors = stats.get("vectors", stats["chunks"])
+        self.chunks_per_sec = stats["chunks_per_sec"]
+        elapsed = stats["elapsed"]
+        if "total_chunks" in stats:
+            # Artımlı güncelleme: kodlanacak chunk sayısı baştan bilinir
+            remaining = stats["total_chunks"] - stats["chunks"]
+            self.eta_seconds = remaining / self.chunks_per_sec if self.chunks_per_sec > 0 else None
+        elif self.documents_indexed:
+            # Akışlı oluşturma: chunk sayısı bilinmez, kalan belge oranından tahmin edilir
+            remaining = max(self.documents_total - len(self.errors) - self.documents_indexed, 0)
+            self.eta_seconds = elapsed / self.documents_indexed * remaining
+
+    def to_dict(self):
+        now = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "stage": self.stage,
+            "rebuild": self.rebuild,
+            "documents_total": self.documents_total,
+            "documents_parsed": self.documents_parsed,
+            "documents_indexed": self.documents_indexed,
+            "chunks_embedded": self.chunks,
+            "vectors": self.vectors,
+            "chunks_per_sec": round(self.chunks_per_sec, 1),
+            "eta_seconds": round(self.eta_seconds, 1) if self.eta_seconds is not None else None,
+            "elapsed_seconds": round(now - self.started_at, 1) if self.started_at else 0.0,
+            "errors": list(self.errors),
+            "error": self.error,
+            "result": self.result,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+
+
+class IndexJobManager:
+    """Index oluşturma/güncelleme işlerini sınırlı bir arka plan havuzunda çalıştırır.
+
+    İşler sırayla (varsayılan tek worker) çalışır, böylece aynı anda tek bir
+    yeni nesil yazılır; en fazla max_pending iş bekleyebilir. Yüklenen
+    dosyalar bellekte, ayrı süreçlerde ayrıştırılır. Bitmiş index yeni bir
+    nesil olarak yayınlanır ve motor onu aramaları kesmeden devreye alır.
+    """
+
+    def __init__(self, engine, workers=1, max_pending=4, parse_workers=None, keep=100):
+        self.engine = engine
+        self.max_pending = max_pending
+        self.parse_workers = parse_workers
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, uploads=(), paths=(), rebuild=False):
+        """Yeni bir iş kuyruğa ekler; uploads (isim, bayt), paths dosya yollarıdır"""
+        uploads, paths = list(uploads), list(paths)
+        if not uploads and not paths:
+            raise ValueError("İşlenecek dosya verilmedi")
+        for name in [n for n, _ in uploads] + paths:
+            if not name.endswith(SUPPORTED_EXTENSIONS):
+                raise ValueError(f"{name} desteklenmiyor (sadece .txt ve .pdf desteklenir)")
+        job = IndexJob(uploads, paths, rebuild)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j.stage == "queued")
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Kuyrukta {pending} iş bekliyor, daha sonra tekrar deneyin")
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _prune(self):
+        finished = [j.id for j in self._jobs.values() if j.stage in ("done", "failed")]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+    def _parsed(self, job):
+        """Dosyaları ayrıştırıp (isim, metin) çiftleri üretir; hatalı dosyalar atlanıp kaydedilir"""
+        sources = [iter_uploaded_documents(job.uploads, self.parse_workers)]
+        if job.paths:
+            sources.append((os.path.basename(path), text, error)
+                           for path, text, error in iter_documents(job.paths, self.parse_workers))
+        for source in sources:
+            for name, text, error in source:
+                if error is not None:
+                    job.errors.append({"name": name, "error": error})
+                    logger.warning(f"{name} ayrıştırılamadı: {error}")
+                    continue
+                job.documents_parsed += 1
+                yield name, text
+        # Yüklenen baytlar ayrıştırıldıktan sonra tutulmaz
+        job.uploads = []
+
+    @staticmethod
+    def _nothing_indexed(job):
+        if not job.documents_parsed:
+            return "Hiçbir dosya ayrıştırılamadı"
+        return "Index oluşturulacak içerik bulunamadı"
+
+    def _run(self, job):
+        job.started_at = time.time()
+        published = []
+
+        def publishing(generation):
+            # Motor yeni nesli yayınlamak üzere; yayından sonra kendisi devreye alır
+            job.stage = "publishing"
+            published.append(generation)
+
+        try:
+            if job.rebuild:
+                # Belgeler ayrıştırıldıkça chunk'lanıp gömülür
+                job.stage = "indexing"
+                self.engine.build_index_stream(self._parsed(job), progress_callback=job.progress,
+                                               publish_callback=publishing)
+                if not published:
+                    raise ValueError(self._nothing_indexed(job))
+                job.result = {"documents": len(self.engine.doc_metadata)}
+            else:
+                job.stage = "parsing"
+                names, texts = [], []
+                for name, text in self._parsed(job):
+                    names.append(name)
+                    texts.append(text)
+                if not texts:
+                    raise ValueError(self._nothing_indexed(job))
+                job.stage = "indexing"
+                job.result = self.engine.update_documents(texts, names, progress_callback=job.progress,
+                                                          publish_callback=publishing)
+                # Değişmeyen belgeler yeni nesil gerektirmez; değişiklik varken yayın yoksa içerik bulunamamıştır
+                if not published and (job.result["added"] or job.result["updated"]):
+                    raise ValueError(self._nothing_indexed(job))
+            job.stage = "done"
+            job.eta_seconds = 0.0
+            logger.info(f"Index işi tamamlandı: {job.id}")
+        except Exception as e:
+            job.stage = "failed"
+            job.error = str(e)
+            logger.exception(f"Index işi başarısız: {job.id}")
+        finally:
+            job.finished_at = time.time()
+            job.uploads = []
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
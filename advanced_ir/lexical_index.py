@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import re
+import shutil
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from chunk_store import replace_dir
+
+logger = logging.getLogger(__name__)
+
+TERMS_FILE = "terms.json"
+OFFSETS_FILE = "offsets.npy"
+POSTINGS_FILE = "postings.npy"
+WEIGHTS_FILE = "weights.npy"
+IDF_FILE = "idf.npy"
+MAX_WEIGHTS_FILE = "max_weights.npy"
+# Posting başına terim frekansı ve chunk başına (vektör ID'si, uzunluk); güncellemelerde
+# ağırlıklar metinler yeniden tokenize edilmeden bunlardan hesaplanır (eski index'lerde yok)
+TFS_FILE = "tfs.npy"
+CHUNKS_FILE = "chunks.npy"
+LENGTHS_FILE = "lengths.npy"
+META_FILE = "meta.json"
+
+# Türkçe için ilk 5 harfe kırpma (F5) basit ama etkili bir gövdeleme yöntemidir
+STEM_LENGTH = 5
+
+STOPWORDS = frozenset("""
+acaba ama ancak bazı bu bir biri birkaç birçok böyle da daha de defa diye en gibi hem hep
+her hiç için ile ise kadar ki kim mi mu mü mı na ne neden nasıl niye o olan olarak sadece
+şu şey tüm ve veya ya yani çok çünkü göre sonra önce kendi
+""".split())
+
+_TURKISH_LOWER = str.maketrans({"I": "ı", "İ": "i"})
+# Kesme işaretinden sonraki ekler (Ankara'nın → ankara)
+_APOSTROPHE_SUFFIX = re.compile(r"['’]\w+")
+# Harf/rakam dizileri; AB-123, 3.5 gibi kodlar tek terim olarak kalır
+_TOKEN = re.compile(r"[^\W_]+(?:[-./][^\W_]+)*")
+
+
+def tokenize(text, stem=True):
+    """Türkçe büyük/küçük harf kurallarıyla metni terimlere ayırır"""
+    text = _APOSTROPHE_SUFFIX.sub("", text.translate(_TURKISH_LOWER).lower())
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if token in STOPWORDS:
+            continue
+        if stem and token.isalpha():
+            token = token[:STEM_LENGTH]
+        tokens.append(token)
+    return tokens
+
+
+def bm25_idf(n_chunks, df):
+    """BM25 idf değeri (df: terimi içeren chunk sayısı)"""
+    return np.log(1 + (n_chunks - df + 0.5) / (df + 0.5))
+
+
+class LexicalIndex:
+    """Chunk'lar üzerinde bellek eşlemeli BM25 ters index'i.
+
+    Her terimin posting listesi (vektör ID'leri, artan sırada) ve önceden
+    hesaplanmış BM25 terim frekansı ağırlıkları tek dizilerde art arda tutulur;
+    terimin listesi offsets ile bulunur. Skor = idf * ağırlık.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(path, TERMS_FILE), "r", encoding="utf-8") as f:
+            self.term_ids = {term: i for i, term in enumerate(json.load(f))}
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self.postings = np.load(os.path.join(path, POSTINGS_FILE), mmap_mode="r")
+        self.weights = np.load(os.path.join(path, WEIGHTS_FILE), mmap_mode="r")
+        self.idf = np.load(os.path.join(path, IDF_FILE))
+        self.max_weights = np.load(os.path.join(path, MAX_WEIGHTS_FILE))
+        self.stem = self.meta.get("stem", True)
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    def __len__(self):
+        return self.meta["chunks"]
+
+    def can_carry_over(self):
+        """Posting'ler yeniden tokenize edilmeden yeni bir index'e devredilebilir mi"""
+        return all(os.path.exists(os.path.join(self.path, name)) for name in (TFS_FILE, CHUNKS_FILE, LENGTHS_FILE))
+
+    def _posting(self, term_id):
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.postings[start:end], self.weights[start:end]
+
+    def _query_terms(self, query):
+        """Sorgunun index'te geçen (tekil) terimleri"""
+        return [t for t in set(tokenize(query, self.stem)) if t in self.term_ids]
+
+    def term_stats(self, query):
+        """(chunk sayısı, terim → df) ikilisi; shard'lar arası ortak idf hesabı içindir"""
+        df = {}
+        for term in self._query_terms(query):
+            term_id = self.term_ids[term]
+            df[term] = int(self.offsets[term_id + 1] - self.offsets[term_id])
+        return len(self), df
+
+    def search(self, query, k=5, allowed=None, idf=None):
+        """BM25'e göre en iyi k chunk'ın (vektör ID'leri, skorlar) dizilerini döndürür.
+
+        Terimler üst sınır skorlarına göre büyükten küçüğe işlenir (MaxScore).
+        Kalan terimlerin üst sınırları toplamı k'ıncı skorun altına düşünce
+        yeni aday eklenmez, yalnızca mevcut adayların skorları tamamlanır ve
+        eşiğe ulaşamayacak adaylar elenir. allowed verilirse yalnızca bu
+        vektör ID'leri aranır. idf (terim → değer) verilirse index'in kendi
+        idf'leri yerine kullanılır (bkz. sharding.py).
+        """
+        empty = (np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32"))
+        tokens = self._query_terms(query)
+        if not tokens or k <= 0:
+            return empty
+        terms = np.array([self.term_ids[t] for t in tokens])
+        if idf is None:
+            term_idf = self.idf[terms]
+        else:
+            term_idf = np.array([idf.get(t, self.idf[i]) for t, i in zip(tokens, terms)], dtype="float32")
+        bounds = term_idf * self.max_weights[terms]
+        order = np.argsort(-bounds)
+        terms, bounds, term_idf = terms[order], bounds[order], term_idf[order]
+        remaining = np.cumsum(bounds[::-1])[::-1]  # i. ve sonraki terimlerin üst sınırları toplamı
+
+        cand_ids = np.zeros(0, dtype="int64")
+        cand_scores = np.zeros(0, dtype="float32")
+        threshold = 0.0
+        for i, term in enumerate(terms):
+            ids, weights = self._posting(term)
+            if allowed is not None:
+                mask = np.isin(ids, allowed)
+                ids, weights = ids[mask], weights[mask]
+            scores = term_idf[i] * weights
+            if len(cand_ids) >= k and remaining[i] < threshold:
+                # Görülmemiş bir chunk artık ilk k'ya giremez; yalnızca adaylar güncellenir
+                pos = np.minimum(np.searchsorted(ids, cand_ids), max(len(ids) - 1, 0))
+                hit = (ids[pos] == cand_ids) if len(ids) else np.zeros(len(cand_ids), dtype=bool)
+                cand_scores[hit] += scores[pos[hit]]
+            else:
+                cand_ids, inverse = np.unique(np.concatenate([cand_ids, ids]), return_inverse=True)
+                cand_scores = np.bincount(inverse, np.concatenate([cand_scores, scores]),
+                                          minlength=len(cand_ids)).astype("float32")
+            if len(cand_ids) >= k:
+                threshold = np.partition(cand_scores, len(cand_scores) - k)[len(cand_scores) - k]
+                rest = remaining[i + 1] if i + 1 < len(terms) else 0.0
+                keep = cand_scores + rest >= threshold
+                cand_ids, cand_scores = cand_ids[keep], cand_scores[keep]
+
+        if not len(cand_ids):
+            return empty
+        top = np.argsort(-cand_scores, kind="stable")[:k]
+        return cand_ids[top], cand_scores[top]
+
+    def close(self):
+        self.offsets = self.postings = self.weights = None
+
+
+class LexicalIndexWriter:
+    """Chunk'ları alıp BM25 index'ini oluşturur; close() ile dizini yerine taşır.
+
+    Posting'ler close() çağrılana kadar kompakt dizilerde (terim, chunk, tf)
+    üçlüleri olarak tutulur; ağırlıklar ortalama chunk uzunluğu bilindiğinde
+    hesaplanır.
+    """
+
+    def __init__(self, path, k1=1.2, b=0.75, stem=True):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.k1 = k1
+        self.b = b
+        self.stem = stem
+        self.vocab = {}
+        self.term_ids = array("i")
+        self.chunk_pos = array("i")
+        self.tfs = array("H")
+        self.vector_ids = array("q")
+        self.lengths = array("i")
+        # carry_over ile devralınan mevcut index dizileri
+        self._base = None
+
+    def carry_over(self, index, removed=()):
+        """Mevcut index'in posting'lerini (removed vektörleri hariç) yeniden tokenize etmeden devralır.
+
+        Ağırlıklar, idf ve üst sınırlar close()'da saklanan tf ve chunk
+        uzunluklarından yeniden hesaplanır.
+        """
+        if index.stem != self.stem:
+            raise ValueError("Gövdeleme ayarı farklı bir BM25 index'i devralınamaz")
+        with open(os.path.join(index.path, TERMS_FILE), "r", encoding="utf-8") as f:
+            terms = json.load(f)
+        chunks = np.load(os.path.join(index.path, CHUNKS_FILE))
+        lengths = np.load(os.path.join(index.path, LENGTHS_FILE))
+        postings = np.asarray(index.postings)
+        tfs = np.load(os.path.join(index.path, TFS_FILE))
+        term_ids = np.repeat(np.arange(len(terms), dtype="int64"), np.diff(index.offsets))
+        removed = np.asarray(list(removed), dtype="int64")
+        if len(removed):
+            keep = ~np.isin(postings, removed)
+            postings, tfs, term_ids = postings[keep], tfs[keep], term_ids[keep]
+            keep = ~np.isin(chunks, removed)
+            chunks, lengths = chunks[keep], lengths[keep]
+        self._base = (terms, term_ids, postings, tfs, chunks, lengths)
+
+    def append(self, meta):
+        tokens = tokenize(meta["text"], self.stem)
+        chunk = len(self.vector_ids)
+        self.vector_ids.append(meta["vector_id"])
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_id = self.vocab.setdefault(term, len(self.vocab))
+            self.term_ids.append(term_id)
+            self.chunk_pos.append(chunk)
+            self.tfs.append(min(tf, 65535))
+
+    def __len__(self):
+        base = len(self._base[4]) if self._base is not None else 0
+        return base + len(self.vector_ids)
+
+    def _arrays(self):
+        """(terimler, posting terim sırası, vektör ID'leri, tf'ler, chunk ID'leri, chunk uzunlukları)"""
+        new_terms = sorted(self.vocab)
+        base_terms = self._base[0] if self._base is not None else []
+        terms = sorted(set(new_terms) | set(base_terms)) if base_terms else new_terms
+        position = {term: i for i, term in enumerate(terms)}
+        rank = np.zeros(len(self.vocab), dtype="int64")
+        for term, term_id in self.vocab.items():
+            rank[term_id] = position[term]
+        chunk_pos = np.frombuffer(self.chunk_pos, dtype="int32")
+        vector_ids = np.frombuffer(self.vector_ids, dtype="int64")
+        term_ids = rank[np.frombuffer(self.term_ids, dtype="int32")] if len(self.term_ids) else np.zeros(0, dtype="int64")
+        postings = vector_ids[chunk_pos]
+        tfs = np.frombuffer(self.tfs, dtype="uint16")
+        lengths = np.frombuffer(self.lengths, dtype="int32")
+        if self._base is None:
+            return terms, term_ids, postings, tfs, vector_ids, lengths
+        _, base_term_ids, base_postings, base_tfs, base_chunks, base_lengths = self._base
+        base_rank = np.array([position[term] for term in base_terms], dtype="int64")
+        return (terms,
+                np.concatenate([base_rank[base_term_ids] if len(base_rank) else base_term_ids, term_ids]),
+                np.concatenate([base_postings, postings]),
+                np.concatenate([base_tfs, tfs]),
+                np.concatenate([base_chunks, vector_ids]),
+                np.concatenate([base_lengths, lengths]))
+
+    def close(self):
+        """Dizileri yazar ve geçici dizini hedefin yerine koyar"""
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+
+        terms, term_ids, postings, raw_tfs, chunks, raw_lengths = self._arrays()
+        present = np.bincount(term_ids, minlength=len(terms)) > 0
+        if not present.all():
+            # Posting'leri tamamen silinen terimler sözlükten çıkarılır
+            terms = [term for term, keep in zip(terms, present) if keep]
+            term_ids = (np.cumsum(present) - 1)[term_ids]
+        tfs = raw_tfs.astype("float32")
+        lengths = raw_lengths.astype("float32")
+
+        n_chunks = len(chunks)
+        avgdl = float(lengths.mean()) if n_chunks and lengths.sum() > 0 else 1.0
+        # Posting'in chunk uzunluğu vektör ID'si üzerinden bulunur
+        chunk_order = np.argsort(chunks, kind="stable")
+        dl = lengths[chunk_order[np.searchsorted(chunks, postings, sorter=chunk_order)]] if len(postings) else lengths[:0]
+        weights = tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * dl / avgdl))
+
+        order = np.lexsort((postings, term_ids))
+        term_ids, postings, weights = term_ids[order], postings[order], weights[order].astype("float32")
+        raw_tfs = raw_tfs[order]
+        df = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.concatenate([[0], np.cumsum(df)]).astype("int64")
+        idf = bm25_idf(n_chunks, df).astype("float32")
+        if len(terms):
+            max_weights = np.maximum.reduceat(weights, offsets[:-1]).astype("float32")
+        else:
+            max_weights = np.zeros(0, dtype="float32")
+
+        with open(os.path.join(self.tmp_path, TERMS_FILE), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        np.save(os.path.join(self.tmp_path, OFFSETS_FILE), offsets)
+        np.save(os.path.join(self.tmp_path, POSTINGS_FILE), postings)
+        np.save(os.path.join(self.tmp_path, WEIGHTS_FILE), weights)
+        np.save(os.path.join(self.tmp_path, IDF_FILE), idf)
+        np.save(os.path.join(self.tmp_path, MAX_WEIGHTS_FILE), max_weights)
+        np.save(os.path.join(self.tmp_path, TFS_FILE), raw_tfs.astype("uint16"))
+        np.save(os.path.join(self.tmp_path, CHUNKS_FILE), chunks.astype("int64"))
+        np.save(os.path.join(self.tmp_path, LENGTHS_FILE), raw_lengths.astype("int32"))
+        with open(os.path.join(self.tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"chunks": n_chunks, "terms": len(terms), "avgdl": avgdl,
+                       "k1": self.k1, "b": self.b, "stem": self.stem}, f)
+        replace_dir(self.tmp_path, self.path)
+        logger.info(f"BM25 index'i yazıldı: {n_chunks} chunk, {len(terms)} terim")
+
+    def abort(self):
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
@@ -0,0 +1,106 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Aşama süreleri için histogram sınırları (saniye)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Metrics:
+    """Aşama süreleri ve sayaçlar için iş parçacığı güvenli kayıt.
+
+    timer(aşama) ile ölçülen her süre aşama histogramına eklenir. collect()
+    bloğu içindeyken aynı iş parçacığındaki ölçümler ayrıca o isteğin
+    aşama → milisaniye dökümüne toplanır.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timers = {}   # aşama → [adet, toplam süre, kova sayaçları]
+        self._local = threading.local()
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            timer = self._timers.get(stage)
+            if timer is None:
+                timer = self._timers[stage] = [0, 0.0, [0] * len(self.buckets)]
+            timer[0] += 1
+            timer[1] += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    timer[2][i] += 1
+        breakdown = getattr(self._local, "breakdown", None)
+        if breakdown is not None:
+            breakdown[stage] = breakdown.get(stage, 0.0) + seconds * 1000.0
+
+    def inc(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextmanager
+    def collect(self):
+        """Blok içindeki aşama sürelerini (ms) bir sözlükte toplar"""
+        previous = getattr(self._local, "breakdown", None)
+        breakdown = {}
+        self._local.breakdown = breakdown
+        try:
+            yield breakdown
+        finally:
+            self._local.breakdown = previous
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timers": {stage: {"count": t[0], "sum": t[1], "buckets": list(t[2])}
+                           for stage, t in self._timers.items()}
+            }
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+def render_prometheus(metrics, gauges=(), counters=(), prefix="advanced_ir"):
+    """Metrics kaydını ve ek ölçümleri Prometheus metin biçimine çevirir.
+
+    gauges ve counters (isim, etiketler, değer, açıklama) dörtlülerinden oluşur.
+    """
+    snapshot = metrics.snapshot()
+    lines = []
+
+    name = f"{prefix}_stage_seconds"
+    lines.append(f"# HELP {name} Aşama süreleri")
+    lines.append(f"# TYPE {name} histogram")
+    for stage, timer in sorted(snapshot["timers"].items()):
+        for bound, count in zip(metrics.buckets, timer["buckets"]):
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {timer["count"]}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {timer["sum"]}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {timer["count"]}')
+
+    counter_items = [(n, None, v, None) for n, v in sorted(snapshot["counters"].items())] + list(counters)
+    for kind, items, suffix in (("counter", counter_items, "_total"), ("gauge", gauges, "")):
+        declared = set()
+        # Aynı metriğin satırları art arda gelmeli
+        for metric, labels, value, help_text in sorted(items, key=lambda item: item[0]):
+            full = f"{prefix}_{metric}{suffix}"
+            if full not in declared:
+                if help_text:
+                    lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+                declared.add(full)
+            lines.append(f"{full}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Eşzamanlı arama isteklerini kısa bir süre toplayıp tek seferde işler.
+
+    Gelen sorgular max_wait_ms milisaniye boyunca (veya max_batch_size
+    dolana kadar) biriktirilir, ardından bir iş parçacığında tek bir
+    SearchEngine.search_many çağrısıyla kodlanıp aranır ve sonuçlar
+    bekleyen isteklere dağıtılır.
+
+    lexical_fallback_depth verilirse kuyrukta bu kadar istek biriktiğinde
+    (kodlayıcı yetişemiyorsa) dense/hybrid istekler BM25 ile yanıtlanır.
+    """
+
+    def __init__(self, engine, max_batch_size=32, max_wait_ms=5, lexical_fallback_depth=None):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.lexical_fallback_depth = lexical_fallback_depth
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.requests = 0
+        self.fallbacks = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def search(self, text, k=5, nprobe=None, ef_search=None, doc_ids=None, return_timings=False,
+                     mode="dense"):
+        """Tek bir sorguyu kuyruğa ekler ve toplu aramanın sonucunu bekler.
+
+        return_timings=True ise (sonuçlar, aşama → ms dökümü) döndürür; döküm
+        sorgunun kuyrukta beklediği süreyi ve içinde arandığı grubun sürelerini içerir.
+        """
+        future = asyncio.get_running_loop().create_future()
+        filters = {"doc_ids": doc_ids} if doc_ids is not None else None
+        await self._queue.put((text, k, nprobe, ef_search, mode, filters, future, time.monotonic()))
+        results, timings = await future
+        if return_timings:
+            return results, timings
+        return results
+
+    async def _collect(self):
+        """İlk isteği bekler, ardından süre/boyut sınırına kadar yenilerini toplar"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _search_batch(self, texts, k, filters, nprobe, ef_search, mode):
+        """Grubu arar ve aramanın aşama sürelerini (ms) döndürür"""
+        with self.engine.metrics.collect() as timings:
+            results = self.engine.search_many(texts, k, filters, nprobe, ef_search, mode)
+        return results, timings
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            overloaded = (self.lexical_fallback_depth is not None and
+                          self._queue.qsize() >= self.lexical_fallback_depth)
+            # search_many tek bir k/nprobe/ef_search/mode alır; farklı ayarlar ayrı gruplanır
+            groups = {}
+            for item in batch:
+                k, nprobe, ef_search, mode = item[1:5]
+                if overloaded and mode != "lexical":
+                    mode = "lexical"
+                    self.fallbacks += 1
+                groups.setdefault((k, nprobe, ef_search, mode), []).append(item)
+            for (k, nprobe, ef_search, mode), items in groups.items():
+                items = [item for item in items if not item[6].done()]  # iptal edilenler atlanır
+                if not items:
+                    continue
+                started = time.monotonic()
+                try:
+                    results, timings = await asyncio.to_thread(
+                        self._search_batch, [item[0] for item in items], k,
+                        [item[5] for item in items], nprobe, ef_search, mode)
+                except Exception as e:
+                    logger.error(f"Toplu arama hatası: {str(e)}")
+                    for item in items:
+                        if not item[6].done():
+                            item[6].set_exception(e)
+                    continue
+                for item, result in zip(items, results):
+                    wait = started - item[7]
+                    self.engine.metrics.observe("queue_wait", wait)
+                    if not item[6].done():
+                        item[6].set_result((result, dict(timings, queue_wait=wait * 1000.0)))
+            self.batches += 1
+            self.requests += len(batch)
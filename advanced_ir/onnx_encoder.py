@@ -0,0 +1,202 @@
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_DIR = "models/onnx"
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def encoder_name(model_name, quantize=True):
+    """Gömme önbelleği ve index_config'de kodlayıcıyı ayırt eden ad"""
+    return f"{model_name}-onnx-{'int8' if quantize else 'fp32'}"
+
+
+def _model_dir(model_name, cache_dir=ONNX_DIR):
+    return os.path.join(cache_dir, model_name.replace("/", "__"))
+
+
+def export_model(model_name, cache_dir=ONNX_DIR, quantize=True, reduce_range=False):
+    """Kodlayıcıyı ONNX'e aktarır ve isteğe bağlı olarak int8 dinamik nicemler.
+
+    Dosyalar cache_dir altında saklanır; daha önce aktarılmışsa yeniden
+    yapılmaz. Kullanılacak .onnx dosyasının yolunu döndürür.
+    """
+    model_dir = _model_dir(model_name, cache_dir)
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    int8_path = os.path.join(model_dir, "model.int8.onnx")
+    target = int8_path if quantize else fp32_path
+    if os.path.exists(target):
+        return target
+
+    # Ağır bağımlılıklar yalnızca aktarım sırasında gerekir
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    if not os.path.exists(fp32_path):
+        logger.info(f"{model_name} ONNX'e aktarılıyor...")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = tokenizer(["örnek bir cümle"], return_tensors="pt")
+        inputs = [name for name in INPUT_NAMES if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in inputs}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        with torch.no_grad():
+            torch.onnx.export(model, tuple(sample[name] for name in inputs), fp32_path,
+                              input_names=inputs, output_names=["last_hidden_state"],
+                              dynamic_axes=dynamic_axes, opset_version=14)
+        tokenizer.save_pretrained(model_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info("ONNX modeli int8'e nicemleniyor...")
+        # reduce_range: VNNI desteği olmayan eski CPU'larda taşmayı önler
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, reduce_range=reduce_range)
+    return target
+
+
+class OnnxEncoder:
+    """SentenceTransformer.encode ile aynı arayüze sahip ONNX Runtime kodlayıcısı.
+
+    all-MiniLM-L6-v2'nin işlem hattını (transformer → maskeli ortalama →
+    L2 normalizasyonu) ONNX Runtime üzerinde çalıştırır. Benzer uzunluktaki
+    metinler aynı gruba alınarak dolgu (padding) maliyeti azaltılır.
+    """
+
+    def __init__(self, model_name, cache_dir=ONNX_DIR, quantize=True, intra_op_threads=None,
+                 inter_op_threads=1, max_length=256, reduce_range=False):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        self.max_length = max_length
+        model_path = export_model(model_name, cache_dir, quantize, reduce_range)
+        self.tokenizer = AutoTokenizer.from_pretrained(_model_dir(model_name, cache_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Varsayılan: tek bir sorgu tüm çekirdekleri kullanır, oturumlar arası paralellik yok
+        options.intra_op_num_threads = intra_op_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"ONNX kodlayıcı yüklendi: {model_path} ({options.intra_op_num_threads} iş parçacığı)")
+
+    @property
+    def name(self):
+        return encoder_name(self.model_name, self.quantize)
+
+    def get_sentence_embedding_dimension(self):
+        return self.session.get_outputs()[0].shape[-1]
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length,
+                                return_tensors="np")
+        feed = {name: tokens[name].astype("int64") for name in self.input_names if name in tokens}
+        if "token_type_ids" in self.input_names and "token_type_ids" not in feed:
+            feed["token_type_ids"] = np.zeros_like(feed["input_ids"])
+        hidden = self.session.run(None, feed)[0]
+        mask = tokens["attention_mask"][..., None].astype("float32")
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """Metinleri float32 vektörlere dönüştürür (tek metin verilirse tek vektör)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype="float32")
+        # Uzunluğa göre sıralayıp gruplamak dolguyu azaltır
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out = np.zeros((len(texts), 0), dtype="float32")
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            vectors = self._encode_batch([texts[i] for i in idx]).astype("float32")
+            if out.shape[1] == 0:
+                out = np.zeros((len(texts), vectors.shape[1]), dtype="float32")
+            out[idx] = vectors
+        return out[0] if single else out
+
+
+# ================= UYUMLULUK KONTROLÜ ================= #
+def parity_check(reference, candidate, texts, queries=None, k=10, batch_size=32):
+    """İki kodlayıcının gömmelerini karşılaştırır.
+
+    Aynı metinler için kosinüs benzerliği dağılımını (sapma) ve referans
+    modelle kurulmuş bir index'te aday modelin sorgu vektörleriyle yapılan
+    aramanın recall@k değerini raporlar. İki modelin kodlama hızı da ölçülür.
+    """
+    import faiss
+
+    if queries is None:
+        # Metinlerin ilk kelimeleri kısa sorgular olarak kullanılır
+        queries = [" ".join(t.split()[:8]) for t in texts[::10]]
+    start = time.perf_counter()
+    ref_texts = np.asarray(reference.encode(texts, batch_size=batch_size), dtype="float32")
+    ref_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    cand_texts = np.asarray(candidate.encode(texts, batch_size=batch_size), dtype="float32")
+    cand_seconds = time.perf_counter() - start
+
+    def normalize(x):
+        return x / np.clip(np.linalg.norm(x, axis=1, keepdims=True), 1e-12, None)
+
+    cosine = (normalize(ref_texts) * normalize(cand_texts)).sum(axis=1)
+
+    # Referans gömmelerle kurulan index'te iki modelin sorgularını karşılaştır
+    k = min(k, len(texts))
+    index = faiss.IndexFlatL2(ref_texts.shape[1])
+    index.add(ref_texts)
+    _, truth = index.search(np.asarray(reference.encode(queries), dtype="float32"), k)
+    _, found = index.search(np.asarray(candidate.encode(queries), dtype="float32"), k)
+    recall = float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+    return {
+        "texts": len(texts),
+        "queries": len(queries),
+        "cosine_mean": float(cosine.mean()),
+        "cosine_min": float(cosine.min()),
+        "cosine_p01": float(np.percentile(cosine, 1)),
+        "max_drift": float(1.0 - cosine.min()),
+        "recall_at_k": recall,
+        "k": k,
+        "reference_texts_per_sec": len(texts) / ref_seconds if ref_seconds > 0 else 0.0,
+        "candidate_texts_per_sec": len(texts) / cand_seconds if cand_seconds > 0 else 0.0
+    }
+
+
+if __name__ == "__main__":
+    from sentence_transformers import SentenceTransformer
+    from search_engine import MODEL_NAME
+    from build_index import load_documents_from_data_dir
+
+    parser = argparse.ArgumentParser(description="ONNX int8 kodlayıcıyı fp32 modelle karşılaştırır")
+    parser.add_argument("--no-quantize", action="store_true", help="Nicemleme yapmadan fp32 ONNX kullan")
+    parser.add_argument("--threads", type=int, default=None, help="ONNX Runtime iş parçacığı sayısı")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Raporun yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    documents, _ = load_documents_from_data_dir()
+    chunks = []
+    for doc in documents:
+        words = doc.split()
+        chunks.extend(" ".join(words[i:i + 50]) for i in range(0, len(words), 50))
+    if not chunks:
+        raise SystemExit("Karşılaştırma için data dizinine belge ekleyin.")
+
+    report = parity_check(SentenceTransformer(MODEL_NAME),
+                          OnnxEncoder(MODEL_NAME, quantize=not args.no_quantize, intra_op_threads=args.threads),
+                          chunks, k=args.k)
+    print(json.dumps(report, ensure_ascii=False, indent=4))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,246 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+from startup import lazy_import
+
+transformers = lazy_import("transformers")
+
+logger = logging.getLogger(__name__)
+
+# Türkçe destekli QA modeli; yüklenemezse pipeline'ın varsayılan modeli kullanılır
+QA_MODEL = "savasy/bert-base-turkish-squad"
+# Uzun bağlamlar max_seq_len token'lık, doc_stride token örtüşen pencerelere bölünür
+QA_OPTIONS = {"doc_stride": 128, "max_seq_len": 384, "max_answer_len": 64, "batch_size": 8}
+
+
+class QATimeoutError(TimeoutError):
+    """QA isteği süresi içinde yanıtlanamadı (çıkarım iptal edildi)"""
+
+
+def load_qa_pipeline(model_name=QA_MODEL):
+    """QA pipeline'ını yükler; model yüklenemezse yedek modeli dener, o da olmazsa None"""
+    try:
+        logger.info("QA modeli yükleniyor...")
+        qa = transformers.pipeline("question-answering", model=model_name)
+        logger.info("QA modeli yüklendi")
+        return qa
+    except Exception as e:
+        logger.warning(f"Türkçe QA modeli yüklenemedi: {str(e)}")
+    try:
+        logger.info("Yedek QA modeli yükleniyor...")
+        qa = transformers.pipeline("question-answering")
+        logger.info("Yedek QA modeli yüklendi")
+        return qa
+    except Exception as e:
+        logger.error(f"Yedek QA modeli yüklenemedi: {str(e)}")
+    return None
+
+
+def best_span(qa, question, contexts, doc_stride=128, max_seq_len=384, max_answer_len=64, batch_size=8):
+    """Soruyu tüm bağlamlarda tek bir toplu pipeline çağrısıyla arar, en iyi cevabı döndürür.
+
+    Uzun bağlamlar kesilmez; pipeline onları örtüşen pencerelere böler.
+    Sonuç {"answer", "score", "context_index", "start", "end"} (start/end
+    bağlam içindeki karakter konumları) ya da cevap yoksa None'dır.
+    """
+    indexed = [(i, c) for i, c in enumerate(contexts) if c and c.strip()]
+    if not indexed or not question or not question.strip():
+        return None
+    outputs = qa(question=[question] * len(indexed), context=[c for _, c in indexed],
+                 doc_stride=doc_stride, max_seq_len=max_seq_len, max_answer_len=max_answer_len,
+                 batch_size=batch_size)
+    if isinstance(outputs, dict):
+        outputs = [outputs]
+    best = None
+    for (i, _), output in zip(indexed, outputs):
+        if isinstance(output, list):
+            output = output[0] if output else None
+        if not output or not output.get("answer"):
+            continue
+        if best is None or output["score"] > best["score"]:
+            best = {"answer": output["answer"], "score": float(output["score"]), "context_index": i,
+                    "start": int(output["start"]), "end": int(output["end"])}
+    return best
+
+
+def _serve(conn, model_name, options):
+    """Worker süreci: modeli önceden yükler, (soru, bağlamlar) isteklerini sırayla yanıtlar"""
+    start = time.perf_counter()
+    qa = load_qa_pipeline(model_name)
+    if qa is None:
+        conn.send(("error", "QA modelleri yüklenemedi."))
+        return
+    # İlk çıkarımın ek maliyeti istekten önce ödenir
+    best_span(qa, "ısınma?", ["ısınma"], **options)
+    conn.send(("ready", time.perf_counter() - start))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        question, contexts = request
+        try:
+            conn.send((True, best_span(qa, question, contexts, **options)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, context, model_name, options):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, model_name, options), daemon=True,
+                                       name="qa-worker")
+        self.process.start()
+        child.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+
+class QAWorkerPool:
+    """QA çıkarımını ayrı süreçlerde, istek başına gerçek süre sınırıyla çalıştırır.
+
+    Her worker modeli başlarken yükler (ilk istek yükleme maliyetini ödemez)
+    ve aynı anda tek istek işler. Süresi dolan isteğin çıkarımı worker süreci
+    sonlandırılarak iptal edilir ve yerine yeni bir worker başlatılır; böylece
+    yavaş bir istek sunucu iş parçacığını süresiz bekletmez. Boş worker
+    beklerken süre dolarsa istek hiç başlatılmaz.
+    """
+
+    def __init__(self, workers=1, timeout=30.0, model_name=QA_MODEL, options=None, metrics=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.model_name = model_name
+        self.options = dict(QA_OPTIONS, **(options or {}))
+        self.metrics = metrics
+        # fork, ana süreçte yüklü torch iş parçacıklarıyla güvenli değildir
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = set()
+        self._starting = set()    # model yükleyen worker'lar
+        self._closed = False
+        self.error = None
+        self.timeouts = 0
+        self.restarts = 0
+
+    def start(self, wait=False):
+        """Worker'ları başlatır; wait=True ise modeller yüklenene kadar bekler"""
+        threads = [self._spawn() for _ in range(self.workers)]
+        if wait:
+            for thread in threads:
+                thread.join()
+        return self
+
+    @property
+    def ready(self):
+        """İstek kabul edebilecek (model yüklü) worker sayısı"""
+        with self._lock:
+            return len(self._workers)
+
+    def _spawn(self):
+        worker = _Worker(self._context, self.model_name, self.options)
+        with self._lock:
+            self._starting.add(worker)
+        thread = threading.Thread(target=self._await_ready, args=(worker,), daemon=True, name="qa-worker-start")
+        thread.start()
+        return thread
+
+    def _await_ready(self, worker):
+        try:
+            status, value = worker.conn.recv()
+        except (EOFError, OSError):
+            status, value = "error", "QA worker'ı başlarken kapandı"
+        with self._lock:
+            self._starting.discard(worker)
+            closed = self._closed
+            if status == "ready" and not closed:
+                self._workers.add(worker)
+        if closed:
+            worker.close()
+        elif status != "ready":
+            self.error = value
+            logger.error(f"QA worker'ı başlatılamadı: {value}")
+            worker.kill()
+        else:
+            if self.metrics is not None:
+                self.metrics.observe("qa_model_load", value)
+            self._idle.put(worker)
+
+    def _replace(self, worker):
+        """Worker'ı sonlandırır ve yerine yenisini başlatır"""
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+        if not self._closed:
+            self.restarts += 1
+            self._spawn()
+
+    def _acquire(self, deadline):
+        while True:
+            with self._lock:
+                if not self._workers and not self._starting:
+                    raise RuntimeError(self.error or "QA worker'ı yok")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                return self._idle.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+
+    def answer(self, question, contexts, timeout=None):
+        """Soruyu bağlamlarda yanıtlar (bkz. best_span); süre dolarsa QATimeoutError"""
+        if self._closed:
+            raise RuntimeError("QA worker havuzu kapatıldı")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        worker = self._acquire(deadline)
+        if worker is None:
+            self.timeouts += 1
+            raise QATimeoutError(f"Boş QA worker'ı {timeout:.1f} saniyede bulunamadı")
+        try:
+            worker.conn.send((question, list(contexts)))
+            finished = worker.conn.poll(max(0.0, deadline - time.monotonic()))
+            if finished:
+                ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._replace(worker)
+            raise RuntimeError("QA worker'ı beklenmedik şekilde kapandı") from None
+        if not finished:
+            # Çıkarım iptal edilir: worker sonlandırılıp yenisi başlatılır
+            self.timeouts += 1
+            self._replace(worker)
+            raise QATimeoutError(f"QA çıkarımı {timeout:.1f} saniyeyi aştı ve iptal edildi")
+        self._idle.put(worker)
+        if not ok:
+            raise RuntimeError(value)
+        return value
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+            starting = list(self._starting)
+            self._workers.clear()
+        for worker in workers:
+            worker.close()
+        # Model yüklemesi süren worker'ların beklenmesine gerek yok
+        for worker in starting:
+            worker.kill()
@@ -0,0 +1,84 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def estimate_size(value):
+    """Önbellekteki bir değerin yaklaşık bellek kullanımı (bayt)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, str):
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Eleman sayısı, toplam bayt ve isteğe bağlı yaşam süresiyle (TTL) sınırlı,
+    iş parçacığı güvenli LRU önbelleği.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # anahtar → (değer, boyut, eklenme zamanı)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.time() - item[2] > self.ttl:
+                self._pop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._data[key] = (value, size, time.time())
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or
+                                  (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def normalize_query(query):
+    """Önbellek anahtarı için sorgudaki fazla boşlukları temizler"""
+    return " ".join(query.split())
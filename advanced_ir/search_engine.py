@@ -1,192 +1,1133 @@
-import faiss
 import numpy as np
 import json
 import os
-from sentence_transformers import SentenceTransformer
+import threading
+from embedding_cache import EmbeddingCache
+from document_loader import extract_pdf_text
+from chunk_store import ChunkStore, ChunkStoreWriter, migrate_json_metadata
+import index_factory
+import index_generations
+from index_generations import RWLock, GenerationWatcher
+from query_cache import LRUCache, normalize_query
+from metrics import Metrics
+from lexical_index import LexicalIndex, LexicalIndexWriter
+from chunker import TokenChunker
+from dedup import ChunkDeduplicator
+from summarizer import ExtractiveSummarizer, load_summaries, save_summaries
+from doc_index import CentroidBuilder, DocumentIndex
+from qa_pool import QA_OPTIONS, QAWorkerPool, QATimeoutError, best_span, load_qa_pipeline
+import startup
+from startup import lazy_import
 import logging
-from transformers import pipeline
 from datetime import datetime
 import hashlib
+import itertools
 import time
 
-# Windows uyumluluğu için timeout
-import sys
-if sys.platform != "win32":
-    from timeout_decorator import timeout, TimeoutError
-else:
-    # Windows için mock timeout
-    def timeout(seconds):
-        def decorator(func):
-            return func
-        return decorator
-    class TimeoutError(Exception):
-        pass
+# Ağır modüller ilk kullanımda yüklenir; CLI araçları ve yeni worker'lar bunları beklemez
+faiss = lazy_import("faiss")
+sentence_transformers = lazy_import("sentence_transformers")
 
 # Logging ayarları
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Kodlayıcının işlediği en uzun token dizisi; daha uzun chunk'ların sonu kesilir
+MAX_SEQ_LENGTH = 256
+# Parçalama sırasında tek seferde tokenize edilen belge sayısı
+CHUNK_DOC_BATCH = 16
+
+# dense: vektör araması, lexical: BM25, hybrid: ikisinin sıralama birleştirmesi (RRF)
+SEARCH_MODES = ("dense", "lexical", "hybrid")
+# Belge skoru: en iyi chunk'ın uzaklığı (max) ya da en iyi n chunk'ın ortalaması (mean)
+DOC_AGGREGATES = ("max", "mean")
+
 class SearchEngine:
-    def __init__(self, index_path="index/faiss.index", metadata_path="index/metadata.json", doc_metadata_path="index/doc_metadata.json"):
-        self.index_path = index_path
-        self.metadata_path = metadata_path
-        self.doc_metadata_path = doc_metadata_path
-        self.model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    def __init__(self, index_path="index/faiss.index", metadata_path="index/chunks", doc_metadata_path="index/doc_metadata.json",
+                 embedding_cache_dir="index/embedding_cache", embedding_cache_size=200000, build_batch_size=256,
+                 index_type="flat", index_params=None,
+                 query_cache_size=1024, result_cache_size=1024, cache_ttl=None, cache_max_bytes=64 * 1024 * 1024,
+                 keep_generations=3, build_lexical=True, hybrid_candidates=50, rrf_k=60,
+                 encoder_backend="torch", encoder_options=None, mmap=False,
+                 chunk_max_tokens=None, chunk_overlap=32, snap_sentences=True,
+                 dedup=True, dedup_threshold=0.85, summaries=True, summary_sentences=5,
+                 doc_centroids=4, doc_centroid_chunks=32):
+        # Index dosyaları index_root/generations/<nesil>/ altında bu isimlerle tutulur;
+        # index_root/CURRENT yayındaki nesli gösterir
+        self.index_root = os.path.dirname(index_path) or "."
+        self._file_names = {
+            "index": os.path.basename(index_path),
+            "chunks": os.path.basename(metadata_path),
+            "lexical": "lexical",
+            "dedup": "dedup",
+            "summaries": "summaries.json",
+            "doc_index": "doc_index",
+            "doc_metadata": os.path.basename(doc_metadata_path),
+            "config": "index_config.json"
+        }
+        self.keep_generations = keep_generations
+        self.generation = None
+        self._set_paths(self._paths(index_generations.read_current(self.index_root)))
+        # Aşama süreleri ve sayaçlar (bkz. collect_metrics, app.py /metrics)
+        self.metrics = Metrics()
+        # torch: SentenceTransformer (fp32), onnx: ONNX Runtime (varsayılan int8, bkz. onnx_encoder.py),
+        # remote: aynı makinedeki ortak gömme servisi (bkz. embedding_service.py)
+        self.encoder_backend = encoder_backend
+        self.encoder_options = encoder_options or {}
+        self.encoder_name = self._encoder_name(encoder_backend, self.encoder_options)
+        # Model ilk gömme isteğinde (veya warmup ile) yüklenir, bkz. model
+        self._model = None
+        self._model_lock = threading.Lock()
+        # Chunk'lar kodlayıcının token sınırına göre bölünür (varsayılan: kodlayıcının dizi sınırı)
+        self.chunk_max_tokens = chunk_max_tokens or self.encoder_options.get("max_length", MAX_SEQ_LENGTH)
+        self.chunk_overlap = chunk_overlap
+        self.snap_sentences = snap_sentences
+        self._chunker = None
+        # Birebir/neredeyse aynı chunk'lar kodlanmadan önce tek vektörde birleştirilir
+        self.dedup = dedup
+        self.dedup_threshold = dedup_threshold
+        # Belge özetleri index oluşturulurken çıkarılır; belge hash'i → özet
+        self.build_summaries = summaries
+        self.summary_sentences = summary_sentences
+        self.summaries = {}
+        # Belge başına en fazla doc_centroids merkez vektörü (her doc_centroid_chunks chunk için bir);
+        # 0 verilirse belge düzeyindeki index oluşturulmaz
+        self.doc_centroids = doc_centroids
+        self.doc_centroid_chunks = doc_centroid_chunks
+        self.doc_index = None
         self.index = None
         self.docs = []
         self.doc_metadata = []
+        self._doc_vector_ids = {}
+        self.lexical = None
+        # Yayındaki neslin tekilleştirme durumu; son güncellemeden bellekte kalır, yoksa ilk güncellemede okunur
+        self._dedup = None
+        # Index'le birlikte BM25 ters index'i de oluşturulsun mu
+        self.build_lexical = build_lexical
+        # Hibrit aramada her yöntemden alınacak aday sayısı ve RRF sabiti
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        # Sorgular okuma, index değişimi yazma kilidi alır
+        self._lock = RWLock()
+        self._load_mutex = threading.Lock()
+        self._watcher = None
+        # Index oluştururken bellekte aynı anda tutulacak en fazla chunk sayısı
+        self.build_batch_size = build_batch_size
+        # Yeni index'ler için tür ve parametreler (flat, ivf_flat, ivf_pq, hnsw)
+        self.index_type = index_type
+        self.index_params = index_factory.resolve_params(index_params)
+        # Diskteki/bellekteki index'in gerçek yapılandırması
+        self.index_config = None
+        # True ise index vektörleri belleğe kopyalanmaz, dosyadan eşlenir (süreçler arası paylaşılır)
+        self.mmap = mmap
+        # Index her yüklendiğinde/değiştiğinde artar; sonuç önbelleği anahtarının parçasıdır
+        self.index_version = 0
+
+        # Sorgu gömme ve sonuç önbellekleri (boyut 0 verilirse devre dışı)
+        self.query_cache = LRUCache(query_cache_size, cache_max_bytes, cache_ttl) if query_cache_size else None
+        self.result_cache = LRUCache(result_cache_size, cache_max_bytes, cache_ttl) if result_cache_size else None
         
         # Dizinleri oluştur
         self._ensure_directories()
+
+        # Chunk gömme önbelleği (None verilirse devre dışı)
+        self.embedding_cache = None
+        if embedding_cache_dir:
+            # Farklı kodlayıcıların vektörleri karışmasın diye önbellek kodlayıcı adına göre ayrılır
+            self.embedding_cache = EmbeddingCache(embedding_cache_dir, self.encoder_name,
+                                                  max_entries=embedding_cache_size)
         
-        # Özetleme ve QA modellerini yükle
+        # Özetleme ve QA modelleri ilk kullanımda yüklenir
         self.summarizer = None
         self.qa_pipeline = None
+        self._qa_lock = threading.Lock()
+        # İsteğe bağlı QA worker süreçleri (bkz. start_qa_pool); lazy ise ilk soruda başlatılır
+        self.qa_pool = None
+        self._qa_pool_settings = None
+
+    @staticmethod
+    def _encoder_name(backend, options):
+        """Kodlayıcının adı; modeli yüklemeden önbellek ve index_config için bilinir"""
+        if backend == "torch":
+            return MODEL_NAME
+        if backend == "onnx":
+            from onnx_encoder import encoder_name
+            return encoder_name(MODEL_NAME, options.get("quantize", True))
+        if backend == "remote":
+            # Servisin yüklediği kodlayıcı: {"socket": yol, "backend": "torch"|"onnx", ...seçenekleri}
+            remote = {k: v for k, v in options.items() if k not in ("socket", "backend")}
+            return SearchEngine._encoder_name(options.get("backend", "torch"), remote)
+        raise ValueError(f"Bilinmeyen kodlayıcı: {backend} (seçenekler: torch, onnx, remote)")
+
+    def _load_encoder(self, backend, options):
+        """Gömme modelini yükler; her iki arka uç da aynı encode arayüzünü sunar"""
+        if backend == "onnx":
+            # onnxruntime isteğe bağlı bir bağımlılıktır
+            from onnx_encoder import OnnxEncoder
+            return OnnxEncoder(MODEL_NAME, **options)
+        if backend == "remote":
+            # Model bu süreçte yüklenmez; kodlama servisteki ortak modelle yapılır
+            from embedding_service import DEFAULT_SOCKET, RemoteEncoder
+            return RemoteEncoder(options.get("socket", DEFAULT_SOCKET), self.encoder_name)
+        return sentence_transformers.SentenceTransformer(MODEL_NAME)
+
+    @property
+    def model(self):
+        """Gömme modeli; ilk erişimde tek bir iş parçacığı tarafından yüklenir"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    logger.info(f"Gömme modeli yükleniyor: {self.encoder_name}")
+                    with self.metrics.timer("model_load"), startup.stage("model_load"):
+                        self._model = self._load_encoder(self.encoder_backend, self.encoder_options)
+        return self._model
+
+    @property
+    def chunker(self):
+        """Kodlayıcının tokenizer'ını kullanan chunker; ilk erişimde oluşturulur"""
+        if self._chunker is None:
+            with self._model_lock:
+                if self._chunker is None:
+                    self._chunker = TokenChunker.for_model(
+                        MODEL_NAME, self.chunk_max_tokens, self.chunk_overlap, self.snap_sentences,
+                        tokenizer=getattr(self._model, "tokenizer", None))
+        return self._chunker
+
+    def encode(self, texts, **kwargs):
+        """Metinleri gömer; model yalnızca gerçekten kodlanacak metin varsa yüklenir"""
+        return self.model.encode(texts, **kwargs)
+
+    def warmup(self, qa=False, background=False):
+        """Modeli, index'i ve (qa=True ise) QA modelini ilk istekten önce yükler.
+
+        Modelin ilk çağrısındaki ek maliyet de örnek bir sorguyla ödenir.
+        background=True ise yükleme arka planda yapılır ve iş parçacığı
+        döndürülür; bu sırada gelen istekler yüklemenin bitmesini bekler.
+        """
+        if background:
+            thread = threading.Thread(target=self.warmup, kwargs={"qa": qa}, daemon=True,
+                                      name="search-engine-warmup")
+            thread.start()
+            return thread
+        with startup.stage("warmup"):
+            self._ensure_loaded()
+            self.model.encode(["ısınma"])
+            # QA worker havuzu varsa (veya ilk soruda başlatılacaksa) model worker'larda yüklenir
+            if qa and self.qa_pool is None and self._qa_pool_settings is None:
+                self._qa_model()
+        logger.info("Arama motoru ısındı.")
+        return None
 
     def _ensure_directories(self):
         """Gerekli dizinleri oluşturur"""
-        index_dir = os.path.dirname(self.index_path)
+        index_dir = self.index_root
         if index_dir and not os.path.exists(index_dir):
             os.makedirs(index_dir)
             logger.info(f"Dizin oluşturuldu: {index_dir}")
+
+    # ================= NESİL DOSYALARI ================= #
+    def _paths(self, generation):
+        """Bir neslin dosya yolları (generation None ise eski, nesilsiz düzen)"""
+        if generation is None:
+            base = self.index_root
+        else:
+            base = index_generations.generation_dir(self.index_root, generation)
+        return {key: os.path.join(base, name) for key, name in self._file_names.items()}
+
+    def _set_paths(self, paths):
+        self.index_path = paths["index"]
+        self.metadata_path = paths["chunks"]
+        self.doc_metadata_path = paths["doc_metadata"]
+        self.index_config_path = paths["config"]
     
-    def _save_doc_metadata(self, doc_metadata):
+    def _save_doc_metadata(self, doc_metadata, path):
         """Belge meta verisini kaydeder"""
-        with open(self.doc_metadata_path, "w", encoding="utf-8") as f:
+        with open(path, "w", encoding="utf-8") as f:
             json.dump(doc_metadata, f, ensure_ascii=False, indent=4)
         logger.info("Belge meta verisi kaydedildi.")
     
-    def _load_doc_metadata(self):
-        """Belge meta verisini yükler"""
-        if os.path.exists(self.doc_metadata_path):
-            with open(self.doc_metadata_path, "r", encoding="utf-8") as f:
-                self.doc_metadata = json.load(f)
-            logger.info("Belge meta verisi yüklendi.")
-            return True
-        else:
-            logger.warning("Belge meta verisi bulunamadı.")
-            return False
+    def _read_doc_metadata(self, path):
+        """Belge meta verisini okur"""
+        with open(path, "r", encoding="utf-8") as f:
+            doc_metadata = json.load(f)
+        logger.info("Belge meta verisi yüklendi.")
+        return doc_metadata
 
     # ================= CHUNKING ================= #
-    def chunk_text(self, text, chunk_size=200):
-        words = text.split()
-        chunks = []
-        for i in range(0, len(words), chunk_size):
-            chunk = " ".join(words[i:i + chunk_size])
-            chunks.append(chunk)
-        return chunks
+    def chunk_text(self, text):
+        """Metni kodlayıcının token sınırını aşmayan, örtüşen parçalara böler"""
+        return [text[start:end] for start, end in self.chunker.split(text)]
 
     # ================= LOAD TEXT ================= #
     def load_pdf(self, path):
-        from PyPDF2 import PdfReader
-        reader = PdfReader(path)
-        text = ""
-        for page in reader.pages:
-            try:
-                text += page.extract_text()
-            except Exception as e:
-                logger.warning(f"Sayfa metni çıkarılırken hata oluştu: {str(e)}")
-                # Boş satır ekleyerek devam et
-                text += "\n"
-        return text
+        # Sayfalar listede toplanıp tek seferde birleştirilir
+        return extract_pdf_text(path)
 
     # ================= INDEX OLUŞTURMA ================= #
-    def build_index(self, documents, doc_names=None):
-        all_chunks = []
+    def _start_index(self, batches, index_type=None, params=None):
+        """(vektörler, ID'ler) gruplarından yeni bir index oluşturur; gerekiyorsa önce eğitir.
+
+        Kalıcı (stabil) chunk ID'leri add_with_ids ile verilir. params
+        verilmezse motorun index_params değerleri kullanılır. Index ile
+        birlikte kullanılan yapılandırmayı (index_config) döndürür.
+        """
+        index_type = index_type or self.index_type
+        vectors = np.vstack([v for v, _ in batches])
+        ids = np.concatenate([i for _, i in batches])
+        params = index_factory.resolve_params(params if params is not None else self.index_params)
+        params["index_type"] = index_type
+        train_vectors = None
+        if index_factory.needs_training(index_type, params):
+            train_vectors = vectors[:params["train_size"]]
+            logger.info(f"{index_type} index'i {len(train_vectors)} vektörle eğitiliyor...")
+        index = index_factory.create_index(index_type, vectors.shape[1], params, train_vectors)
+        index.add_with_ids(vectors, ids)
+        index_config = {"index_type": params.pop("index_type"), "dim": int(vectors.shape[1]), "params": params,
+                        "encoder": self.encoder_name, "chunking": self.chunker.config}
+        return index, index_config
+
+    def _save_index_config(self, index_config, path):
+        """Index türünü ve parametrelerini faiss.index'in yanına kaydeder"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(index_config, f, ensure_ascii=False, indent=4)
+
+    def _read_index_config(self, path, index):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                index_config = json.load(f)
+        else:
+            # Yapılandırma dosyası olmayan eski index'ler düz (flat) index'tir
+            index_config = {"index_type": "flat", "dim": index.d,
+                            "params": dict(index_factory.DEFAULT_INDEX_PARAMS)}
+        index_factory.apply_defaults(index, index_config["params"])
+        encoder = index_config.get("encoder", MODEL_NAME)
+        if encoder != self.encoder_name:
+            logger.warning(f"Index {encoder} ile oluşturulmuş, sorgular {self.encoder_name} ile kodlanıyor "
+                           f"(sapma için: python onnx_encoder.py)")
+        return index_config
+
+    def _embed(self, chunks):
+        """Chunk metinlerini float32 vektörlere dönüştürür; önbellekte olanlar yeniden kodlanmaz"""
+        if self.embedding_cache is not None:
+            return self.embedding_cache.encode(self, chunks)
+        return self.model.encode(chunks).astype("float32")
+
+    def _flush_embedding_cache(self):
+        """Build/güncelleme sonunda önbelleğin değişen sayfalarını diske yazar (her grupta değil)"""
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+
+    def _make_chunks(self, doc, doc_info, start_vector_id, spans=None):
+        """Bir belgeyi chunk'lara böler ve chunk meta verilerini üretir.
+
+        spans (karakter aralıkları) verilmezse belge burada parçalanır.
+        """
+        if spans is None:
+            spans = self.chunker.split(doc)
+        chunks = [doc[start:end] for start, end in spans]
         metadata = []
-        doc_metadata = []
-        
+        for chunk_id, (chunk, (start, end)) in enumerate(zip(chunks, spans)):
+            metadata.append({
+                "vector_id": start_vector_id + chunk_id,
+                "doc_id": doc_info["doc_id"],
+                "chunk_id": chunk_id,
+                "text": chunk,
+                "doc_name": doc_info["name"],
+                "doc_hash": doc_info["hash"],
+                "start_char": start,
+                "end_char": end
+            })
+        doc_info["chunk_count"] = len(chunks)
+        return chunks, metadata
+
+    @staticmethod
+    def _doc_hash(doc):
+        """Belge metninin MD5 özeti (değişiklik tespiti ve özet anahtarı)"""
+        return hashlib.md5(doc.encode('utf-8')).hexdigest()
+
+    def _new_doc_info(self, doc_id, name, doc_hash):
+        return {
+            "doc_id": doc_id,
+            "name": name,
+            "hash": doc_hash,
+            "chunk_count": 0,
+            "created_at": datetime.now().isoformat()
+        }
+
+    def build_index(self, documents, doc_names=None, progress_callback=None):
+        """Belge listesinden index'i baştan oluşturur (bkz. build_index_stream)"""
         # Belge isimleri sağlanmamışsa varsayılan isimler oluştur
         if doc_names is None:
-            doc_names = [f"Belge_{i+1}" for i in range(len(documents))]
-
-        for doc_id, doc in enumerate(documents):
-            chunks = self.chunk_text(doc)
-            doc_hash = hashlib.md5(doc.encode('utf-8')).hexdigest()
-            doc_info = {
-                "doc_id": doc_id,
-                "name": doc_names[doc_id],
-                "hash": doc_hash,
-                "chunk_count": len(chunks),
-                "created_at": datetime.now().isoformat()
-            }
+            doc_names = (f"Belge_{i+1}" for i in itertools.count())
+        return self.build_index_stream(zip(doc_names, documents), progress_callback=progress_callback)
+
+    def _iter_chunks(self, named_documents, doc_metadata, summaries=None):
+        """(isim, metin) akışını (chunk, meta) akışına çevirir; belge bilgisini doc_metadata'ya ekler.
+
+        summaries (hash → özet) verilirse grubun belgelerinin özetleri de eklenir.
+        """
+        vector_id = 0
+        doc_id = 0
+        # Belgeler gruplar halinde tek çağrıyla tokenize edilir
+        for group in self._batched(named_documents, CHUNK_DOC_BATCH):
+            hashes = [self._doc_hash(doc) for _, doc in group]
+            if summaries is not None:
+                self._add_summaries([(doc_hash, doc) for doc_hash, (_, doc) in zip(hashes, group)], summaries)
+            all_spans = self.chunker.split_many([doc for _, doc in group])
+            for (name, doc), doc_hash, spans in zip(group, hashes, all_spans):
+                doc_info = self._new_doc_info(doc_id, name, doc_hash)
+                chunks, chunk_meta = self._make_chunks(doc, doc_info, vector_id, spans)
+                doc_metadata.append(doc_info)
+                doc_id += 1
+                vector_id += len(chunks)
+                for chunk, meta in zip(chunks, chunk_meta):
+                    yield chunk, meta
+
+    def _published_summaries(self):
+        """Yayındaki neslin özet tablosunun kopyası (motor yüklü değilse diskten okunur)"""
+        if self.index is not None:
+            return dict(self.summaries)
+        return load_summaries(self._paths(index_generations.read_current(self.index_root))["summaries"])
+
+    def _add_summaries(self, hashed_documents, summaries):
+        """Özeti olmayan belgelerin ((hash, metin) çiftleri) özetlerini tek toplu gömme ile çıkarıp summaries'e ekler"""
+        pending = {}
+        for doc_hash, doc in hashed_documents:
+            if doc_hash not in summaries:
+                pending.setdefault(doc_hash, doc)
+        if not pending:
+            return
+        # Cümle gömmeleri de gömme önbelleğinden geçer; değişmeyen cümleler yeniden kodlanmaz
+        summarizer = ExtractiveSummarizer(self._embed, self.summary_sentences)
+        with self.metrics.timer("summarize"):
+            # Aday cümlesi olmayan belgeler de kaydedilir (None), her güncellemede yeniden denenmez
+            for doc_hash, summary in zip(pending, summarizer.summarize_many(list(pending.values()))):
+                summaries[doc_hash] = summary
+
+    @staticmethod
+    def _batched(iterable, batch_size):
+        """Akışı en fazla batch_size elemanlı listelere böler"""
+        iterator = iter(iterable)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def build_index_stream(self, named_documents, batch_size=None, progress_callback=None, publish_callback=None):
+        """Index'i akış halinde, sınırlı bellekle oluşturur.
+
+        Belge okuyucu → chunker → sabit boyutlu kodlama grupları → index.add →
+        meta veri yazıcısı şeklinde çalışır; bellekte aynı anda en fazla
+        batch_size chunk tutulur. Dosyalar yeni bir nesil dizinine yazılır ve
+        iş bitince CURRENT işaretçisi atomik olarak bu nesle çevrilir.
+        publish_callback, nesil yayınlanmadan hemen önce nesil adıyla çağrılır
+        (içerik yoksa hiç çağrılmaz).
+        """
+        batch_size = batch_size or self.build_batch_size
+        doc_metadata = []
+        index = None
+        index_config = None
+        # Eğitim gerektiren index'lerde ilk train_size vektör index oluşturulana kadar bekletilir
+        buffered = []
+        buffered_count = 0
+        total = 0
+        start_time = time.time()
+
+        generation = index_generations.new_generation(self.index_root)
+        paths = self._paths(generation)
+        writer = ChunkStoreWriter(paths["chunks"])
+        lexical_writer = LexicalIndexWriter(paths["lexical"]) if self.build_lexical else None
+        dedup = ChunkDeduplicator(self.dedup_threshold) if self.dedup else None
+        # Hash'i değişmeyen belgelerin yayındaki özetleri yeniden çıkarılmaz
+        summaries = self._published_summaries() if self.build_summaries else None
+        centroids = CentroidBuilder(self.doc_centroids, self.doc_centroid_chunks) if self.doc_centroids else None
+        vectors = 0
+        try:
+            for batch in self._batched(self._iter_chunks(named_documents, doc_metadata, summaries), batch_size):
+                # Kopya chunk'lar kodlanmaz; asıl chunk'ın vektörünü paylaşır
+                unique = dedup.assign([meta for _, meta in batch]) if dedup is not None else [True] * len(batch)
+                fresh = [item for item, is_new in zip(batch, unique) if is_new]
+                sources = []
+                if fresh:
+                    embeddings = self._embed([chunk for chunk, _ in fresh])
+                    ids = np.array([meta["vector_id"] for _, meta in fresh], dtype="int64")
+                    sources.append((embeddings, ids))
+                if centroids is not None:
+                    # Kopya chunk'lar da belgelerinin merkezine asıl chunk'ın vektörüyle katılır
+                    centroids.add([meta["doc_id"] for _, meta in batch],
+                                  self._vectors_of([meta["vector_id"] for _, meta in batch],
+                                                   sources + buffered, index))
+                if fresh:
+                    if index is None:
+                        buffered.append((embeddings, ids))
+                        buffered_count += len(ids)
+                        if (not index_factory.needs_training(self.index_type, self.index_params) or
+                                buffered_count >= self.index_params["train_size"]):
+                            index, index_config = self._start_index(buffered)
+                            buffered = []
+                    else:
+                        index.add_with_ids(embeddings, ids)
+
+                for (_, meta), is_new in zip(batch, unique):
+                    writer.append(meta)
+                    if lexical_writer is not None and is_new:
+                        lexical_writer.append(meta)
+                total += len(batch)
+                vectors += len(fresh)
+
+                elapsed = time.time() - start_time
+                stats = {
+                    "documents": len(doc_metadata),
+                    "chunks": total,
+                    "vectors": vectors,
+                    "elapsed": elapsed,
+                    "chunks_per_sec": total / elapsed if elapsed > 0 else 0.0
+                }
+                logger.info(f"İşlenen chunk: {total} ({stats['chunks_per_sec']:.1f} chunk/s)")
+                if progress_callback is not None:
+                    progress_callback(stats)
+
+            self._flush_embedding_cache()
+            if index is None and buffered:
+                index, index_config = self._start_index(buffered)
+
+            if index is None:
+                writer.abort()
+                index_generations.discard(self.index_root, generation)
+                print("⚠️ Index oluşturulacak içerik bulunamadı.")
+                return
+
+            faiss.write_index(index, paths["index"])
+            if dedup is not None:
+                index_config["dedup"] = dedup.report()
+                dedup.save(paths["dedup"])
+            self._save_index_config(index_config, paths["config"])
+            writer.close()
+            if lexical_writer is not None:
+                lexical_writer.close()
+            if summaries is not None:
+                # Derlemden çıkan belgelerin özetleri taşınmaz
+                hashes = {d["hash"] for d in doc_metadata}
+                save_summaries({h: v for h, v in summaries.items() if h in hashes}, paths["summaries"])
+            if centroids is not None:
+                centroids.build().save(paths["doc_index"])
+            self._save_doc_metadata(doc_metadata, paths["doc_metadata"])
+        except BaseException:
+            writer.abort()
+            if lexical_writer is not None:
+                lexical_writer.abort()
+            index_generations.discard(self.index_root, generation)
+            raise
+
+        if publish_callback is not None:
+            publish_callback(generation)
+        index_generations.publish(self.index_root, generation, self.keep_generations)
+
+        if self.index is not None:
+            # Aramalara hizmet veren motor: yeni nesil okunup kesintisiz devreye alınır
+            self.reload_generation(generation)
+        else:
+            # Bellekte tutulmaz; ilk aramada yeni nesil diskten yüklenir
+            with self._lock.write():
+                self.index = None
+                self.docs = []
+                self.doc_metadata = doc_metadata
+                self._doc_vector_ids = {}
+                self.lexical = None
+                self.summaries = {}
+                self.doc_index = None
+                self._dedup = None
+                self.generation = None
+                self._set_paths(paths)
+                self._bump_index_version()
+
+        elapsed = time.time() - start_time
+        print(f"Index oluşturuldu → {total} chunk ({total / max(elapsed, 1e-9):.1f} chunk/s)")
+        print(f"Belge sayısı: {len(doc_metadata)}")
+        if dedup is not None:
+            self._print_dedup_report(index_config["dedup"])
+
+    @staticmethod
+    def _print_dedup_report(report):
+        last_run = report["last_run"]
+        print(f"Tekilleştirme → {report['chunks']} chunk, {report['vectors']} vektör "
+              f"(tasarruf: %{report['saved_ratio'] * 100:.1f}; bu çalıştırmada {last_run['chunks']} chunk, "
+              f"birebir kopya: {last_run['exact_duplicates']}, benzer: {last_run['near_duplicates']})")
+
+    # ================= ARTIMLI GÜNCELLEME ================= #
+    def _working_copy(self):
+        """Güncelleme için yayındaki index'in bir kopyasını döndürür.
+
+        Kopya üzerinde çalışılır, böylece güncelleme sürerken aramalar eski
+        index'le devam eder. Eski düz index'ler ID eşlemeli hale getirilir.
+        """
+        self._ensure_loaded()
+        if self.index is None:
+            return None, None
+        if type(self.index) is faiss.IndexFlatL2:
+            # Eski düz index: konumlar ID olarak kullanılır
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+            return self._start_index([(vectors, self._chunk_array("vector_ids"))], index_type="flat",
+                                     params=index_factory.DEFAULT_INDEX_PARAMS)
+        if self.mmap:
+            # Eşlenen index salt okunurdur; değiştirilebilir kopya diskten okunur
+            return faiss.read_index(self.index_path), dict(self.index_config)
+        return faiss.clone_index(self.index), dict(self.index_config)
+
+    def _chunk_array(self, name):
+        """Chunk deposundaki bir sütun (depo yüklü değilse boş dizi)"""
+        if isinstance(self.docs, ChunkStore):
+            return np.asarray(getattr(self.docs, name), dtype="int64")
+        return np.zeros(0, dtype="int64")
+
+    def _next_vector_id(self):
+        vector_ids = self._chunk_array("vector_ids")
+        return int(vector_ids.max()) + 1 if len(vector_ids) else 0
+
+    def _next_doc_id(self):
+        if not self.doc_metadata:
+            return 0
+        return max(d["doc_id"] for d in self.doc_metadata) + 1
+
+    def _drop_doc_ids(self, index, index_config, doc_ids):
+        """Verilen belgelere ait chunk'ları index'ten siler.
+
+        (index, kalan chunk'ların maskesi, silinen vektör ID'leri) döndürür; HNSW silmeyi
+        desteklemediğinden kalan vektörlerle yeniden kurulur.
+        """
+        keep = ~np.isin(self._chunk_array("doc_ids"), list(doc_ids))
+        vector_ids = self._chunk_array("vector_ids")
+        # Başka bir belgenin de kullandığı (tekilleştirilmiş) vektörler silinmez
+        removed = np.setdiff1d(vector_ids[~keep], vector_ids[keep])
+        if len(removed) and index is not None:
+            if index_factory.supports_remove(index):
+                index.remove_ids(removed)
+            else:
+                index = self._rebuild_from_ids(index, index_config, np.unique(vector_ids[keep]))
+        return index, keep, removed
+
+    def _rebuild_from_ids(self, index, index_config, ids):
+        """Verilen ID'lerin vektörleriyle aynı türde yeni bir index kurar"""
+        if len(ids):
+            vectors = index.reconstruct_batch(ids)
+        else:
+            vectors = np.zeros((0, index.d), dtype="float32")
+        new_index, _ = self._start_index([(vectors, ids)], index_type=index_config["index_type"],
+                                         params=index_config["params"])
+        return new_index
+
+    @staticmethod
+    def _vectors_of(vector_ids, sources, index=None):
+        """Verilen vektör ID'lerinin vektörleri; önce (vektörler, ID'ler) kaynaklarında, yoksa index'te aranır.
+
+        Kopya chunk'lar asıl chunk'ın vektör ID'sini taşır; asıl chunk aynı
+        grupta, eğitim için bekletilen vektörlerde ya da index'te olabilir.
+        """
+        vector_ids = np.asarray(vector_ids, dtype="int64")
+        dim = sources[0][0].shape[1] if sources else index.d
+        vectors = np.zeros((len(vector_ids), dim), dtype="float32")
+        found = np.zeros(len(vector_ids), dtype=bool)
+        for source_vectors, ids in sources:
+            if found.all():
+                break
+            order = np.argsort(ids)
+            pos = np.minimum(np.searchsorted(ids[order], vector_ids), len(ids) - 1)
+            hit = ~found & (ids[order][pos] == vector_ids)
+            vectors[hit] = source_vectors[order[pos[hit]]]
+            found |= hit
+        if not found.all():
+            vectors[~found] = index.reconstruct_batch(vector_ids[~found])
+        return vectors
+
+    def _load_dedup(self):
+        """Yayındaki neslin tekilleştirme durumu (yoksa chunk'lardan kurulur).
+
+        Son güncellemenin durumu bellekteyse diskten okunmaz; güncelleme onu
+        değiştireceğinden önbellekten alınır, yayınlanınca yeni nesille geri konur.
+        """
+        if not self.dedup:
+            return None
+        dedup, self._dedup = self._dedup, None
+        if dedup is not None:
+            dedup.reset_stats()
+            return dedup
+        path = self._paths(self.generation)["dedup"]
+        if ChunkDeduplicator.exists(path):
+            return ChunkDeduplicator.load(path, self.dedup_threshold)
+        return ChunkDeduplicator.from_chunks(self.docs if isinstance(self.docs, ChunkStore) else [],
+                                             self.dedup_threshold)
+
+    def _publish_update(self, index, index_config, doc_metadata, keep, new_meta, dedup=None, summaries=None,
+                        doc_index=None, publish_callback=None):
+        """Güncellenmiş index'i yeni bir nesle yazar, yayınlar ve bellekteki durumu değiştirir.
+
+        summaries ve doc_index verilmezse yayındakiler kalan belgelere süzülerek taşınır.
+        """
+        generation = index_generations.new_generation(self.index_root)
+        paths = self._paths(generation)
+        try:
+            writer = ChunkStoreWriter(paths["chunks"])
+            lexical_writer = LexicalIndexWriter(paths["lexical"]) if self.build_lexical else None
+            kept = np.flatnonzero(keep)
+            vector_ids = self._chunk_array("vector_ids")
+            # BM25'e her vektör bir kez eklenir (paylaşılan chunk'ların ilk satırı)
+            first = np.zeros(len(kept), dtype=bool)
+            first[np.unique(vector_ids[kept], return_index=True)[1]] = True
+            if lexical_writer is not None and self.lexical is not None and self.lexical.can_carry_over():
+                # Kalan chunk'ların posting'leri devralınır; yalnızca yeni chunk'lar tokenize edilir
+                lexical_writer.carry_over(self.lexical, np.setdiff1d(vector_ids, vector_ids[kept]))
+                first[:] = False
+            rows = ((self.docs[pos], is_first) for pos, is_first in zip(kept, first))
+            new_rows = ((meta, not meta.get("duplicate")) for meta in new_meta)
+            for meta, is_first in itertools.chain(rows, new_rows):
+                writer.append(meta)
+                if lexical_writer is not None and is_first:
+                    lexical_writer.append(meta)
+            writer.close()
+            if lexical_writer is not None:
+                lexical_writer.close()
+            faiss.write_index(index, paths["index"])
+            if dedup is not None:
+                index_config["dedup"] = dedup.report(len(writer), index.ntotal)
+                dedup.save(paths["dedup"])
+            else:
+                index_config.pop("dedup", None)
+            self._save_index_config(index_config, paths["config"])
+            # Yalnızca index'te kalan belgelerin özetleri taşınır
+            hashes = {d["hash"] for d in doc_metadata}
+            summaries = {h: v for h, v in (summaries if summaries is not None else self.summaries).items()
+                         if h in hashes}
+            if self.build_summaries:
+                save_summaries(summaries, paths["summaries"])
+            # Belge merkezleri olmayan eski nesillerde belge düzeyindeki index oluşturulmaz
+            if doc_index is None and self.doc_centroids:
+                doc_index = self.doc_index
+            if doc_index is not None:
+                doc_index = doc_index.keep_documents(d["doc_id"] for d in doc_metadata)
+                doc_index.save(paths["doc_index"])
+                doc_index = DocumentIndex.load(paths["doc_index"])
+            self._save_doc_metadata(doc_metadata, paths["doc_metadata"])
+        except BaseException:
+            index_generations.discard(self.index_root, generation)
+            raise
+        if publish_callback is not None:
+            publish_callback(generation)
+        index_generations.publish(self.index_root, generation, self.keep_generations)
+        self._apply_state({
+            "generation": generation,
+            "paths": paths,
+            "index": index,
+            "index_config": index_config,
+            "doc_metadata": doc_metadata,
+            "docs": ChunkStore(paths["chunks"], doc_metadata),
+            "lexical": LexicalIndex(paths["lexical"]) if LexicalIndex.exists(paths["lexical"]) else None,
+            "summaries": summaries if self.build_summaries else {},
+            "doc_index": doc_index,
+            "dedup": dedup
+        })
+
+    def update_documents(self, documents, doc_names, remove_missing=False, progress_callback=None,
+                         publish_callback=None):
+        """Belgeleri index'e artımlı olarak ekler/günceller.
+
+        Hash'i değişmeyen belgeler atlanır, değişenlerin eski chunk'ları silinip
+        yalnızca yeni chunk'lar gömülür. remove_missing=True ise listede olmayan
+        belgeler index'ten kaldırılır. Sonuç yeni bir nesil olarak yayınlanır.
+        progress_callback her kodlama grubundan sonra build_index_stream'deki
+        istatistiklerle (ve total_chunks ile), publish_callback yeni nesil
+        yayınlanmadan hemen önce çağrılır.
+        """
+        self._ensure_loaded()
+        existing = {d["name"]: d for d in self.doc_metadata}
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        # Parçalama ayarları değiştiyse tüm belgeler yeniden parçalanır
+        rechunk = self.index is not None and (self.index_config or {}).get("chunking") != self.chunker.config
+        if rechunk and existing:
+            print("Parçalama ayarları değişti, tüm belgeler yeniden parçalanacak.")
+
+        to_drop = []
+        pending = []
+        # Her belgenin MD5'i bir kez hesaplanır; değişiklik tespiti, özetler ve belge bilgisi aynı hash'i kullanır
+        hashes = [self._doc_hash(doc) for doc in documents]
+        for name, doc, doc_hash in zip(doc_names, documents, hashes):
+            old = existing.get(name)
+            if old is not None and old["hash"] == doc_hash and not rechunk:
+                stats["unchanged"] += 1
+                continue
+            if old is not None:
+                to_drop.append(old["doc_id"])
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+            pending.append((name, doc, old["doc_id"] if old is not None else None, doc_hash))
+
+        if remove_missing:
+            wanted = set(doc_names)
+            missing = [d["doc_id"] for d in self.doc_metadata if d["name"] not in wanted]
+            stats["removed"] = len(missing)
+            to_drop.extend(missing)
+
+        # Özetler yalnızca hash'i değişen (ya da henüz özeti olmayan) belgeler için çıkarılır
+        summaries = None
+        if self.build_summaries:
+            summaries = dict(self.summaries)
+            missing_summaries = [(doc_hash, doc) for doc_hash, doc in zip(hashes, documents)
+                                 if doc_hash not in summaries]
+            for group in self._batched(missing_summaries, CHUNK_DOC_BATCH):
+                self._add_summaries(group, summaries)
+            if missing_summaries and not pending and not to_drop and self.index is not None:
+                # Özetsiz (eski) bir nesil: index aynı kalır, özetlerle yeni nesil yayınlanır
+                self._flush_embedding_cache()
+                index, index_config = self._working_copy()
+                self._publish_update(index, index_config, list(self.doc_metadata),
+                                     np.ones(len(self.docs), dtype=bool), [], self._load_dedup(), summaries,
+                                     publish_callback=publish_callback)
+                print(f"{len(missing_summaries)} belgenin özeti çıkarıldı.")
+                return stats
+
+        if not pending and not to_drop:
+            print("Index güncel, değişiklik yok.")
+            return stats
+
+        next_vid = self._next_vector_id()
+        next_doc_id = self._next_doc_id()
+        doc_metadata = [d for d in self.doc_metadata if d["doc_id"] not in set(to_drop)]
+        new_chunks = []
+        new_meta = []
+        all_spans = self.chunker.split_many([doc for _, doc, _, _ in pending])
+        for (name, doc, doc_id, doc_hash), spans in zip(pending, all_spans):
+            if doc_id is None:
+                doc_id = next_doc_id
+                next_doc_id += 1
+            doc_info = self._new_doc_info(doc_id, name, doc_hash)
+            chunks, chunk_meta = self._make_chunks(doc, doc_info, next_vid, spans)
+            next_vid += len(chunks)
             doc_metadata.append(doc_info)
-            
-            for chunk_id, chunk in enumerate(chunks):
-                all_chunks.append(chunk)
-                metadata.append({
-                    "doc_id": doc_id,
-                    "chunk_id": chunk_id,
-                    "text": chunk,
-                    "doc_name": doc_names[doc_id],
-                    "doc_hash": doc_hash
-                })
+            new_chunks.extend(chunks)
+            new_meta.extend(chunk_meta)
+        doc_metadata.sort(key=lambda d: d["doc_id"])
+
+        index, index_config = self._working_copy()
+        index, keep, removed = self._drop_doc_ids(index, index_config, to_drop)
+        if index_config is not None:
+            index_config["chunking"] = self.chunker.config
+        dedup = self._load_dedup()
+        if dedup is not None:
+            dedup.remove(removed)
+            unique = dedup.assign(new_meta)
+            new_chunks = [chunk for chunk, is_new in zip(new_chunks, unique) if is_new]
+        fresh_meta = [m for m in new_meta if not m.get("duplicate")]
+        if new_chunks:
+            start_time = time.time()
+            parts = []
+            for start in range(0, len(new_chunks), self.build_batch_size):
+                parts.append(self._embed(new_chunks[start:start + self.build_batch_size]))
+                if progress_callback is not None:
+                    done = min(start + self.build_batch_size, len(new_chunks))
+                    elapsed = time.time() - start_time
+                    progress_callback({"documents": len(pending), "chunks": done, "vectors": done,
+                                       "total_chunks": len(new_chunks), "elapsed": elapsed,
+                                       "chunks_per_sec": done / elapsed if elapsed > 0 else 0.0})
+            embeddings = np.vstack(parts)
+            self._flush_embedding_cache()
+            ids = np.array([m["vector_id"] for m in fresh_meta], dtype="int64")
+            if index is None:
+                index, index_config = self._start_index([(embeddings, ids)])
+            else:
+                index.add_with_ids(embeddings, ids)
+        else:
+            embeddings = None
 
-        embeddings = self.model.encode(all_chunks).astype("float32")
+        # Yalnızca yeni/değişen belgelerin merkezleri hesaplanır; index boşsa belge düzeyindeki index yeniden başlar
+        doc_index = None
+        centroids = CentroidBuilder(self.doc_centroids, self.doc_centroid_chunks)
+        base = self.doc_index if self.index is not None else CentroidBuilder().build()
+        if self.doc_centroids and base is not None:
+            if new_meta:
+                # Kopya chunk'ların vektörü bu güncellemede kodlanmış ya da önceki bir nesilden gelir
+                sources = [(embeddings, ids)] if embeddings is not None else []
+                centroids.add([m["doc_id"] for m in new_meta],
+                              self._vectors_of([m["vector_id"] for m in new_meta], sources, index))
+            doc_index = base.keep_documents(set(d["doc_id"] for d in doc_metadata) - set(to_drop)).merge(
+                centroids.build())
 
-        dim = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dim)
-        index.add(embeddings)
+        if index is not None:
+            self._publish_update(index, index_config, doc_metadata, keep, new_meta, dedup, summaries, doc_index,
+                                 publish_callback)
 
-        # Kaydet
-        faiss.write_index(index, self.index_path)
-        with open(self.metadata_path, "w", encoding="utf-8") as f:
-            json.dump(metadata, f, ensure_ascii=False, indent=4)
-        self._save_doc_metadata(doc_metadata)
+        print(f"Index güncellendi → eklenen: {stats['added']}, güncellenen: {stats['updated']}, "
+              f"değişmeyen: {stats['unchanged']}, silinen: {stats['removed']}")
+        if index is not None and "dedup" in index_config:
+            self._print_dedup_report(index_config["dedup"])
+        return stats
 
-        print(f"Index oluşturuldu → {len(all_chunks)} chunk")
-        print(f"Belge sayısı: {len(documents)}")
+    def remove_documents(self, doc_names):
+        """İsmi verilen belgeleri ve chunk'larını index'ten kaldırır"""
+        self._ensure_loaded()
+        names = set(doc_names)
+        doc_ids = [d["doc_id"] for d in self.doc_metadata if d["name"] in names]
+        if not doc_ids or self.index is None:
+            print("Kaldırılacak belge bulunamadı.")
+            return 0
+        index, index_config = self._working_copy()
+        index, keep, removed = self._drop_doc_ids(index, index_config, doc_ids)
+        dedup = self._load_dedup()
+        if dedup is not None:
+            dedup.remove(removed)
+        doc_metadata = [d for d in self.doc_metadata if d["doc_id"] not in set(doc_ids)]
+        self._publish_update(index, index_config, doc_metadata, keep, [], dedup)
+        print(f"{len(doc_ids)} belge ({int((~keep).sum())} chunk) index'ten kaldırıldı.")
+        return len(doc_ids)
 
     # ================= İNDEX YÜKLE ================= #
+    def _read_state(self, generation):
+        """Bir neslin index'ini ve meta verilerini okur (dosyalar eksikse None)"""
+        paths = self._paths(generation)
+        if generation is None:
+            # Eski sürümlerin metadata.json dosyası bir kez chunk deposuna dönüştürülür
+            legacy_json = os.path.join(self.index_root, "metadata.json")
+            if not ChunkStore.exists(paths["chunks"]) and os.path.exists(legacy_json):
+                migrate_json_metadata(legacy_json, paths["chunks"])
+        if not (os.path.exists(paths["index"]) and
+                ChunkStore.exists(paths["chunks"]) and
+                os.path.exists(paths["doc_metadata"])):
+            return None
+        index = index_factory.read_index(paths["index"], mmap=self.mmap)
+        doc_metadata = self._read_doc_metadata(paths["doc_metadata"])
+        return {
+            "generation": generation,
+            "paths": paths,
+            "index": index,
+            "index_config": self._read_index_config(paths["config"], index),
+            "doc_metadata": doc_metadata,
+            "docs": ChunkStore(paths["chunks"], doc_metadata),
+            # BM25 index'i olmayan eski nesillerde yalnızca dense arama yapılır
+            "lexical": LexicalIndex(paths["lexical"]) if LexicalIndex.exists(paths["lexical"]) else None,
+            "summaries": load_summaries(paths["summaries"]),
+            # Belge merkezleri olmayan eski nesillerde belge araması tüm chunk'larda yapılır
+            "doc_index": DocumentIndex.load(paths["doc_index"]) if DocumentIndex.exists(paths["doc_index"]) else None
+        }
+
+    def _apply_state(self, state):
+        """Okunan durumu yazma kilidi altında devreye alır; süren aramalar eski durumla biter"""
+        # Belge → vektör ID tablosu kilit dışında hazırlanır
+        doc_vector_ids = state["docs"].doc_vector_ids()
+        with self._lock.write():
+            self.generation = state["generation"]
+            self._set_paths(state["paths"])
+            self.index = state["index"]
+            self.index_config = state["index_config"]
+            self.doc_metadata = state["doc_metadata"]
+            self.docs = state["docs"]
+            self.lexical = state["lexical"]
+            self.summaries = state["summaries"]
+            self.doc_index = state["doc_index"]
+            self._dedup = state.get("dedup")
+            # Belge ID'si → o belgenin vektör ID'leri (filtreli arama için)
+            self._doc_vector_ids = doc_vector_ids
+            self._bump_index_version()
+
     def load_index(self):
-        if (os.path.exists(self.index_path) and 
-            os.path.exists(self.metadata_path) and
-            os.path.exists(self.doc_metadata_path)):
-            self.index = faiss.read_index(self.index_path)
-            with open(self.metadata_path, "r", encoding="utf-8") as f:
-                self.docs = json.load(f)
-            self._load_doc_metadata()
+        generation = index_generations.read_current(self.index_root)
+        with self.metrics.timer("index_load"):
+            state = self._read_state(generation)
+        if state is not None:
+            self._apply_state(state)
             print("📥 FAISS index yüklendi.")
             return True
         else:
             print("⚠️ Index dosyaları bulunamadı.")
             # Önceki verileri temizle
-            self.index = None
-            self.docs = []
-            self.doc_metadata = []
+            with self._lock.write():
+                self.index = None
+                self.docs = []
+                self.doc_metadata = []
+                self._doc_vector_ids = {}
+                self.lexical = None
+                self.summaries = {}
+                self.doc_index = None
+                self._dedup = None
+                self._bump_index_version()
+            return False
+
+    def _ensure_loaded(self):
+        """Index yüklü değilse (tek sefer) yükler; sorgu yolunda dosya sistemine dokunmaz"""
+        if self.index is not None:
+            return True
+        with self._load_mutex:
+            if self.index is None:
+                return self.load_index()
+        return True
+
+    def reload_generation(self, generation=None):
+        """Yeni nesli arka planda okuyup devreye alır (varsayılan: yayındaki nesil)"""
+        generation = generation or index_generations.read_current(self.index_root)
+        if generation is None or generation == self.generation:
+            return False
+        with self.metrics.timer("index_load"):
+            state = self._read_state(generation)
+        if state is None:
+            logger.warning(f"Index nesli eksik, atlanıyor: {generation}")
             return False
+        self._apply_state(state)
+        logger.info(f"Index nesli devreye alındı: {generation}")
+        return True
+
+    def start_watcher(self, interval=2.0):
+        """CURRENT işaretçisini izleyip yeni nesilleri otomatik yükleyen iş parçacığını başlatır"""
+        if self._watcher is None:
+            self._watcher = GenerationWatcher(self.index_root, lambda: self.generation,
+                                              self.reload_generation, interval)
+            self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _chunk_by_vector_id(self, vector_id, doc_ids=None):
+        """Arama sonucundaki ID'nin chunk'ını okur (-1 veya silinmiş ID için None)"""
+        if vector_id < 0:
+            return None
+        return self.docs.get_by_vector_id(vector_id, doc_ids)
+
+    def _bump_index_version(self):
+        """Index değiştiğinde sürümü artırır ve sorgu önbelleklerini boşaltır"""
+        self.index_version += 1
+        for cache in (self.query_cache, self.result_cache):
+            if cache is not None:
+                cache.clear()
+
+    def cache_stats(self):
+        """Sorgu gömme ve sonuç önbelleklerinin isabet/ıskalama sayaçları"""
+        return {
+            "index_version": self.index_version,
+            "query_cache": self.query_cache.stats() if self.query_cache is not None else None,
+            "result_cache": self.result_cache.stats() if self.result_cache is not None else None
+        }
+
+    def collect_metrics(self):
+        """Index boyutu, bellek ve önbellek durumu için (gauge, sayaç) listeleri.
+
+        Dosya boyutları yalnızca bu metot çağrıldığında okunur; sorgu yolunda ölçülmez.
+        """
+        with self._lock.read():
+            index = self.index
+            docs = self.docs
+            gauges = [
+                ("index_version", None, self.index_version, "Yüklü index sürümü"),
+                ("index_vectors", None, index.ntotal if index is not None else 0, "Index'teki vektör sayısı"),
+                ("documents", None, len(self.doc_metadata), "Belge sayısı"),
+                ("chunks", None, len(docs), "Chunk sayısı")
+            ]
+            if os.path.exists(self.index_path):
+                gauges.append(("index_file_bytes", None, os.path.getsize(self.index_path),
+                               "Diskteki FAISS index dosyasının boyutu"))
+            if isinstance(docs, ChunkStore):
+                store_bytes = sum(a.nbytes for a in (docs.text, docs.offsets, docs.doc_ids,
+                                                     docs.vector_ids, docs.chunk_ids))
+                gauges.append(("chunk_store_bytes", None, store_bytes, "Bellek eşlemeli chunk deposunun boyutu"))
+        gauges.append(("model_loaded", None, int(self._model is not None), "Gömme modeli yüklü mü"))
+        for stage, seconds in startup.timings().items():
+            gauges.append(("startup_seconds", {"stage": stage}, seconds,
+                           "Başlangıç aşamalarının (içe aktarma, model yükleme) ilk süresi"))
+        counters = []
+        for name, cache in (("query", self.query_cache), ("result", self.result_cache),
+                            ("embedding", self.embedding_cache)):
+            if cache is not None:
+                counters.append(("cache_hits", {"cache": name}, cache.hits, "Önbellek isabetleri"))
+                counters.append(("cache_misses", {"cache": name}, cache.misses, "Önbellek ıskalamaları"))
+        for name, cache in (("query", self.query_cache), ("result", self.result_cache)):
+            if cache is not None:
+                stats = cache.stats()
+                gauges.append(("cache_entries", {"cache": name}, stats["entries"], "Önbellekteki kayıt sayısı"))
+                gauges.append(("cache_bytes", {"cache": name}, stats["bytes"], "Önbelleğin yaklaşık boyutu"))
+        if self.qa_pool is not None:
+            gauges.append(("qa_workers_ready", None, self.qa_pool.ready, "Modeli yüklü QA worker sayısı"))
+            counters.append(("qa_timeouts", None, self.qa_pool.timeouts, "Süresi dolup iptal edilen QA istekleri"))
+            counters.append(("qa_worker_restarts", None, self.qa_pool.restarts,
+                             "İptal/hata nedeniyle yeniden başlatılan QA worker'ları"))
+        return gauges, counters
+
+    def _encode_query(self, query):
+        """Sorguyu gömer; tekrar eden sorgular önbellekten döner"""
+        return self._encode_queries([query])
+
+    def _encode_queries(self, queries):
+        """Sorguları tek bir model.encode çağrısıyla gömer; önbellekte olanlar kodlanmaz"""
+        keys = [normalize_query(q) for q in queries]
+        vectors = [self.query_cache.get(key) if self.query_cache is not None else None for key in keys]
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing:
+            miss_keys = list(dict.fromkeys(keys[i] for i in missing))
+            with self.metrics.timer("encode"):
+                encoded = self.model.encode(miss_keys).astype("float32")
+            by_key = {key: encoded[j:j + 1] for j, key in enumerate(miss_keys)}
+            for key, vec in by_key.items():
+                if self.query_cache is not None:
+                    self.query_cache.put(key, vec)
+            for i in missing:
+                vectors[i] = by_key[keys[i]]
+        return np.vstack(vectors)
+
+    def _cached_results(self, key):
+        if self.result_cache is None or key is None:
+            return None
+        results = self.result_cache.get(key)
+        # Çağıranın değişiklikleri önbelleğe yansımasın
+        return None if results is None else [dict(r) for r in results]
+
+    def _store_results(self, key, results):
+        if self.result_cache is not None and key is not None:
+            self.result_cache.put(key, [dict(r) for r in results])
+
+    def _format_result(self, doc, dist):
+        return {
+            "text": doc["text"],
+            "score": float(dist),
+            "doc_name": doc.get("doc_name", "Bilinmiyor"),
+            "doc_id": doc.get("doc_id", -1),
+            "start_char": doc.get("start_char"),
+            "end_char": doc.get("end_char"),
+            # Tekilleştirilmiş chunk'ı içeren tüm belgeler
+            "doc_ids": doc.get("doc_ids", [doc.get("doc_id", -1)])
+        }
 
     # ================= ARAMA ================= #
-    def search(self, query, k=5):
+    def search(self, query, k=5, nprobe=None, ef_search=None, mode="dense"):
+        """Sorguya en yakın k chunk'ı döndürür.
+
+        nprobe (IVF) ve ef_search (HNSW) verilirse bu sorgu için index'in
+        varsayılan hız/isabet ayarlarını geçersiz kılar. mode "dense" (skor:
+        L2 uzaklığı, küçük daha iyi), "lexical" (BM25, sorgu gömülmez) veya
+        "hybrid" (RRF, büyük daha iyi) olabilir.
+        """
         start_time = time.time()
+        self.metrics.inc("queries")
         
-        # Her seferinde index dosyalarının varlığını kontrol et
-        if not os.path.exists(self.index_path) or not os.path.exists(self.metadata_path):
-            print("⚠️ Index dosyaları bulunamadı.")
+        # Index yüklü değilse yükle (yeni nesiller izleyici tarafından devreye alınır)
+        if not self._ensure_loaded():
             return []
-        
-        # Index yüklü değilse veya dosyalar değişmişse yeniden yükle
-        if self.index is None:
-            if not self.load_index():
+
+        with self._lock.read(), self.metrics.timer("search"):
+            # Güvenlik kontrolü
+            if self.index is None or not self.docs:
+                print("⚠️ Index veya belgeler yüklenemedi.")
                 return []
 
-        # Güvenlik kontrolü
-        if self.index is None or not self.docs:
-            print("⚠️ Index veya belgeler yüklenemedi.")
-            return []
+            mode = self._resolve_mode(mode)
+            cache_key = ("search", normalize_query(query), k, nprobe, ef_search, mode, self.index_version)
+            results = self._cached_results(cache_key)
+            if results is not None:
+                return results
 
-        q_vec = self.model.encode([query]).astype("float32")
-        distances, indices = self.index.search(q_vec, min(k, self.index.ntotal))
+            q_vec = self._encode_query(query) if mode != "lexical" else None
+            (scores, ids), = self._retrieve([query], q_vec, None, k, nprobe, ef_search, mode)
 
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx < len(self.docs):  # Bounds check
-                results.append({
-                    "text": self.docs[idx]["text"],
-                    "score": float(dist),
-                    "doc_name": self.docs[idx].get("doc_name", "Bilinmiyor"),
-                    "doc_id": self.docs[idx].get("doc_id", -1)
-                })
+            results = self._hydrate(ids, scores)
+            self._store_results(cache_key, results)
         
         elapsed_time = time.time() - start_time
         print(f"Arama {elapsed_time:.4f} saniyede tamamlandı.")
@@ -196,80 +1137,379 @@ class SearchEngine:
     def get_document_list(self):
         """Yüklenen belgelerin listesini döndürür"""
         if not self.doc_metadata:
-            self._load_doc_metadata()
+            self._ensure_loaded()
         return self.doc_metadata
     
-    def search_with_document_filter(self, query, doc_id=None, k=5):
-        """Belirli bir belgede arama yapar"""
-        # Index yüklü değilse veya dosyalar değişmişse yeniden yükle
-        if not os.path.exists(self.index_path) or not os.path.exists(self.metadata_path):
-            print("⚠️ Index dosyaları bulunamadı.")
+    def _resolve_doc_filter(self, doc_id=None, doc_ids=None, where=None):
+        """Filtre koşullarını izin verilen belge ID'leri kümesine çevirir (filtre yoksa None)"""
+        if doc_id is None and doc_ids is None and where is None:
+            return None
+        allowed = set(self._doc_vector_ids)
+        if doc_id is not None:
+            allowed &= {doc_id}
+        if doc_ids is not None:
+            allowed &= set(doc_ids)
+        if where is not None:
+            docs_by_id = {d["doc_id"]: d for d in self.doc_metadata}
+            allowed = {i for i in allowed if i in docs_by_id and self._match(docs_by_id[i], where)}
+        return allowed
+
+    @staticmethod
+    def _match(doc_info, where):
+        """Belge meta verisinin koşulu sağlayıp sağlamadığını döndürür.
+
+        where bir fonksiyon (doc_info -> bool) ya da alan → değer sözlüğüdür;
+        değer liste/küme ise üyelik aranır.
+        """
+        if callable(where):
+            return bool(where(doc_info))
+        for field, expected in where.items():
+            value = doc_info.get(field)
+            if isinstance(expected, (list, tuple, set)):
+                if value not in expected:
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    def _filter_vector_ids(self, doc_id=None, doc_ids=None, where=None):
+        """Filtreye uyan (vektör ID'leri, belge ID'leri) ikilisi (filtre yoksa (None, None))"""
+        allowed = self._resolve_doc_filter(doc_id, doc_ids, where)
+        if allowed is None:
+            return None, None
+        return self._vector_ids_of(allowed), allowed
+
+    def _vector_ids_of(self, doc_ids):
+        """Belgelerin vektör ID'leri (önceden hesaplanmış belge → vektör ID tablosundan)"""
+        id_arrays = [self._doc_vector_ids[i] for i in sorted(doc_ids) if i in self._doc_vector_ids]
+        if not id_arrays:
+            return np.zeros(0, dtype="int64")
+        if len(id_arrays) == 1:
+            return id_arrays[0]
+        # Belgeler tekilleştirilmiş vektörleri paylaşabilir
+        return np.unique(np.concatenate(id_arrays))
+
+    @staticmethod
+    def _filter_key(doc_id=None, doc_ids=None, where=None):
+        """Filtrenin önbellek anahtarı; fonksiyon koşulları anahtarlanamaz (None)"""
+        if callable(where):
+            return None
+        return repr((doc_id, tuple(doc_ids) if doc_ids is not None else None,
+                     tuple(sorted(where.items(), key=repr)) if where else None))
+
+    def _filtered_search(self, q_vecs, vector_ids, k, nprobe=None, ef_search=None):
+        """Yalnızca verilen vektör ID'leri arasında FAISS içinde arama yapar"""
+        k = min(k, len(vector_ids))
+        sel = faiss.IDSelectorBatch(vector_ids)
+        params = index_factory.search_parameters(self.index, nprobe, ef_search, sel=sel)
+        with self.metrics.timer("index_search"):
+            distances, indices = self.index.search(q_vecs, k, params=params)
+            if ((indices >= 0).sum(axis=1) < k).any():
+                # IVF/HNSW seçili ID'lere yeterince ulaşamadıysa alt kümede tam arama
+                self.metrics.inc("filter_exact_fallbacks")
+                vectors = self.index.reconstruct_batch(vector_ids)
+                dists = ((q_vecs ** 2).sum(axis=1)[:, None] - 2 * q_vecs @ vectors.T +
+                         (vectors ** 2).sum(axis=1)[None, :])
+                top = np.argsort(dists, axis=1)[:, :k]
+                distances, indices = np.take_along_axis(dists, top, axis=1), vector_ids[top]
+        return distances, indices
+
+    def _hydrate(self, indices, distances, doc_ids=None):
+        """Tek bir sorgunun FAISS sonuç satırını sonuç sözlüklerine çevirir.
+
+        Paylaşılan bir chunk için doc_ids (belge filtresi) içindeki belgenin satırı gösterilir.
+        """
+        results = []
+        with self.metrics.timer("hydrate"):
+            for idx, dist in zip(indices, distances):
+                doc = self._chunk_by_vector_id(int(idx), doc_ids)
+                if doc is not None:  # -1 ve silinmiş ID kontrolü
+                    results.append(self._format_result(doc, dist))
+        return results
+
+    def _resolve_mode(self, mode):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Bilinmeyen arama modu: {mode} (seçenekler: {', '.join(SEARCH_MODES)})")
+        if mode != "dense" and self.lexical is None:
+            logger.warning("BM25 index'i yok, dense arama yapılıyor (index'i yeniden oluşturun)")
+            return "dense"
+        return mode
+
+    def _dense_search(self, q_vecs, vector_ids, k, nprobe=None, ef_search=None):
+        """Vektör araması; her sorgu için (uzaklıklar, vektör ID'leri) satırı döndürür"""
+        if vector_ids is not None:
+            distances, indices = self._filtered_search(q_vecs, vector_ids, k, nprobe, ef_search)
+        else:
+            params = index_factory.search_parameters(self.index, nprobe, ef_search)
+            with self.metrics.timer("index_search"):
+                distances, indices = self.index.search(q_vecs, min(k, self.index.ntotal), params=params)
+        return list(zip(distances, indices))
+
+    def _lexical_search(self, query, k, vector_ids=None, idf=None):
+        """BM25 araması; (skorlar, vektör ID'leri) döndürür (idf verilirse index'inkinin yerine kullanılır)"""
+        with self.metrics.timer("lexical_search"):
+            ids, scores = self.lexical.search(query, k, allowed=vector_ids, idf=idf)
+        return scores, ids
+
+    def _fuse(self, rankings, k):
+        """Sıralı ID listelerini reciprocal rank fusion ile birleştirir"""
+        scores = {}
+        for ids in rankings:
+            for rank, vector_id in enumerate(int(i) for i in ids if i >= 0):
+                scores[vector_id] = scores.get(vector_id, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+        top = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return (np.array([score for _, score in top], dtype="float32"),
+                np.array([vector_id for vector_id, _ in top], dtype="int64"))
+
+    def _retrieve(self, queries, q_vecs, vector_ids, k, nprobe, ef_search, mode):
+        """Sorgu grubunu seçilen modda arar; her sorgu için (skorlar, vektör ID'leri) döndürür"""
+        if mode == "lexical":
+            return [self._lexical_search(query, k, vector_ids) for query in queries]
+        depth = k if mode == "dense" else max(k, self.hybrid_candidates)
+        dense = self._dense_search(q_vecs, vector_ids, depth, nprobe, ef_search)
+        if mode == "dense":
+            return dense
+        rows = []
+        for query, (_, dense_ids) in zip(queries, dense):
+            _, lexical_ids = self._lexical_search(query, depth, vector_ids)
+            with self.metrics.timer("fusion"):
+                rows.append(self._fuse([dense_ids, lexical_ids], k))
+        return rows
+
+    def search_with_document_filter(self, query, doc_id=None, k=5, doc_ids=None, where=None,
+                                    nprobe=None, ef_search=None, mode="dense"):
+        """Belirli belge(ler)de arama yapar.
+
+        doc_id veya doc_ids ile belge ID'leri, where ile belge meta verisi
+        üzerinde koşul verilebilir. Filtreleme FAISS içinde IDSelector ile yapılır.
+        """
+        self.metrics.inc("queries")
+        # Index yüklü değilse yükle
+        if not self._ensure_loaded():
             return []
-        
-        if self.index is None:
-            if not self.load_index():
+
+        with self._lock.read(), self.metrics.timer("filtered_search"):
+            # Güvenlik kontrolü
+            if self.index is None or not self.docs:
+                print("⚠️ Index veya belgeler yüklenemedi.")
                 return []
-        
-        # Güvenlik kontrolü
-        if self.index is None or not self.docs:
-            print("⚠️ Index veya belgeler yüklenemedi.")
-            return []
 
-        q_vec = self.model.encode([query]).astype("float32")
-        
-        # Eğer belirli bir belgede arama yapılacaksa
-        if doc_id is not None:
-            # Sadece ilgili belgeye ait chunk'ları filtrele
-            filtered_indices = [i for i, doc in enumerate(self.docs) if doc.get('doc_id') == doc_id]
-            if not filtered_indices:
+            mode = self._resolve_mode(mode)
+            # Fonksiyon koşulları anahtarlanamaz; bu sorgular önbelleğe alınmaz
+            cache_key = None
+            filter_key = self._filter_key(doc_id, doc_ids, where)
+            if filter_key is not None:
+                cache_key = ("filter", normalize_query(query), k, filter_key, nprobe, ef_search, mode,
+                             self.index_version)
+                results = self._cached_results(cache_key)
+                if results is not None:
+                    return results
+
+            vector_ids, allowed = self._filter_vector_ids(doc_id, doc_ids, where)
+            if vector_ids is not None and len(vector_ids) == 0:
                 return []
-                
-            # Filtrelenmiş indekslerde arama yap
+
+            q_vec = self._encode_query(query) if mode != "lexical" else None
+        
             try:
-                filtered_embeddings = np.array([self.index.reconstruct(i) for i in filtered_indices])
-                distances = []
-                indices = []
-                
-                for i, emb in enumerate(filtered_embeddings):
-                    dist = np.linalg.norm(q_vec[0] - emb)
-                    distances.append(dist)
-                    indices.append(filtered_indices[i])
-                
-                # En yakın k sonuç
-                sorted_pairs = sorted(zip(distances, indices))[:min(k, len(distances))]
-                
-                results = []
-                for dist, idx in sorted_pairs:
-                    if idx < len(self.docs):  # Bounds check
-                        results.append({
-                            "text": self.docs[idx]["text"],
-                            "score": float(dist),
-                            "doc_name": self.docs[idx].get("doc_name", "Bilinmiyor"),
-                            "doc_id": self.docs[idx].get("doc_id", -1)
-                        })
-                return results
+                # Filtre yoksa (vector_ids None) tüm belgelerde arama
+                (scores, ids), = self._retrieve([query], q_vec, vector_ids, k, nprobe, ef_search, mode)
             except Exception as e:
                 print(f"Filtreli arama hatası: {e}")
                 return []
-        else:
-            # Tüm belgelerde arama
-            try:
-                distances, indices = self.index.search(q_vec, min(k, self.index.ntotal))
-                results = []
-                for idx, dist in zip(indices[0], distances[0]):
-                    if idx < len(self.docs):  # Bounds check
-                        results.append({
-                            "text": self.docs[idx]["text"],
-                            "score": float(dist),
-                            "doc_name": self.docs[idx].get("doc_name", "Bilinmiyor"),
-                            "doc_id": self.docs[idx].get("doc_id", -1)
-                        })
-                return results
-            except Exception as e:
-                print(f"Genel arama hatası: {e}")
-                return []
+
+            results = self._hydrate(ids, scores, allowed)
+            self._store_results(cache_key, results)
+            return results
+
+    # ================= BELGE DÜZEYİNDE ARAMA ================= #
+    def search_documents(self, query, k=5, top_docs=20, chunks_per_doc=3, aggregate="max", doc_ids=None,
+                         where=None, nprobe=None, ef_search=None):
+        """İki aşamalı arama: önce belge merkezleriyle en yakın top_docs belge seçilir,
+        ardından yalnızca bu belgelerin chunk'ları aranır.
+
+        Belgeler chunk skorlarına göre sıralanır: aggregate "max" ise en
+        yakın chunk'ın, "mean" ise en yakın chunks_per_doc chunk'ın ortalama
+        L2 uzaklığı (küçük daha iyi). {"documents": ilk k belge (skor, merkez
+        benzerliği ve en iyi chunk'ları), "results": ilk k chunk,
+        "vectors_scored": aranan vektör sayısı} döndürür. Belge merkezleri
+        olmayan eski nesillerde tüm chunk'lar aranır.
+        """
+        if aggregate not in DOC_AGGREGATES:
+            raise ValueError(f"Bilinmeyen belge skoru: {aggregate} (seçenekler: {', '.join(DOC_AGGREGATES)})")
+        empty = {"documents": [], "results": [], "vectors_scored": 0}
+        self.metrics.inc("queries")
+        if not self._ensure_loaded():
+            return empty
+
+        with self._lock.read(), self.metrics.timer("document_search"):
+            if self.index is None or not self.docs:
+                print("⚠️ Index veya belgeler yüklenemedi.")
+                return empty
+
+            allowed = self._resolve_doc_filter(None, doc_ids, where)
+            q_vec = self._encode_query(query)
+            similarities = {}
+            if self.doc_index is not None:
+                with self.metrics.timer("document_select"):
+                    selected, sims = self.doc_index.top_documents(q_vec, top_docs, allowed)
+                similarities = dict(zip(selected.tolist(), sims.tolist()))
+                allowed = set(similarities)
+            else:
+                logger.warning("Belge merkezleri yok, tüm chunk'larda aranıyor (index'i yeniden oluşturun)")
+
+            vector_ids = self._vector_ids_of(allowed) if allowed is not None else None
+            if vector_ids is not None and len(vector_ids) == 0:
+                return empty
+            vectors_scored = len(vector_ids) if vector_ids is not None else self.index.ntotal
+            self.metrics.inc("document_search_vectors", vectors_scored)
+
+            # Her belgenin en iyi chunks_per_doc chunk'ına ulaşacak kadar derin aranır
+            depth = max(k, len(allowed) if allowed is not None else top_docs) * chunks_per_doc
+            (distances, ids), = self._dense_search(q_vec, vector_ids, depth, nprobe, ef_search)
+            results = self._hydrate(ids, distances, allowed)
+
+            by_doc = {}
+            for result in results:
+                hits = by_doc.setdefault(result["doc_id"], [])
+                if len(hits) < chunks_per_doc:
+                    hits.append(result)
+            documents = []
+            for doc_id, hits in by_doc.items():
+                scores = [hit["score"] for hit in hits]
+                documents.append({
+                    "doc_id": doc_id,
+                    "doc_name": hits[0]["doc_name"],
+                    "score": scores[0] if aggregate == "max" else float(np.mean(scores)),
+                    "centroid_similarity": similarities.get(doc_id),
+                    "chunks": hits
+                })
+            documents.sort(key=lambda d: d["score"])
+            return {"documents": documents[:k], "results": results[:k], "vectors_scored": vectors_scored}
+
+    # ================= TOPLU ARAMA ================= #
+    def search_many(self, queries, k=5, filters=None, nprobe=None, ef_search=None, mode="dense"):
+        """Birden fazla sorguyu tek kodlama ve tek FAISS çağrısıyla arar.
+
+        filters None, tüm sorgulara uygulanacak tek bir filtre sözlüğü
+        ({"doc_id": .., "doc_ids": [..], "where": ..}) ya da sorgu başına
+        filtre listesi olabilir. Aynı filtreyi paylaşan sorgular birlikte aranır.
+        mode tüm sorgulara uygulanır (bkz. search). Her sorgu için search ile
+        aynı biçimde bir sonuç listesi döndürür.
+        """
+        if not queries:
+            return []
+        if filters is None or isinstance(filters, dict):
+            filters = [filters] * len(queries)
+        if len(filters) != len(queries):
+            raise ValueError("filters listesi sorgu sayısıyla aynı uzunlukta olmalı")
+        self.metrics.inc("queries", len(queries))
+        if not self._ensure_loaded():
+            return [[] for _ in queries]
+
+        with self._lock.read(), self.metrics.timer("search_many"):
+            if self.index is None or not self.docs:
+                print("⚠️ Index veya belgeler yüklenemedi.")
+                return [[] for _ in queries]
+            mode = self._resolve_mode(mode)
+
+            results = [None] * len(queries)
+            cache_keys = [None] * len(queries)
+            groups = {}
+            for i, (query, spec) in enumerate(zip(queries, filters)):
+                spec = spec or {}
+                filter_key = self._filter_key(**spec)
+                if not spec:
+                    cache_keys[i] = ("search", normalize_query(query), k, nprobe, ef_search, mode,
+                                     self.index_version)
+                elif filter_key is not None:
+                    cache_keys[i] = ("filter", normalize_query(query), k, filter_key, nprobe, ef_search, mode,
+                                     self.index_version)
+                results[i] = self._cached_results(cache_keys[i])
+                if results[i] is None:
+                    group_key = filter_key if filter_key is not None else ("callable", id(spec["where"]))
+                    groups.setdefault(group_key, (spec, []))[1].append(i)
+
+            pending = [i for group in groups.values() for i in group[1]]
+            if pending:
+                # BM25 aramasında sorgular gömülmez
+                q_vecs = self._encode_queries([queries[i] for i in pending]) if mode != "lexical" else None
+                row_of = {i: row for row, i in enumerate(pending)}
+                for spec, members in groups.values():
+                    rows = q_vecs[[row_of[i] for i in members]] if q_vecs is not None else None
+                    vector_ids, allowed = self._filter_vector_ids(**spec)
+                    if vector_ids is not None and len(vector_ids) == 0:
+                        for i in members:
+                            results[i] = []
+                        continue
+                    hits = self._retrieve([queries[i] for i in members], rows, vector_ids, k,
+                                          nprobe, ef_search, mode)
+                    for (scores, ids), i in zip(hits, members):
+                        results[i] = self._hydrate(ids, scores, allowed)
+                        self._store_results(cache_keys[i], results[i])
+            return results
+
+    # ================= DAĞITIK ARAMA ================= #
+    def term_stats(self, queries):
+        """Her sorgu için (chunk sayısı, terim → df); BM25 index'i yoksa (0, {})"""
+        self._ensure_loaded()
+        with self._lock.read():
+            return [self.lexical.term_stats(q) if self.lexical is not None else (0, {}) for q in queries]
+
+    def search_candidates(self, queries, q_vecs, k, modes=("dense",), doc_ids=None, where=None, nprobe=None,
+                          ef_search=None, idfs=None):
+        """Önceden gömülmüş sorgular için her modun ham sonuçları (bkz. sharding.py).
+
+        Her sorgu için mod → sonuç listesi sözlüğü döndürür; modes "dense"
+        (L2 uzaklığı) ve/veya "lexical" (BM25) içerir, modlar birleştirilmez.
+        idfs verilirse BM25 skorları sorgu başına bu idf'lerle hesaplanır.
+        Sonuçlar search ile aynı biçimdedir, ek olarak vector_id içerir;
+        önbelleğe alınmaz.
+        """
+        empty = [{mode: [] for mode in modes} for _ in queries]
+        if not self._ensure_loaded():
+            return empty
+        with self._lock.read():
+            if self.index is None or not self.docs:
+                return empty
+            vector_ids, allowed = self._filter_vector_ids(doc_ids=doc_ids, where=where)
+            if vector_ids is not None and len(vector_ids) == 0:
+                return empty
+            rows = [{} for _ in queries]
+            if "dense" in modes:
+                for row, (distances, ids) in zip(rows, self._dense_search(q_vecs, vector_ids, k, nprobe,
+                                                                           ef_search)):
+                    row["dense"] = self._candidates(ids, distances, allowed)
+            if "lexical" in modes:
+                for i, (row, query) in enumerate(zip(rows, queries)):
+                    if self.lexical is None:
+                        row["lexical"] = []
+                        continue
+                    scores, ids = self._lexical_search(query, k, vector_ids, idfs[i] if idfs is not None else None)
+                    row["lexical"] = self._candidates(ids, scores, allowed)
+            return rows
+
+    def _candidates(self, ids, scores, doc_ids=None):
+        """_hydrate gibi, ancak her sonuca vector_id de eklenir"""
+        results = []
+        for vector_id, score in zip(ids, scores):
+            doc = self._chunk_by_vector_id(int(vector_id), doc_ids)
+            if doc is not None:
+                result = self._format_result(doc, score)
+                result["vector_id"] = int(vector_id)
+                results.append(result)
+        return results
     
     # ================= ÖZETLEME ================= #
+    def get_summary(self, doc_id):
+        """Belgenin index oluşturulurken çıkarılmış özeti ({"text", "spans"}; yoksa None)"""
+        if not self._ensure_loaded():
+            return None
+        with self._lock.read():
+            # Belge tablosu ve özetler sözlüktür; belge sayısından bağımsız tek okuma
+            doc_info = self.docs.documents.get(doc_id) if isinstance(self.docs, ChunkStore) else None
+            return self.summaries.get(doc_info["hash"]) if doc_info is not None else None
+
     def summarize(self, text, max_length=300, min_length=100):
         """Metni özetler - Daha ayrıntılı sürüm"""
         if not text or len(text.strip()) == 0:
@@ -346,46 +1586,138 @@ class SearchEngine:
                 return " ".join(start_words) + "..." + " ".join(end_words)
     
     # ================= SORU CEVAP ================= #
-    def answer_question(self, context, question):
-        """Verilen bağlamda soruya cevap verir"""
-        if not context or not question:
+    def _qa_model(self):
+        """QA modelini (tek sefer, iş parçacığı güvenli) yükler; yüklenemezse None"""
+        if self.qa_pipeline is not None:
+            return self.qa_pipeline
+        with self._qa_lock:
+            if self.qa_pipeline is None:
+                with self.metrics.timer("qa_model_load"), startup.stage("qa_model_load"):
+                    self.qa_pipeline = load_qa_pipeline()
+        return self.qa_pipeline
+
+    def start_qa_pool(self, workers=1, timeout=30.0, wait=False, lazy=False):
+        """QA çıkarımını modeli önceden yükleyen worker süreçlerine taşır.
+
+        Sonrasında answer_question/answer istekleri süre sınırıyla (timeout
+        saniye, istek başına değiştirilebilir) worker'larda çalışır.
+        lazy=True ise worker'lar ilk soruda başlatılır; QA kullanılmayan
+        süreçler BERT modelini hiç yüklemez. İlk sorunun süresine model
+        yükleme de dahildir.
+        """
+        with self._qa_lock:
+            if self.qa_pool is None:
+                if lazy:
+                    self._qa_pool_settings = (workers, timeout)
+                    return None
+                self.qa_pool = QAWorkerPool(workers, timeout, metrics=self.metrics).start(wait=wait)
+            return self.qa_pool
+
+    def _ensure_qa_pool(self):
+        """lazy başlatılmak üzere ayarlanmış QA havuzunu gerektiğinde başlatır"""
+        if self.qa_pool is None and self._qa_pool_settings is not None:
+            with self._qa_lock:
+                if self.qa_pool is None:
+                    workers, timeout = self._qa_pool_settings
+                    logger.info("QA worker havuzu ilk soru için başlatılıyor")
+                    self.qa_pool = QAWorkerPool(workers, timeout, metrics=self.metrics).start()
+        return self.qa_pool
+
+    def _check_qa_timeout(self, timeout):
+        """Süreç içi çıkarım kesilemez; havuz yokken istenen süre sınırı sessizce yok sayılmaz"""
+        if timeout is not None and self.qa_pool is None and self._qa_pool_settings is None:
+            raise RuntimeError("QA süre sınırı için QA worker havuzu gerekli (bkz. start_qa_pool)")
+
+    def _qa_timeout(self):
+        """Varsayılan QA süre sınırı; havuz ayarlanmamışsa None (sınırsız)"""
+        if self.qa_pool is not None:
+            return self.qa_pool.timeout
+        if self._qa_pool_settings is not None:
+            return self._qa_pool_settings[1]
+        return None
+
+    def stop_qa_pool(self):
+        with self._qa_lock:
+            pool, self.qa_pool = self.qa_pool, None
+            self._qa_pool_settings = None
+        if pool is not None:
+            pool.close()
+
+    def _best_span(self, question, contexts, timeout=None):
+        """Soruyu bağlamlarda yanıtlar (bkz. qa_pool.best_span); havuz varsa süre sınırı uygulanır"""
+        self._check_qa_timeout(timeout)
+        pool = self._ensure_qa_pool()
+        if pool is not None:
+            with self.metrics.timer("qa_inference"):
+                return pool.answer(question, contexts, timeout)
+        if self._qa_model() is None:
+            raise RuntimeError("QA modelleri yüklenemedi.")
+        with self.metrics.timer("qa_inference"):
+            return best_span(self.qa_pipeline, question, contexts, **QA_OPTIONS)
+
+    def answer_question(self, context, question, timeout=None):
+        """Verilen bağlamda (ya da bağlam listesinde) soruya cevap verir.
+
+        Uzun bağlamlar kesilmez, örtüşen pencerelerle taranır. QA worker
+        havuzu başlatılmışsa süre dolduğunda QATimeoutError yükseltilir;
+        havuz yokken timeout verilirse RuntimeError.
+        """
+        self._check_qa_timeout(timeout)
+        contexts = [context] if isinstance(context, str) else list(context or [])
+        if not contexts or not question:
             return "Bağlam veya soru eksik.", 0.0
         
-        if len(context.strip()) == 0 or len(question.strip()) == 0:
+        if not any(c.strip() for c in contexts) or len(question.strip()) == 0:
             return "Boş bağlam veya soru.", 0.0
         
-        # Bağlam çok uzunsa kısalt
-        original_length = len(context)
-        if len(context) > 1024:
-            context = context[:1024]
-            logger.info(f"Bağlam kısaltıldı: {original_length} -> 1024 karakter")
-        
-        if self.qa_pipeline is None:
-            # Türkçe destekli QA modeli
-            try:
-                logger.info("QA modeli yükleniyor...")
-                self.qa_pipeline = pipeline("question-answering", model="savasy/bert-base-turkish-squad")
-                logger.info("QA modeli yüklendi")
-            except Exception as e:
-                logger.warning(f"Türkçe QA modeli yüklenemedi: {str(e)}")
-                try:
-                    # Yedek model
-                    logger.info("Yedek QA modeli yükleniyor...")
-                    self.qa_pipeline = pipeline("question-answering")
-                    logger.info("Yedek QA modeli yüklendi")
-                except Exception as e2:
-                    logger.error(f"Yedek QA modeli yüklenemedi: {str(e2)}")
-                    return "QA modelleri yüklenemedi.", 0.0
-        
         try:
-            logger.info(f"Soru-cevap işlemi başlatılıyor. Bağlam: {len(context)} karakter, Soru: {len(question)} karakter")
-            result = self.qa_pipeline(question=question, context=context)
-            if result and 'answer' in result and 'score' in result:
-                logger.info("Soru-cevap işlemi tamamlandı")
-                return result['answer'], result['score']
-            else:
-                logger.info("Cevap bulunamadı")
-                return "Cevap bulunamadı.", 0.0
+            logger.info(f"Soru-cevap işlemi başlatılıyor. Bağlam: {sum(len(c) for c in contexts)} karakter "
+                        f"({len(contexts)} parça), Soru: {len(question)} karakter")
+            result = self._best_span(question, contexts, timeout)
+        except QATimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Soru cevaplama hatası: {str(e)}")
             return f"Cevap bulunamadı. Hata: {str(e)}", 0.0
+        if result is None:
+            logger.info("Cevap bulunamadı")
+            return "Cevap bulunamadı.", 0.0
+        logger.info("Soru-cevap işlemi tamamlandı")
+        return result["answer"], result["score"]
+
+    def answer(self, question, k=3, doc_id=None, doc_ids=None, mode="dense", timeout=None):
+        """Soruyu ilgili ilk k chunk üzerinde tek toplu QA geçişiyle yanıtlar.
+
+        Cevabın alındığı chunk ve belgedeki karakter konumuyla birlikte bir
+        sözlük döndürür. timeout arama dahil tüm isteğin süresidir ve QA worker
+        havuzu gerektirir; havuz yokken verilirse RuntimeError yükseltilir.
+        """
+        self._check_qa_timeout(timeout)
+        if timeout is None:
+            timeout = self._qa_timeout()
+        deadline = time.monotonic() + (timeout if timeout is not None else float("inf"))
+        if doc_id is not None or doc_ids is not None:
+            chunks = self.search_with_document_filter(question, doc_id=doc_id, k=k, doc_ids=doc_ids, mode=mode)
+        else:
+            chunks = self.search(question, k=k, mode=mode)
+        if not chunks:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise QATimeoutError("Süre arama sırasında doldu")
+        result = self._best_span(question, [c["text"] for c in chunks],
+                                 remaining if remaining != float("inf") else None)
+        if result is None:
+            return {"answer": "Cevap bulunamadı.", "score": 0.0, "chunk": chunks[0]}
+        chunk = chunks[result["context_index"]]
+        offset = chunk.get("start_char")
+        return {
+            "answer": result["answer"],
+            "score": result["score"],
+            "doc_name": chunk["doc_name"],
+            "doc_id": chunk["doc_id"],
+            # Cevabın belgedeki karakter aralığı (chunk konumu bilinmiyorsa None)
+            "start_char": offset + result["start"] if offset is not None else None,
+            "end_char": offset + result["end"] if offset is not None else None,
+            "chunk": chunk
+        }
@@ -0,0 +1,548 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import index_generations
+from lexical_index import bm25_idf
+from metrics import Metrics
+from search_engine import SEARCH_MODES, SearchEngine
+
+logger = logging.getLogger(__name__)
+
+SHARDS_FILE = "shards.json"
+DEFAULT_SHARD_ROOT = "index/shards"
+
+
+def shard_of(doc_name, num_shards):
+    """Belgenin shard'ı; belge adının özetine göre kararlı olarak seçilir"""
+    digest = hashlib.md5(doc_name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def shard_dir(root, shard):
+    return os.path.join(root, f"shard-{shard:03d}")
+
+
+def shard_engine(root, shard, **engine_kwargs):
+    """Bir shard'ın kendi index kökündeki (nesiller, CURRENT) arama motoru"""
+    path = shard_dir(root, shard)
+    return SearchEngine(index_path=os.path.join(path, "faiss.index"),
+                        metadata_path=os.path.join(path, "chunks"),
+                        doc_metadata_path=os.path.join(path, "doc_metadata.json"),
+                        **engine_kwargs)
+
+
+def read_layout(root):
+    """shards.json içeriği (yoksa None)"""
+    path = os.path.join(root, SHARDS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_layout(root, layout):
+    tmp_path = os.path.join(root, SHARDS_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(layout, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, os.path.join(root, SHARDS_FILE))
+
+
+def global_doc_id(doc_id, shard, num_shards):
+    """Shard içi belge ID'sini tüm shard'larda tekil olan ID'ye çevirir"""
+    return doc_id * num_shards + shard if doc_id >= 0 else doc_id
+
+
+def local_doc_id(doc_id, num_shards):
+    """(shard, shard içi belge ID'si)"""
+    return doc_id % num_shards, doc_id // num_shards
+
+
+# ================= OLUŞTURMA ================= #
+def _route_documents(named_documents, num_shards, spill_files):
+    """Belgeleri tek geçişte shard'larına dağıtır; her shard'ın belgeleri kendi dosyasına JSON satırı olarak yazılır.
+
+    spill_files shard → dosya yolu sözlüğüdür; listede olmayan shard'ların
+    belgeleri atlanır. Shard başına belge sayısını döndürür.
+    """
+    files = {shard: open(path, "w", encoding="utf-8") for shard, path in spill_files.items()}
+    counts = dict.fromkeys(spill_files, 0)
+    try:
+        for name, text in named_documents:
+            shard = shard_of(name, num_shards)
+            if shard in files:
+                files[shard].write(json.dumps([name, text], ensure_ascii=False) + "\n")
+                counts[shard] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+
+def _read_spill(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            name, text = json.loads(line)
+            yield name, text
+
+
+def build_shards(documents, root=DEFAULT_SHARD_ROOT, num_shards=4, shards=None, rebuild=True, **engine_kwargs):
+    """Belgeleri adlarına göre num_shards shard'a bölüp her shard'ın index'ini oluşturur.
+
+    documents (isim, metin) çiftleri üreten bir fonksiyondur; bir kez
+    çağrılır ve her belge ayrıştırıldığı anda shard'ının geçici dosyasına
+    yazılır, shard'lar sonra sırayla bu dosyalardan oluşturulur (her dosya
+    bir kez ayrıştırılır, bellekte tüm derlem tutulmaz). shards verilirse
+    yalnızca bu shard'lar yeniden oluşturulur (diğerleri yayında kalır).
+    rebuild=False ise shard'lar update_documents ile artımlı güncellenir.
+    Gömme modeli shard'lar arasında paylaşılır.
+    """
+    params = engine_kwargs.get("index_params") or {}
+    if params.get("pca_dim"):
+        # PCA her shard'da ayrı eğitilir; uzaklıklar shard'lar arasında karşılaştırılamaz
+        raise ValueError("Shard'lı index'lerde PCA (pca_dim) desteklenmiyor")
+    os.makedirs(root, exist_ok=True)
+    layout = read_layout(root)
+    if layout is not None and layout["num_shards"] != num_shards and shards is not None:
+        raise ValueError(f"Index {layout['num_shards']} shard'lı; shard sayısı değişince tüm shard'lar "
+                         f"yeniden oluşturulmalı")
+    shards = range(num_shards) if shards is None else shards
+    for shard in shards:
+        if not 0 <= shard < num_shards:
+            raise ValueError(f"Geçersiz shard: {shard} (0-{num_shards - 1})")
+
+    model = None
+    stats = {}
+    spill_dir = tempfile.mkdtemp(prefix="route-", dir=root)
+    try:
+        spill_files = {shard: os.path.join(spill_dir, f"shard-{shard:03d}.jsonl") for shard in shards}
+        start_time = time.time()
+        counts = _route_documents(documents(), num_shards, spill_files)
+        print(f"📄 {sum(counts.values())} belge shard'lara dağıtıldı ({time.time() - start_time:.1f} sn)")
+        for shard in shards:
+            engine = shard_engine(root, shard, **engine_kwargs)
+            engine._model = model
+            named = _read_spill(spill_files[shard])
+            start_time = time.time()
+            if rebuild:
+                engine.build_index_stream(named)
+            else:
+                names, texts = [], []
+                for name, text in named:
+                    names.append(name)
+                    texts.append(text)
+                engine.update_documents(texts, names, remove_missing=True)
+            model = engine._model
+            stats[shard] = {"documents": len(engine.doc_metadata),
+                            "generation": index_generations.read_current(engine.index_root)}
+            print(f"🧩 Shard {shard}: {stats[shard]['documents']} belge, nesil {stats[shard]['generation']} "
+                  f"({time.time() - start_time:.1f} sn)")
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    _write_layout(root, {"num_shards": num_shards, "encoder": SearchEngine._encoder_name(
+        engine_kwargs.get("encoder_backend", "torch"), engine_kwargs.get("encoder_options") or {})})
+    return stats
+
+
+# ================= SHARD WORKER ================= #
+class ShardWorker:
+    """Tek bir shard'ı yükleyip koordinatörün isteklerini yanıtlar.
+
+    Sorgular koordinatörde gömülür; worker gömme modelini hiç yüklemez.
+    Shard'ın yeni nesilleri (bağımsız yeniden oluşturma) izleyiciyle devreye alınır.
+    """
+
+    def __init__(self, root, shard, **engine_kwargs):
+        self.shard = shard
+        engine_kwargs.setdefault("embedding_cache_dir", None)
+        engine_kwargs.setdefault("result_cache_size", 0)
+        self.engine = shard_engine(root, shard, **engine_kwargs)
+
+    def load(self):
+        self.engine.load_index()
+        self.engine.start_watcher()
+        return self.info()
+
+    def info(self):
+        engine = self.engine
+        return {
+            "shard": self.shard,
+            "generation": engine.generation,
+            "documents": len(engine.doc_metadata),
+            "vectors": int(engine.index.ntotal) if engine.index is not None else 0,
+            "lexical": engine.lexical is not None
+        }
+
+    def documents(self):
+        return self.engine.get_document_list()
+
+    def term_stats(self, queries):
+        """Her sorgu için (chunk sayısı, terim → df); BM25 yoksa (0, {})"""
+        return self.engine.term_stats(queries)
+
+    def search(self, queries, q_vecs, k, modes, doc_ids=None, where=None, nprobe=None, ef_search=None,
+               idfs=None):
+        """Her sorgu için mod → sonuç listesi sözlüğü (bkz. SearchEngine.search_candidates).
+
+        idfs verilirse BM25 skorları sorgu başına bu (tüm shard'lar üzerinden
+        hesaplanmış) idf'lerle hesaplanır.
+        """
+        return self.engine.search_candidates(queries, q_vecs, k, modes, doc_ids, where, nprobe, ef_search, idfs)
+
+    def close(self):
+        self.engine.stop_watcher()
+
+
+def _serve(conn, root, shard, engine_kwargs):
+    """Worker süreci: (metot, argümanlar) isteklerini bağlantı kapanana kadar yanıtlar"""
+    worker = ShardWorker(root, shard, **engine_kwargs)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        method, args, kwargs = request
+        try:
+            conn.send((True, getattr(worker, method)(*args, **kwargs)))
+        except Exception as e:
+            logger.exception(f"Shard {shard} isteği başarısız: {method}")
+            conn.send((False, f"{type(e).__name__}: {e}"))
+    worker.close()
+
+
+class _ProcessClient:
+    """Ayrı bir süreçteki ShardWorker'a Pipe üzerinden basit RPC.
+
+    İstek gönderme (send) ve yanıt alma (recv) ayrıdır; koordinatör önce tüm
+    shard'lara gönderip sonra yanıtları toplar, böylece shard'lar paralel çalışır.
+    """
+
+    def __init__(self, context, root, shard, engine_kwargs):
+        self.shard = shard
+        self.lock = threading.Lock()
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, root, shard, engine_kwargs),
+                                       name=f"shard-{shard}", daemon=True)
+        self.process.start()
+        child.close()
+
+    def send(self, method, *args, **kwargs):
+        self.conn.send((method, args, kwargs))
+
+    def recv(self):
+        try:
+            ok, value = self.conn.recv()
+        except (EOFError, OSError):
+            raise RuntimeError(f"Shard {self.shard} worker'ı kapandı") from None
+        if not ok:
+            raise RuntimeError(f"Shard {self.shard} hatası: {value}")
+        return value
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class _LocalClient:
+    """Aynı süreçte çalışan ShardWorker için _ProcessClient ile aynı arayüz"""
+
+    def __init__(self, root, shard, engine_kwargs):
+        self.shard = shard
+        self.lock = threading.Lock()
+        self.worker = ShardWorker(root, shard, **engine_kwargs)
+        self._reply = None
+
+    def send(self, method, *args, **kwargs):
+        try:
+            self._reply = (True, getattr(self.worker, method)(*args, **kwargs))
+        except Exception as e:
+            self._reply = (False, e)
+
+    def recv(self):
+        ok, value = self._reply
+        self._reply = None
+        if not ok:
+            raise value
+        return value
+
+    def close(self):
+        self.worker.close()
+
+
+# ================= KOORDİNATÖR ================= #
+class ShardedSearchEngine:
+    """Sorguları shard worker'larına dağıtıp sonuçları birleştiren koordinatör.
+
+    Sorgu koordinatörde bir kez gömülür ve vektör tüm shard'lara gönderilir
+    (scatter); her shard kendi ilk k sonucunu döndürür, koordinatör bunları
+    tek bir global ilk k listesinde birleştirir (gather). Skorlar
+    shard'lar arasında tutarlıdır: dense aramada hepsi aynı kodlayıcının L2
+    uzaklığıdır; BM25 idf'leri tüm shard'ların terim istatistiklerinden
+    hesaplanır; hibrit modda RRF birleştirilmiş global sıralamalara uygulanır.
+    Belge ID'leri global_doc_id ile shard'lar arasında tekilleştirilir.
+
+    processes=False ise worker'lar aynı süreçte sırayla çalışır.
+    """
+
+    def __init__(self, root=DEFAULT_SHARD_ROOT, processes=True, hybrid_candidates=50, rrf_k=60,
+                 encoder_backend="torch", encoder_options=None, query_cache_size=1024, **engine_kwargs):
+        layout = read_layout(root)
+        if layout is None:
+            raise FileNotFoundError(f"Shard'lı index bulunamadı: {os.path.join(root, SHARDS_FILE)}")
+        self.root = root
+        self.num_shards = layout["num_shards"]
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        self.metrics = Metrics()
+        # Sorgular koordinatörde bir kez gömülür; bu motorun index'i yoktur,
+        # yalnızca kodlayıcısı ve sorgu gömme önbelleği kullanılır
+        self.encoder = SearchEngine(index_path=os.path.join(root, "faiss.index"), embedding_cache_dir=None,
+                                    result_cache_size=0, query_cache_size=query_cache_size,
+                                    encoder_backend=encoder_backend, encoder_options=encoder_options)
+        if layout.get("encoder", self.encoder.encoder_name) != self.encoder.encoder_name:
+            logger.warning(f"Shard'lar {layout['encoder']} ile oluşturulmuş, sorgular "
+                           f"{self.encoder.encoder_name} ile kodlanıyor")
+        engine_kwargs.update(encoder_backend=encoder_backend, encoder_options=encoder_options)
+        if processes:
+            # fork, ana süreçte yüklü faiss/torch iş parçacıklarıyla güvenli değildir
+            context = multiprocessing.get_context("spawn")
+            self.clients = [_ProcessClient(context, root, shard, engine_kwargs) for shard in range(self.num_shards)]
+        else:
+            self.clients = [_LocalClient(root, shard, engine_kwargs) for shard in range(self.num_shards)]
+        self.shards = self._gather({shard: ("load", (), {}) for shard in range(self.num_shards)})
+
+    def _gather(self, calls):
+        """shard → (metot, argümanlar, anahtar argümanlar) çağrılarını paralel yürütür.
+
+        İstekler önce tüm shard'lara gönderilir, sonra yanıtlar toplanır.
+        Kilitler shard sırasıyla alınır (kilitlenme olmaz).
+        """
+        clients = [self.clients[shard] for shard in sorted(calls)]
+        for client in clients:
+            client.lock.acquire()
+        try:
+            for client in clients:
+                method, args, kwargs = calls[client.shard]
+                client.send(method, *args, **kwargs)
+            replies = {}
+            errors = []
+            for client in clients:
+                # Bir shard hata verse de diğerlerinin yanıtları okunmalı (bağlantı senkron kalsın)
+                try:
+                    replies[client.shard] = client.recv()
+                except Exception as e:
+                    errors.append(e)
+            if errors:
+                raise errors[0]
+            return replies
+        finally:
+            for client in clients:
+                client.lock.release()
+
+    def load_index(self):
+        """Shard'ları yeniden yükler; shard → durum sözlüğü döndürür"""
+        self.shards = self._gather({shard: ("load", (), {}) for shard in range(self.num_shards)})
+        return self.shards
+
+    def warmup(self, background=False):
+        return self.encoder.warmup(background=background)
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.clients = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ================= BELGELER ================= #
+    def get_document_list(self):
+        """Tüm shard'ların belgeleri (global belge ID'leriyle)"""
+        replies = self._gather({shard: ("documents", (), {}) for shard in range(self.num_shards)})
+        documents = []
+        for shard, docs in sorted(replies.items()):
+            for doc in docs:
+                doc = dict(doc)
+                doc["doc_id"] = global_doc_id(doc["doc_id"], shard, self.num_shards)
+                doc["shard"] = shard
+                documents.append(doc)
+        return documents
+
+    def _route(self, doc_id=None, doc_ids=None):
+        """Belge filtresini shard → shard içi belge ID'leri tablosuna çevirir (filtre yoksa None)"""
+        if doc_id is None and doc_ids is None:
+            return None
+        wanted = set(doc_ids) if doc_ids is not None else None
+        if doc_id is not None:
+            wanted = {doc_id} if wanted is None else wanted & {doc_id}
+        routes = {}
+        for gid in wanted:
+            shard, local = local_doc_id(gid, self.num_shards)
+            routes.setdefault(shard, []).append(local)
+        return routes
+
+    # ================= ARAMA ================= #
+    def _resolve_mode(self, mode):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Bilinmeyen arama modu: {mode} (seçenekler: {', '.join(SEARCH_MODES)})")
+        # Boş shard'ların BM25 index'i yoktur, aramaya da katkıları yoktur
+        if mode != "dense" and not all(info["lexical"] for info in self.shards.values() if info["vectors"]):
+            logger.warning("Bazı shard'larda BM25 index'i yok, dense arama yapılıyor")
+            return "dense"
+        return mode
+
+    def _global_idfs(self, queries):
+        """Sorgu başına terim → idf; tüm shard'ların chunk ve df sayıları toplanarak"""
+        replies = self._gather({shard: ("term_stats", (queries,), {}) for shard in range(self.num_shards)})
+        idfs = []
+        for i in range(len(queries)):
+            n_chunks, df = 0, {}
+            for stats in replies.values():
+                n, terms = stats[i]
+                n_chunks += n
+                for term, count in terms.items():
+                    df[term] = df.get(term, 0) + count
+            idfs.append({term: float(bm25_idf(n_chunks, count)) for term, count in df.items()})
+        return idfs
+
+    def _merge(self, lists, k, descending):
+        """Shard'ların sıralı sonuç listelerini skora göre tek bir ilk k listesinde birleştirir"""
+        merged = [r for results in lists for r in results]
+        merged.sort(key=lambda r: -r["score"] if descending else r["score"])
+        return merged[:k]
+
+    def _fuse(self, rankings, k):
+        """Global sıralamaları reciprocal rank fusion ile birleştirir (bkz. SearchEngine._fuse)"""
+        scores, results = {}, {}
+        for ranking in rankings:
+            for rank, result in enumerate(ranking):
+                key = (result["shard"], result["vector_id"])
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank + 1)
+                results.setdefault(key, result)
+        top = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [dict(results[key], score=float(score)) for key, score in top]
+
+    def _search_group(self, queries, k, routes, where, nprobe, ef_search, mode):
+        """Aynı filtreyi paylaşan sorguları tüm ilgili shard'larda arar"""
+        if routes is not None and not routes:
+            return [[] for _ in queries]
+        shards = sorted(routes) if routes is not None else range(self.num_shards)
+        modes = ("dense",) if mode == "dense" else ("lexical",) if mode == "lexical" else ("dense", "lexical")
+        depth = k if mode != "hybrid" else max(k, self.hybrid_candidates)
+        q_vecs = self.encoder._encode_queries(queries) if "dense" in modes else None
+        # BM25 idf'leri filtreden bağımsız olarak tüm derlem üzerinden hesaplanır
+        idfs = self._global_idfs(queries) if "lexical" in modes else None
+        calls = {}
+        for shard in shards:
+            calls[shard] = ("search", (queries, q_vecs, depth, modes),
+                            {"doc_ids": routes[shard] if routes is not None else None, "where": where,
+                             "nprobe": nprobe, "ef_search": ef_search, "idfs": idfs})
+        with self.metrics.timer("scatter_gather"):
+            replies = self._gather(calls)
+
+        with self.metrics.timer("merge"):
+            for shard, rows in replies.items():
+                for row in rows:
+                    for results in row.values():
+                        for result in results:
+                            result["shard"] = shard
+                            result["doc_id"] = global_doc_id(result["doc_id"], shard, self.num_shards)
+                            result["doc_ids"] = [global_doc_id(d, shard, self.num_shards)
+                                                 for d in result["doc_ids"]]
+            output = []
+            for i in range(len(queries)):
+                dense = self._merge([replies[s][i]["dense"] for s in replies], depth, False) \
+                    if "dense" in modes else None
+                lexical = self._merge([replies[s][i]["lexical"] for s in replies], depth, True) \
+                    if "lexical" in modes else None
+                if mode == "dense":
+                    merged = dense
+                elif mode == "lexical":
+                    merged = lexical
+                else:
+                    merged = self._fuse([dense, lexical], k)
+                for result in merged:
+                    result.pop("vector_id", None)
+                output.append(merged)
+        return output
+
+    def search(self, query, k=5, nprobe=None, ef_search=None, mode="dense"):
+        """Tüm shard'larda arama; SearchEngine.search ile aynı biçimde sonuç döndürür"""
+        start_time = time.time()
+        self.metrics.inc("queries")
+        results, = self._search_group([query], k, None, None, nprobe, ef_search, self._resolve_mode(mode))
+        print(f"Arama {time.time() - start_time:.4f} saniyede tamamlandı.")
+        return results
+
+    def search_with_document_filter(self, query, doc_id=None, k=5, doc_ids=None, where=None,
+                                    nprobe=None, ef_search=None, mode="dense"):
+        """Belirli belge(ler)de arama; doc_id/doc_ids global belge ID'leridir.
+
+        Sorgu yalnızca bu belgelerin bulunduğu shard'lara gönderilir. where
+        worker süreçlerine gönderildiği için fonksiyon koşulları pickle
+        edilebilir (modül düzeyinde tanımlı) olmalıdır.
+        """
+        self.metrics.inc("queries")
+        results, = self._search_group([query], k, self._route(doc_id, doc_ids), where, nprobe, ef_search,
+                                      self._resolve_mode(mode))
+        return results
+
+    def search_many(self, queries, k=5, filters=None, nprobe=None, ef_search=None, mode="dense"):
+        """Birden fazla sorguyu filtre gruplarına ayırıp her grubu tek scatter-gather ile arar"""
+        if not queries:
+            return []
+        if filters is None or isinstance(filters, dict):
+            filters = [filters] * len(queries)
+        if len(filters) != len(queries):
+            raise ValueError("filters listesi sorgu sayısıyla aynı uzunlukta olmalı")
+        self.metrics.inc("queries", len(queries))
+        mode = self._resolve_mode(mode)
+        groups = {}
+        for i, spec in enumerate(filters):
+            spec = spec or {}
+            key = SearchEngine._filter_key(**spec)
+            if key is None:
+                key = ("callable", id(spec["where"]))
+            groups.setdefault(key, (spec, []))[1].append(i)
+        results = [None] * len(queries)
+        for spec, members in groups.values():
+            hits = self._search_group([queries[i] for i in members], k,
+                                      self._route(spec.get("doc_id"), spec.get("doc_ids")), spec.get("where"),
+                                      nprobe, ef_search, mode)
+            for i, hit in zip(members, hits):
+                results[i] = hit
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shard'lı index üzerinde örnek sorgu çalıştırır")
+    parser.add_argument("query")
+    parser.add_argument("--root", default=DEFAULT_SHARD_ROOT)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="dense")
+    parser.add_argument("--in-process", action="store_true", help="Worker'ları ayrı süreçlerde başlatma")
+    args = parser.parse_args()
+
+    with ShardedSearchEngine(args.root, processes=not args.in_process) as coordinator:
+        for result in coordinator.search(args.query, k=args.k, mode=args.mode):
+            print(f"[shard {result['shard']}] {result['score']:.4f} {result['doc_name']}: {result['text'][:80]}")
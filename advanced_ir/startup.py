@@ -0,0 +1,124 @@
+import argparse
+import importlib
+import io
+import json
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+
+# Süreç içinde her aşamanın ilk gerçekleşme süresi (saniye); bkz. timings()
+_timings = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """Bir başlangıç aşamasını ölçer; aynı aşamanın yalnızca ilk süresi saklanır"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        with _lock:
+            _timings.setdefault(name, seconds)
+
+
+def timings():
+    """Aşama → saniye sözlüğü (gerçekleşme sırasına göre)"""
+    with _lock:
+        return dict(_timings)
+
+
+class LazyModule:
+    """İlk öznitelik erişiminde içe aktarılan modül vekili.
+
+    faiss, sentence_transformers, transformers gibi ağır modüller modül
+    düzeyinde bu sınıfla tanımlanır; yalnızca gerçekten kullanıldıklarında
+    yüklenir ve yükleme süresi "import <modül>" aşaması olarak kaydedilir.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._import_lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._import_lock:
+                if self._module is None:
+                    with stage(f"import {self._name}"):
+                        self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "yüklendi" if self._module is not None else "yüklenmedi"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+# ================= BAŞLANGIÇ PROFİLİ ================= #
+def profile(query="örnek sorgu", warmup=True, **engine_kwargs):
+    """Arama motorunun soğuk başlangıcını aşama aşama ölçer.
+
+    Modül içe aktarma, motor oluşturma, index yükleme, (isteğe bağlı)
+    ısınma ve ilk sorgu süreleri ile bu sırada tembel yüklenen modüllerin
+    süreleri döndürülür.
+    """
+    report = {}
+    start = time.perf_counter()
+    with stage("import search_engine"):
+        from search_engine import SearchEngine
+    report["import_search_engine"] = time.perf_counter() - start
+
+    step = time.perf_counter()
+    engine = SearchEngine(**engine_kwargs)
+    report["engine_init"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        loaded = engine.load_index()
+    report["index_load"] = time.perf_counter() - step
+
+    if warmup:
+        step = time.perf_counter()
+        engine.warmup()
+        report["warmup"] = time.perf_counter() - step
+
+    if loaded:
+        step = time.perf_counter()
+        engine.search(query)
+        report["first_search"] = time.perf_counter() - step
+    report["total"] = time.perf_counter() - start
+    report["stages"] = timings()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Arama motorunun başlangıç süresini aşama aşama ölçer")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Modeli ısıtmadan ilk sorguyu ölç (tembel yükleme maliyeti ilk sorguya biner)")
+    parser.add_argument("--encoder", choices=("torch", "onnx"), default="torch", help="Gömme modeli arka ucu")
+    parser.add_argument("--mmap", action="store_true", help="Index'i bellek eşlemeli aç")
+    parser.add_argument("--output", default=None, help="Raporun yazılacağı JSON dosyası")
+    args = parser.parse_args()
+
+    # Betik __main__ olarak çalışır; motorun kullandığı modül kaydına başvurulur
+    import startup
+    report = startup.profile(warmup=not args.no_warmup, encoder_backend=args.encoder, mmap=args.mmap)
+    print("⏱️  Başlangıç profili:")
+    for name in ("import_search_engine", "engine_init", "index_load", "warmup", "first_search", "total"):
+        if name in report:
+            print(f"  {name:<22} {report[name] * 1000:9.1f} ms")
+    print("  Tembel yüklenen bileşenler:")
+    for name, seconds in report["stages"].items():
+        print(f"    {name:<30} {seconds * 1000:9.1f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"Sonuçlar kaydedildi: {args.output}")
@@ -1,10 +1,11 @@
 import streamlit as st
 import os
 from search_engine import SearchEngine
+from qa_pool import QATimeoutError
+from index_jobs import IndexJobManager
 import time
 import psutil
 import gc
-from contextlib import contextmanager
 
 def check_memory_usage():
     """Bellek kullanımını kontrol eder ve yüksekse uyarı verir"""
@@ -20,15 +21,6 @@ def check_memory_usage():
     except:
         return True  # Hata durumunda devam et
 
-@contextmanager
-def timeout(seconds):
-    # Basitleştirilmiş timeout - sadece zaman ölçümü yapar
-    start_time = time.time()
-    yield
-    elapsed = time.time() - start_time
-    if elapsed > seconds:
-        raise TimeoutError(f"İşlem {seconds} saniyeyi aştı (Geçen süre: {elapsed:.2f}s)")
-
 # Sayfa yapılandırması
 st.set_page_config(
     page_title="Semantic Search Engine",
@@ -45,30 +37,43 @@ Bu uygulama, belgelerde semantik arama yapmanızı sağlar.
 Aşağıya aramak istediğiniz ifadeyi yazın ve benzer içerikleri bulun.
 """)
 
+# Soru cevaplamanın süre sınırı (saniye)
+QA_TIMEOUT = 30
+
 # Arama motorunu başlat
 @st.cache_resource
 def get_search_engine():
     engine = SearchEngine()
+    # Yeni index nesilleri arka planda yüklenir; her yeniden çalıştırmada diske gidilmez
+    engine.start_watcher()
+    # Model arka planda yüklenir; sayfa beklemeden açılır
+    engine.warmup(background=True)
+    # QA modeli ayrı bir süreçte önceden yüklenir; süresi dolan sorular iptal edilir
+    engine.start_qa_pool(workers=1, timeout=QA_TIMEOUT)
     return engine
 
 engine = get_search_engine()
 
-# Index durumunu kontrol et
-if os.path.exists(engine.index_path) and os.path.exists(engine.metadata_path):
-    try:
-        if engine.load_index():
-            st.success("✅ FAISS index başarıyla yüklendi.")
-        else:
-            st.warning("⚠️ Index yüklenemedi.")
-    except Exception as e:
-        st.warning("⚠️ Index yüklenirken hata oluştu.")
-else:
-    st.warning("⚠️ Index henüz oluşturulmamış.")
-    st.info("Önce belgelerinizi ekleyin ve index oluşturun.")
+# Index işleri arka planda sırayla çalışır; yeniden çalıştırmalarda aynı kuyruk kullanılır
+@st.cache_resource
+def get_index_jobs():
+    return IndexJobManager(engine)
+
+# Index durumunu kontrol et (yüklüyse yeniden okunmaz)
+try:
+    if engine.index is not None or engine.load_index():
+        st.success("✅ FAISS index başarıyla yüklendi.")
+    else:
+        st.warning("⚠️ Index henüz oluşturulmamış.")
+        st.info("Önce belgelerinizi ekleyin ve index oluşturun.")
+except Exception as e:
+    st.warning(f"⚠️ Index yüklenirken hata oluştu: {str(e)}")
 
 # Sidebar ayarları
 st.sidebar.header("⚙️ Ayarlar")
 top_k = st.sidebar.slider("Gösterilecek Sonuç Sayısı", 1, 20, 5)
+search_modes = {"Anlamsal (dense)": "dense", "Kelime (BM25)": "lexical", "Hibrit (RRF)": "hybrid"}
+search_mode = search_modes[st.sidebar.selectbox("Arama Yöntemi", list(search_modes.keys()))]
 
 # Dosya yükleme bölümü
 st.sidebar.header("📁 Belgeleri Yükle")
@@ -80,48 +85,35 @@ uploaded_files = st.sidebar.file_uploader(
 
 if uploaded_files:
     st.sidebar.success(f"✅ {len(uploaded_files)} dosya yüklendi")
-    
-    # Belgeleri işle
-    documents = []
-    doc_names = []
-    for uploaded_file in uploaded_files:
-        doc_name = uploaded_file.name
-        doc_names.append(doc_name)
-        
-        if uploaded_file.name.endswith('.txt'):
-            content = uploaded_file.read().decode('utf-8')
-            documents.append(content)
-        elif uploaded_file.name.endswith('.pdf'):
-            # PDF dosyayı geçici olarak kaydet
-            temp_filename = f"temp_{uploaded_file.name}"
-            with open(temp_filename, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            
-            # PDF'den metin çıkar
-            try:
-                text = engine.load_pdf(temp_filename)
-                documents.append(text)
-            finally:
-                # Geçici dosyayı sil
-                if os.path.exists(temp_filename):
-                    os.remove(temp_filename)
-    
+
     if st.sidebar.button("Index Oluştur"):
-        with st.spinner("Index oluşturuluyor..."):
-            try:
-                engine.build_index(documents, doc_names)
-                st.sidebar.success("✅ Index başarıyla oluşturuldu!")
-                # Cache'i temizle
-                get_search_engine.clear()
-                # Streamlit cache'ini temizle
-                st.cache_data.clear()
-                st.cache_resource.clear()
-                st.rerun()
-            except Exception as e:
-                st.sidebar.error(f"❌ Hata oluştu: {str(e)}")
+        # Dosyalar bellekte ayrıştırılır; index arka planda oluşturulurken arama sürer
+        uploads = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+        try:
+            job = get_index_jobs().submit(uploads, rebuild=True)
+            st.session_state["index_job"] = job.id
+        except Exception as e:
+            st.sidebar.error(f"❌ Hata oluştu: {str(e)}")
+
+# Arka plandaki index işinin durumu
+job_id = st.session_state.get("index_job")
+job = get_index_jobs().get(job_id) if job_id else None
+if job is not None:
+    status = job.to_dict()
+    if status["stage"] == "done":
+        st.sidebar.success(f"✅ Index başarıyla oluşturuldu! ({status['chunks_embedded']} parça)")
+    elif status["stage"] == "failed":
+        st.sidebar.error(f"❌ Hata oluştu: {status['error']}")
+    else:
+        eta = f", kalan ~{status['eta_seconds']:.0f} sn" if status["eta_seconds"] is not None else ""
+        st.sidebar.info(f"⏳ Index oluşturuluyor ({status['stage']}): {status['documents_indexed']}/"
+                        f"{status['documents_total']} belge, {status['chunks_embedded']} parça, "
+                        f"{status['chunks_per_sec']:.1f} parça/sn{eta}")
+        st.sidebar.button("Durumu Yenile")
+    for error in status["errors"]:
+        st.sidebar.warning(f"⚠️ {error['name']} işlenemedi: {error['error']}")
 
 # Belge seçimi
-engine.load_index()  # Meta verileri yüklemek için
 try:
     doc_list = engine.get_document_list()
     doc_options = {"Tüm Belgeler": None}
@@ -146,10 +138,11 @@ if st.button("İşlemi Gerçekleştir") or query:
             try:
                 if operation_type == "Semantik Arama":
                     if selected_doc_id is not None:
-                        results = engine.search_with_document_filter(query, doc_id=selected_doc_id, k=top_k)
+                        results = engine.search_with_document_filter(query, doc_id=selected_doc_id, k=top_k,
+                                                                     mode=search_mode)
                         st.subheader(f"🔎 '{query}' için {selected_doc} belgesinde arama sonuçları:")
                     else:
-                        results = engine.search(query, k=top_k)
+                        results = engine.search(query, k=top_k, mode=search_mode)
                         st.subheader(f"🔎 '{query}' için arama sonuçları:")
                     
                     if results:
@@ -161,93 +154,51 @@ if st.button("İşlemi Gerçekleştir") or query:
                         st.info("Sonuç bulunamadı.")
                 
                 elif operation_type == "Soru Cevaplama":
-                    # İlk olarak ilgili içeriği bul
-                    if selected_doc_id is not None:
-                        results = engine.search_with_document_filter(query, doc_id=selected_doc_id, k=1)
-                    else:
-                        results = engine.search(query, k=1)
-                    
-                    if results:
-                        context = results[0]['text']
-                        
-                        # Bağlam çok uzunsa kısalt
-                        if len(context) > 1024:
-                            st.warning("Bağlam çok uzun, ilk 1024 karakter kullanılacak")
-                            context = context[:1024]
+                    # Soru ilgili ilk parçalarda tek toplu geçişle yanıtlanır
+                    start_time = time.time()
+                    try:
+                        result = engine.answer(query, k=min(top_k, 5), doc_id=selected_doc_id,
+                                               mode=search_mode, timeout=QA_TIMEOUT)
+                        elapsed = time.time() - start_time
                         
-                        # Timeout ile soru-cevap
-                        start_time = time.time()
-                        try:
-                            with timeout(30):  # 30 saniye timeout
-                                answer, score = engine.answer_question(context, query)
-                            elapsed = time.time() - start_time
-                            
+                        if result is not None:
                             st.subheader("❓ Soru:")
                             st.write(query)
                             
                             st.subheader("💬 Cevap:")
-                            st.write(answer)
-                            st.caption(f"Güven skoru: {score:.4f} | Süre: {elapsed:.2f}s")
+                            st.write(result["answer"])
+                            st.caption(f"Güven skoru: {result['score']:.4f} | Süre: {elapsed:.2f}s | "
+                                       f"Belge: {result['chunk'].get('doc_name', 'Bilinmiyor')}")
                             
                             with st.expander("Bağlam (Context)"):
-                                st.write(context)
-                        except TimeoutError as te:
-                            st.error(f"Soru cevaplama işlemi zaman aşımına uğradı: {str(te)}")
-                        except Exception as e:
-                            st.error(f"Soru cevaplama hatası: {str(e)}")
-                            st.exception(e)  # Detaylı hata bilgisi
-                    else:
-                        st.info("İlgili içerik bulunamadı.")
+                                st.write(result["chunk"]["text"])
+                        else:
+                            st.info("İlgili içerik bulunamadı.")
+                    except QATimeoutError as te:
+                        st.error(f"Soru cevaplama işlemi zaman aşımına uğradı: {str(te)}")
+                    except Exception as e:
+                        st.error(f"Soru cevaplama hatası: {str(e)}")
+                        st.exception(e)  # Detaylı hata bilgisi
                 
                 elif operation_type == "Özet Çıkart":
                     # Bellek kontrolü
                     if not check_memory_usage():
                         st.error("Yüksek bellek kullanımı nedeniyle işlem iptal edildi. Lütfen uygulamayı yeniden başlatın.")
                     else:
-                        # Tüm belgeleri birleştir
-                        if hasattr(engine, 'docs') and engine.docs:
-                            try:
-                                # Belge bazlı özetleme yap
-                                st.info("Belgeler özetleniyor...")
-                                all_summaries = []
-                                
-                                for i, doc in enumerate(engine.docs):
-                                    doc_text = doc['text']
-                                    doc_name = doc.get('doc_name', f'Belge {i+1}')
-                                    
-                                    # Her belge için daha uzun metin kullan
-                                    max_chars = 4000  # Önceki 2000 yerine
-                                    if len(doc_text) > max_chars:
-                                        st.info(f"{doc_name} belgesi kısaltılıyor...")
-                                        doc_text = doc_text[:max_chars]
-                                    
-                                    if len(doc_text.strip()) > 0:
-                                        # Her belgeyi ayrı özetle
-                                        summary = engine.summarize(doc_text, max_length=300, min_length=100)
-                                        if summary and not "hata" in summary.lower():
-                                            all_summaries.append(f"**{doc_name}:**\n{summary}\n")
-                                        else:
-                                            # Basit özet
-                                            words = doc_text.split()
-                                            if len(words) > 100:
-                                                simple_summary = " ".join(words[:100]) + "..."
-                                                all_summaries.append(f"**{doc_name} (Basit Özet):**\n{simple_summary}\n")
-                                
-                                # Tüm özetleri birleştir
-                                if all_summaries:
-                                    st.subheader("📋 Belgelerin Özetleri:")
-                                    for summary in all_summaries:
-                                        st.write(summary)
-                                        st.divider()  # Özetler arasında çizgi
+                        # Özetler index oluşturulurken çıkarılır; burada yalnızca okunur
+                        doc_list = engine.get_document_list()
+                        if selected_doc_id is not None:
+                            doc_list = [d for d in doc_list if d["doc_id"] == selected_doc_id]
+                        if doc_list:
+                            st.subheader("📋 Belgelerin Özetleri:")
+                            for doc in doc_list:
+                                summary = engine.get_summary(doc["doc_id"])
+                                st.write(f"**{doc['name']}:**")
+                                if summary is not None:
+                                    st.write(summary["text"])
                                 else:
-                                    st.warning("Özet oluşturulamadı.")
-                                    
-                                # Bellek temizle
-                                gc.collect()
-                                
-                            except Exception as e:
-                                st.error(f"Özetleme hatası: {str(e)}")
-                                st.info("Not: Uygulama çok büyük metinlerde kararsız çalışabilir. Daha küçük belgeler deneyin.")
+                                    st.info("Bu belge için özet yok. Index'i güncelleyin.")
+                                st.divider()  # Özetler arasında çizgi
                         else:
                             st.info("Özetlenecek içerik bulunamadı. Önce belgeleri yükleyin ve index oluşturun.")
                         
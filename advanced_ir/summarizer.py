@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+from chunker import sentence_starts
+
+logger = logging.getLogger(__name__)
+
+
+def split_sentences(text, min_chars=20, max_chars=500):
+    """Metni (başlangıç, bitiş) karakter aralıklı cümlelere böler.
+
+    Çok kısa cümleler (başlık, sayfa numarası) aday sayılmaz; çok uzunlar
+    max_chars'ta kesilir.
+    """
+    bounds = np.concatenate([[0], sentence_starts(text), [len(text)]])
+    spans = []
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        sentence = text[start:end]
+        stripped = sentence.strip()
+        if len(stripped) < min_chars:
+            continue
+        start += len(sentence) - len(sentence.lstrip())
+        spans.append((start, min(start + len(stripped), start + max_chars)))
+    return spans
+
+
+def mmr_select(vectors, count, diversity=0.3):
+    """Merkeze en yakın ve birbirine en az benzeyen count cümlenin indeksleri (belge sırasıyla).
+
+    Maximal marginal relevance: her adımda (1 - diversity) * merkez
+    benzerliği - diversity * seçilmişlere en yüksek benzerlik skoru en
+    büyük cümle seçilir.
+    """
+    n = len(vectors)
+    if n <= count:
+        return list(range(n))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.maximum(norms, 1e-12)
+    centroid = unit.mean(axis=0)
+    relevance = unit @ (centroid / max(np.linalg.norm(centroid), 1e-12))
+    similarity = unit @ unit.T
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    for _ in range(count - 1):
+        scores = (1 - diversity) * relevance - diversity * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return sorted(selected)
+
+
+class ExtractiveSummarizer:
+    """Cümle gömmeleriyle merkez/MMR tabanlı çıkarımsal özetleyici.
+
+    Belgelerin aday cümleleri tek bir encode çağrısıyla gömülür; her belge
+    için belge merkezine en yakın ve birbirini tekrar etmeyen cümleler
+    belge sırasıyla seçilir. Uzun belgelerde en fazla max_candidates cümle
+    belgeye eşit aralıklarla yayılarak aday alınır.
+    """
+
+    def __init__(self, encode, sentences=5, diversity=0.3, max_candidates=256):
+        self.encode = encode
+        self.sentences = sentences
+        self.diversity = diversity
+        self.max_candidates = max_candidates
+
+    def _candidates(self, text):
+        spans = split_sentences(text)
+        if len(spans) > self.max_candidates:
+            picks = np.linspace(0, len(spans) - 1, self.max_candidates).round().astype(int)
+            spans = [spans[i] for i in np.unique(picks)]
+        return spans
+
+    def summarize_many(self, texts):
+        """Her metin için {"text", "spans"} özeti (aday cümlesi olmayanlar için None)"""
+        candidates = [self._candidates(text) for text in texts]
+        sentences = [text[s:e] for text, spans in zip(texts, candidates) for s, e in spans]
+        if not sentences:
+            return [None] * len(texts)
+        vectors = np.asarray(self.encode(sentences), dtype="float32")
+        summaries = []
+        offset = 0
+        for text, spans in zip(texts, candidates):
+            doc_vectors = vectors[offset:offset + len(spans)]
+            offset += len(spans)
+            if not spans:
+                summaries.append(None)
+                continue
+            picked = [spans[i] for i in mmr_select(doc_vectors, self.sentences, self.diversity)]
+            summaries.append({"text": " ".join(text[s:e] for s, e in picked),
+                              "spans": [[s, e] for s, e in picked]})
+        return summaries
+
+
+def save_summaries(summaries, path):
+    """Belge hash'i → özet tablosunu kaydeder"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summaries, f, ensure_ascii=False)
+
+
+def load_summaries(path):
+    """Kayıtlı özet tablosu (dosya yoksa boş)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
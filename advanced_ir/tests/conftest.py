@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modüller advanced_ir/ altında düz olarak içe aktarılır (from chunk_store import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
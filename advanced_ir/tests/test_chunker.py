@@ -0,0 +1,90 @@
+import re
+
+import pytest
+
+from chunker import TokenChunker
+
+_WORD = re.compile(r"\S+")
+
+
+def _word_spans(text):
+    return [(m.start(), m.end()) for m in _WORD.finditer(text)]
+
+
+def _words_in(text, span):
+    """Aralığın kapsadığı kelimelerin sıraları"""
+    start, end = span
+    return [i for i, (s, e) in enumerate(_word_spans(text)) if s >= start and e <= end]
+
+
+def test_windows_respect_size_and_overlap():
+    text = " ".join(f"w{i}" for i in range(100))
+    spans = TokenChunker(max_tokens=10, overlap=3, snap_sentences=False).split(text)
+    windows = [_words_in(text, span) for span in spans]
+    # Pencereler 0, 7, 14, ... kelimelerinden başlar; son pencere metnin sonuna kadar gider
+    assert [w[0] for w in windows] == list(range(0, 92, 7))
+    assert all(len(w) == 10 for w in windows[:-1])
+    assert windows[-1][-1] == 99
+    for prev, cur in zip(windows, windows[1:]):
+        assert len(set(prev) & set(cur)) == 3
+
+
+def test_windows_cover_every_token():
+    text = "Kısa. " + " ".join(f"kelime{i}" for i in range(57)) + ". Son cümle burada!"
+    spans = TokenChunker(max_tokens=8, overlap=2).split(text)
+    covered = set()
+    for span in spans:
+        covered.update(_words_in(text, span))
+    assert covered == set(range(len(_word_spans(text))))
+
+
+def test_spans_are_character_offsets():
+    text = "Çalışma  güncel\tölçümler içerir. İkinci cümle ğüşiöç harfleri barındırır."
+    spans = TokenChunker(max_tokens=4, overlap=1).split(text)
+    for start, end in spans:
+        chunk = text[start:end]
+        assert chunk == chunk.strip()
+        assert _word_spans(text)[_words_in(text, (start, end))[0]][0] == start
+
+
+def test_windows_snap_to_sentence_boundaries():
+    # Üçer kelimelik cümleler: her pencere cümle sonunda biter, sonraki cümle başında başlar
+    text = " ".join(f"a{i} b{i} c{i}." for i in range(30))
+    spans = TokenChunker(max_tokens=10, overlap=3).split(text)
+    sentence_starts = {0} | {m.end() for m in re.finditer(r"\. ", text)}
+    for start, end in spans:
+        assert start in sentence_starts
+        assert text[end - 1] == "."
+        assert len(_words_in(text, (start, end))) <= 10
+    for prev, cur in zip(spans, spans[1:]):
+        overlap = set(_words_in(text, prev)) & set(_words_in(text, cur))
+        assert len(overlap) <= 3
+        assert cur[0] > prev[0]
+
+
+def test_no_snap_before_half_window():
+    # Cümle sonu pencerenin ilk yarısındaysa pencere kısaltılmaz, kelime sınırında kesilir
+    text = "Bir iki. " + " ".join(f"w{i}" for i in range(40))
+    first = TokenChunker(max_tokens=10, overlap=2).split(text)[0]
+    assert len(_words_in(text, first)) == 10
+
+
+def test_long_sentence_falls_back_to_word_boundaries():
+    text = " ".join(f"uzun{i}" for i in range(35)) + "."
+    spans = TokenChunker(max_tokens=8, overlap=2).split(text)
+    for start, end in spans:
+        assert len(_words_in(text, (start, end))) <= 8
+        assert text[start - 1:start] in ("", " ")
+        assert text[end:end + 1] in ("", " ")
+
+
+def test_short_and_empty_documents():
+    chunker = TokenChunker(max_tokens=10, overlap=3)
+    assert chunker.split("Tek cümle.") == [(0, 10)]
+    assert chunker.split("") == []
+    assert chunker.split_many(["a b", "", "c"]) == [[(0, 3)], [], [(0, 1)]]
+
+
+def test_overlap_must_be_smaller_than_window():
+    with pytest.raises(ValueError):
+        TokenChunker(max_tokens=10, overlap=10)
@@ -0,0 +1,97 @@
+import numpy as np
+
+from dedup import ChunkDeduplicator
+
+
+def _text(seed, words=60):
+    rng = np.random.default_rng(seed)
+    return " ".join(f"kelime{w}" for w in rng.integers(0, 5000, words))
+
+
+def _metas(texts, first_id=0):
+    return [{"vector_id": first_id + i, "text": text} for i, text in enumerate(texts)]
+
+
+def _near_copy(text):
+    # 60 kelimeden sonuncusu değişir: tahmini Jaccard ~0.95
+    words = text.split()
+    return " ".join(words[:-1] + ["farklı"])
+
+
+def test_exact_and_near_duplicates_share_vectors():
+    base = _text(0)
+    texts = [base, _text(1), base.upper() + " !", _near_copy(base), _text(2)]
+    metas = _metas(texts)
+    dedup = ChunkDeduplicator()
+    unique = dedup.assign(metas)
+    assert unique == [True, True, False, False, True]
+    # Kopyalar asıl chunk'ın vektörünü paylaşır
+    assert [m["vector_id"] for m in metas] == [0, 1, 0, 0, 4]
+    assert [m.get("duplicate", False) for m in metas] == [False, False, True, True, False]
+    assert dedup.stats == {"chunks": 5, "exact_duplicates": 1, "near_duplicates": 1}
+    report = dedup.report()
+    assert (report["chunks"], report["vectors"], report["duplicates"]) == (5, 3, 2)
+
+
+def test_duplicates_within_and_across_batches():
+    base = _text(3)
+    dedup = ChunkDeduplicator()
+    first = _metas([base, base])
+    assert dedup.assign(first) == [True, False]
+    second = _metas([_near_copy(base), _text(4)], first_id=2)
+    assert dedup.assign(second) == [False, True]
+    assert [m["vector_id"] for m in first + second] == [0, 0, 0, 3]
+
+
+def test_dissimilar_chunks_keep_own_vectors():
+    metas = _metas([_text(seed) for seed in range(50)])
+    assert all(ChunkDeduplicator().assign(metas))
+    assert [m["vector_id"] for m in metas] == list(range(50))
+
+
+def test_removed_vectors_are_not_shared():
+    base = _text(5)
+    dedup = ChunkDeduplicator()
+    dedup.assign(_metas([base]))
+    dedup.remove([0])
+    # Silinen vektör ne birebir ne benzer kopya olarak eşleşir
+    metas = _metas([base, _near_copy(base)], first_id=10)
+    assert dedup.assign(metas) == [True, False]
+    assert [m["vector_id"] for m in metas] == [10, 10]
+    assert dedup.report()["vectors"] == 1
+
+
+def test_saved_state_keeps_sharing(tmp_path):
+    texts = [_text(seed) for seed in range(20)]
+    dedup = ChunkDeduplicator(threshold=0.8)
+    dedup.assign(_metas(texts))
+    dedup.remove([3])
+    path = str(tmp_path / "dedup")
+    dedup.save(path)
+    assert ChunkDeduplicator.exists(path)
+
+    loaded = ChunkDeduplicator.load(path)
+    assert loaded.threshold == 0.8
+    assert loaded.report()["vectors"] == 19
+    metas = _metas([texts[7], _near_copy(texts[12]), texts[3]], first_id=100)
+    assert loaded.assign(metas) == [False, False, True]
+    assert [m["vector_id"] for m in metas] == [7, 12, 102]
+
+
+def test_many_rows_are_indexed_for_lookup():
+    # Sıralı bant dizilerine katılan satırlar da benzer kopya olarak bulunur
+    texts = [_text(seed, words=30) for seed in range(6000)]
+    dedup = ChunkDeduplicator()
+    for start in range(0, len(texts), 1000):
+        dedup.assign(_metas(texts[start:start + 1000], first_id=start))
+    metas = _metas([_near_copy(texts[i]) + " ek" for i in (0, 2500, 5999)], first_id=10000)
+    dedup.assign(metas)
+    assert [m["vector_id"] for m in metas] == [0, 2500, 5999]
+
+
+def test_from_chunks_skips_shared_rows():
+    base = _text(6)
+    rows = [{"vector_id": 0, "text": base}, {"vector_id": 0, "text": base}, {"vector_id": 1, "text": _text(7)}]
+    dedup = ChunkDeduplicator.from_chunks(rows)
+    assert dedup.report()["vectors"] == 2
+    assert dedup.stats["chunks"] == 0
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import index_factory
+from search_engine import SearchEngine
+
+DIM = 8
+
+
+def _blobs(seed=0):
+    # Birbirinden uzak iki küme: 0-1999 (+10 civarı) ve 2000-3999 (-10 civarı)
+    rng = np.random.default_rng(seed)
+    vectors = np.vstack([rng.normal(10, 1, (2000, DIM)), rng.normal(-10, 1, (2000, DIM))]).astype("float32")
+    return vectors, np.arange(len(vectors), dtype="int64")
+
+
+@pytest.fixture(autouse=True)
+def _workdir(tmp_path, monkeypatch):
+    # Motorun göreli varsayılan yolları (index/...) geçici dizine yazılsın
+    monkeypatch.chdir(tmp_path)
+
+
+def _engine(tmp_path, index_type, params=None):
+    vectors, ids = _blobs()
+    params = index_factory.resolve_params(params)
+    index = index_factory.create_index(index_type, DIM, params, train_vectors=vectors)
+    index.add_with_ids(vectors, ids)
+    engine = SearchEngine(index_path=str(tmp_path / "faiss.index"))
+    engine.index = index
+    return engine, vectors
+
+
+def _exact(vectors, q_vecs, vector_ids, k):
+    dists = ((q_vecs[:, None, :] - vectors[vector_ids][None, :, :]) ** 2).sum(axis=2)
+    top = np.argsort(dists, axis=1)[:, :k]
+    return np.take_along_axis(dists, top, axis=1), vector_ids[top]
+
+
+def _fallbacks(engine):
+    return engine.metrics.snapshot()["counters"].get("filter_exact_fallbacks", 0)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+def test_filter_returns_only_selected_ids(tmp_path, index_type):
+    engine, vectors = _engine(tmp_path, index_type, {"nlist": 32, "nprobe": 32})
+    q_vecs = vectors[[5, 2500]] + 0.1
+    vector_ids = np.arange(0, 4000, 3, dtype="int64")
+    distances, indices = engine._filtered_search(q_vecs, vector_ids, 10)
+    assert set(indices.ravel().tolist()) <= set(vector_ids.tolist())
+    exact_distances, exact_indices = _exact(vectors, q_vecs, vector_ids, 10)
+    np.testing.assert_array_equal(indices, exact_indices)
+    np.testing.assert_allclose(distances, exact_distances, rtol=1e-4, atol=1e-3)
+    assert _fallbacks(engine) == 0
+
+
+def test_ivf_falls_back_to_exact_search(tmp_path):
+    # nprobe=1 yalnızca sorgunun kümesini tarar; seçili ID'ler uzak kümede olduğundan FAISS yetersiz kalır
+    engine, vectors = _engine(tmp_path, "ivf_flat", {"nlist": 32, "nprobe": 1})
+    q_vecs = vectors[[0, 1]] + 0.1
+    vector_ids = np.arange(2000, 4000, 50, dtype="int64")
+    distances, indices = engine._filtered_search(q_vecs, vector_ids, 5)
+    assert _fallbacks(engine) == 1
+    exact_distances, exact_indices = _exact(vectors, q_vecs, vector_ids, 5)
+    np.testing.assert_array_equal(indices, exact_indices)
+    np.testing.assert_allclose(distances, exact_distances, rtol=1e-4)
+
+
+def test_k_is_capped_by_selection_size(tmp_path):
+    engine, vectors = _engine(tmp_path, "ivf_flat", {"nlist": 32, "nprobe": 1})
+    vector_ids = np.array([3000, 10, 3999], dtype="int64")
+    distances, indices = engine._filtered_search(vectors[[20]], vector_ids, 10)
+    assert indices.shape == (1, 3)
+    assert sorted(indices[0].tolist()) == [10, 3000, 3999]
+    assert (indices >= 0).all()
@@ -0,0 +1,88 @@
+import os
+import threading
+
+import index_generations
+from index_generations import (GenerationWatcher, discard, generation_dir, new_generation, prune, publish,
+                               read_current)
+
+
+def _generations(root):
+    return sorted(os.listdir(os.path.join(root, index_generations.GENERATIONS_DIR)))
+
+
+def test_publish_switches_current(tmp_path):
+    root = str(tmp_path)
+    assert read_current(root) is None
+    first = new_generation(root)
+    assert first == "gen-000001"
+    # Yayınlanmamış nesil okuyuculara görünmez
+    assert read_current(root) is None
+    publish(root, first)
+    assert read_current(root) == first
+    second = new_generation(root)
+    publish(root, second)
+    assert read_current(root) == second
+    assert os.path.isdir(generation_dir(root, first))
+
+
+def test_numbers_skip_existing_generations(tmp_path):
+    root = str(tmp_path)
+    os.makedirs(generation_dir(root, "gen-000007"))
+    assert new_generation(root) == "gen-000008"
+
+
+def test_publish_prunes_old_generations(tmp_path):
+    root = str(tmp_path)
+    names = []
+    for _ in range(5):
+        names.append(new_generation(root))
+        publish(root, names[-1], keep=2)
+    assert _generations(root) == names[-2:]
+
+
+def test_rollback_keeps_current_generation(tmp_path):
+    root = str(tmp_path)
+    names = [new_generation(root) for _ in range(3)]
+    publish(root, names[2], keep=3)
+    # Eski nesle geri dönülür; en yeni keep nesil dışında kalsa da yayındaki nesil silinmez
+    publish(root, names[0], keep=1)
+    assert read_current(root) == names[0]
+    assert _generations(root) == [names[0], names[2]]
+    prune(root, keep=0)
+    assert _generations(root) == [names[0]]
+
+
+def test_discard_leaves_published_generation(tmp_path):
+    root = str(tmp_path)
+    published = new_generation(root)
+    publish(root, published)
+    failed = new_generation(root)
+    discard(root, failed)
+    assert read_current(root) == published
+    assert _generations(root) == [published]
+
+
+def test_watcher_reports_publish_and_rollback(tmp_path):
+    root = str(tmp_path)
+    first = new_generation(root)
+    publish(root, first)
+    second = new_generation(root)
+    loaded = [first]
+    seen = threading.Event()
+
+    def reload(name):
+        loaded.append(name)
+        seen.set()
+
+    watcher = GenerationWatcher(root, lambda: loaded[-1], reload, interval=0.01)
+    watcher.start()
+    try:
+        publish(root, second)
+        assert seen.wait(5)
+        seen.clear()
+        publish(root, first)
+        assert seen.wait(5)
+    finally:
+        watcher.stop()
+        watcher.join(5)
+    assert loaded == [first, second, first]
@@ -0,0 +1,113 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from lexical_index import LexicalIndex, LexicalIndexWriter, bm25_idf, tokenize
+
+
+def _corpus(n_chunks=400, vocab=300, seed=0):
+    # Rakamlı terimler gövdelenmez; Zipf dağılımı sık ve seyrek terimleri birlikte üretir
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n_chunks):
+        length = int(rng.integers(5, 60))
+        words = np.minimum(rng.zipf(1.3, length), vocab)
+        texts.append(" ".join(f"t{w}" for w in words))
+    return texts
+
+
+def _build(path, texts, first_id=0):
+    writer = LexicalIndexWriter(str(path))
+    for i, text in enumerate(texts):
+        writer.append({"vector_id": first_id + i, "text": text})
+    writer.close()
+    return LexicalIndex(str(path))
+
+
+def _brute_force(texts, query, k1=1.2, b=0.75, first_id=0, allowed=None):
+    """Tüm chunk'ları tek tek skorlayan BM25; vektör ID'si → skor"""
+    tokenized = [tokenize(text) for text in texts]
+    lengths = np.array([len(tokens) for tokens in tokenized], dtype="float64")
+    avgdl = lengths.mean()
+    df = Counter(term for tokens in tokenized for term in set(tokens))
+    scores = {}
+    for i, tokens in enumerate(tokenized):
+        vector_id = first_id + i
+        if allowed is not None and vector_id not in allowed:
+            continue
+        tf = Counter(tokens)
+        score = 0.0
+        for term in set(tokenize(query)):
+            if tf[term]:
+                idf = bm25_idf(len(texts), df[term])
+                score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * lengths[i] / avgdl))
+        if score > 0:
+            scores[vector_id] = score
+    return scores
+
+
+def _assert_top_k(ids, scores, expected, k):
+    """MaxScore sonucu tam skorların ilk k'sıyla aynı olmalı (eşit skorlarda sıra serbest)"""
+    best = sorted(expected.values(), reverse=True)[:k]
+    assert len(ids) == len(best)
+    np.testing.assert_allclose(scores, best, rtol=1e-4)
+    for vector_id, score in zip(ids.tolist(), scores.tolist()):
+        assert expected[vector_id] == pytest.approx(score, rel=1e-4)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return _corpus()
+
+
+@pytest.fixture(scope="module")
+def index(corpus, tmp_path_factory):
+    return _build(tmp_path_factory.mktemp("lexical"), corpus)
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_maxscore_matches_brute_force(corpus, index, k):
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        terms = rng.choice(120, size=int(rng.integers(1, 6)), replace=False) + 1
+        query = " ".join(f"t{t}" for t in terms)
+        ids, scores = index.search(query, k=k)
+        _assert_top_k(ids, scores, _brute_force(corpus, query), k)
+
+
+def test_maxscore_with_allowed_ids(corpus, index):
+    rng = np.random.default_rng(2)
+    allowed = np.sort(rng.choice(len(corpus), size=60, replace=False))
+    for query in ("t1 t2 t3", "t7 t40", "t2 t90 t150 t11"):
+        ids, scores = index.search(query, k=10, allowed=allowed)
+        assert set(ids.tolist()) <= set(allowed.tolist())
+        _assert_top_k(ids, scores, _brute_force(corpus, query, allowed=set(allowed.tolist())), 10)
+
+
+def test_unknown_terms_and_empty_query(index):
+    ids, scores = index.search("yokboyleterim", k=5)
+    assert len(ids) == 0 and len(scores) == 0
+    ids, _ = index.search("", k=5)
+    assert len(ids) == 0
+
+
+def test_carried_over_index_matches_rebuild(corpus, index, tmp_path):
+    # Devralınan posting'lerle yazılan index, baştan yazılanla aynı skorları vermeli
+    removed = list(range(0, 100, 7))
+    extra = _corpus(n_chunks=50, seed=3)
+    writer = LexicalIndexWriter(str(tmp_path / "carried"))
+    writer.carry_over(index, removed)
+    for i, text in enumerate(extra):
+        writer.append({"vector_id": len(corpus) + i, "text": text})
+    writer.close()
+    carried = LexicalIndex(str(tmp_path / "carried"))
+
+    kept = [(i, text) for i, text in enumerate(corpus) if i not in removed]
+    kept += [(len(corpus) + i, text) for i, text in enumerate(extra)]
+    texts = [text for _, text in kept]
+    vector_ids = [i for i, _ in kept]
+    for query in ("t1 t2", "t5 t33 t8", "t60"):
+        ids, scores = carried.search(query, k=10)
+        expected = {vector_ids[i]: s for i, s in _brute_force(texts, query).items()}
+        _assert_top_k(ids, scores, expected, 10)